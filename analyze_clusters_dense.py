@@ -1,14 +1,19 @@
+import argparse
 import csv
+import math
 import os
+import re
 import unicodedata
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
+from dataclasses import dataclass
 from typing import Dict, Iterable, List, Optional, Tuple
 
-XLSX_PATH = "OF 3-10.xlsx"
+from of_dataset import XLSX_PATH, intern_text, load_table
+from of_geo import DEPARTMENT_NAMES, DEPARTMENT_SEATS, department_from_postal_code, normalize_postal_code
+from of_groupby import Collect, Count, First, Sum, Tally, group_by
+from of_spatial import Coords, GeoPoint, GridIndex, density_clusters, haversine_km, weighted_centroid
+
 OUTPUT_DIR = "analysis_outputs"
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 # Column indices from header inspection
 COL_DENOMINATION = 2
@@ -23,118 +28,6 @@ COL_SPEC1 = 22
 TARGET_MIN_EFFECTIF = 3
 TARGET_MAX_EFFECTIF = 10
 
-DEPARTMENT_NAMES: Dict[str, str] = {
-    "01": "Ain",
-    "02": "Aisne",
-    "03": "Allier",
-    "04": "Alpes-de-Haute-Provence",
-    "05": "Hautes-Alpes",
-    "06": "Alpes-Maritimes",
-    "07": "Ardèche",
-    "08": "Ardennes",
-    "09": "Ariège",
-    "10": "Aube",
-    "11": "Aude",
-    "12": "Aveyron",
-    "13": "Bouches-du-Rhône",
-    "14": "Calvados",
-    "15": "Cantal",
-    "16": "Charente",
-    "17": "Charente-Maritime",
-    "18": "Cher",
-    "19": "Corrèze",
-    "2A": "Corse-du-Sud",
-    "2B": "Haute-Corse",
-    "21": "Côte-d'Or",
-    "22": "Côtes-d'Armor",
-    "23": "Creuse",
-    "24": "Dordogne",
-    "25": "Doubs",
-    "26": "Drôme",
-    "27": "Eure",
-    "28": "Eure-et-Loir",
-    "29": "Finistère",
-    "30": "Gard",
-    "31": "Haute-Garonne",
-    "32": "Gers",
-    "33": "Gironde",
-    "34": "Hérault",
-    "35": "Ille-et-Vilaine",
-    "36": "Indre",
-    "37": "Indre-et-Loire",
-    "38": "Isère",
-    "39": "Jura",
-    "40": "Landes",
-    "41": "Loir-et-Cher",
-    "42": "Loire",
-    "43": "Haute-Loire",
-    "44": "Loire-Atlantique",
-    "45": "Loiret",
-    "46": "Lot",
-    "47": "Lot-et-Garonne",
-    "48": "Lozère",
-    "49": "Maine-et-Loire",
-    "50": "Manche",
-    "51": "Marne",
-    "52": "Haute-Marne",
-    "53": "Mayenne",
-    "54": "Meurthe-et-Moselle",
-    "55": "Meuse",
-    "56": "Morbihan",
-    "57": "Moselle",
-    "58": "Nièvre",
-    "59": "Nord",
-    "60": "Oise",
-    "61": "Orne",
-    "62": "Pas-de-Calais",
-    "63": "Puy-de-Dôme",
-    "64": "Pyrénées-Atlantiques",
-    "65": "Hautes-Pyrénées",
-    "66": "Pyrénées-Orientales",
-    "67": "Bas-Rhin",
-    "68": "Haut-Rhin",
-    "69": "Rhône",
-    "70": "Haute-Saône",
-    "71": "Saône-et-Loire",
-    "72": "Sarthe",
-    "73": "Savoie",
-    "74": "Haute-Savoie",
-    "75": "Paris",
-    "76": "Seine-Maritime",
-    "77": "Seine-et-Marne",
-    "78": "Yvelines",
-    "79": "Deux-Sèvres",
-    "80": "Somme",
-    "81": "Tarn",
-    "82": "Tarn-et-Garonne",
-    "83": "Var",
-    "84": "Vaucluse",
-    "85": "Vendée",
-    "86": "Vienne",
-    "87": "Haute-Vienne",
-    "88": "Vosges",
-    "89": "Yonne",
-    "90": "Territoire de Belfort",
-    "91": "Essonne",
-    "92": "Hauts-de-Seine",
-    "93": "Seine-Saint-Denis",
-    "94": "Val-de-Marne",
-    "95": "Val-d'Oise",
-    "971": "Guadeloupe",
-    "972": "Martinique",
-    "973": "Guyane",
-    "974": "La Réunion",
-    "975": "Saint-Pierre-et-Miquelon",
-    "976": "Mayotte",
-    "977": "Saint-Barthélemy",
-    "978": "Saint-Martin",
-    "986": "Wallis-et-Futuna",
-    "987": "Polynésie française",
-    "988": "Nouvelle-Calédonie",
-    "989": "Île de Clipperton",
-    "990": "Monaco",
-}
-
 CITY_METRO_POP = {
     "PARIS": 10800000,
     "LYON": 2400000,
@@ -210,18 +103,9 @@ CITY_METRO_POP = {
     "COURBEVOIE": 10800000,
 }
 
-CLUSTERS = [
-    ("Grand Paris", ["75", "92", "93", "94", "91", "78", "95", "77"], 30),
-    ("Lyon Métropole", ["69", "01", "38", "42"], 50),
-    ("Aix-Marseille-Provence", ["13", "83", "84"], 40),
-    ("Lille - Flandres", ["59", "62", "80"], 45),
-    ("Toulouse & Occitanie Ouest", ["31", "32", "82", "81"], 50),
-    ("Bordeaux - Nouvelle Aquitaine", ["33", "24", "47", "40"], 50),
-    ("Nantes - Bretagne Sud", ["44", "49", "56", "85"], 45),
-    ("Nice Côte d'Azur", ["06", "83"], 35),
-    ("Strasbourg - Rhin Supérieur", ["67", "68"], 40),
-    ("Rennes - Bretagne", ["35", "22", "29", "56"], 60),
-]
+CLUSTER_EPS_KM = 40.0
+CLUSTER_MIN_OF = 30
+CLUSTER_RADIUS_STEP_KM = 5
 
 PARIS_ARR_INFO = {
     1: ("Louvre, Châtelet", "Métro 1/7/14"),
@@ -246,71 +130,94 @@ PARIS_ARR_INFO = {
     20: ("Belleville, Ménilmontant", "Métro 2/3/11"),
 }
 
-CITY_COORDS = {
-    "PARIS": (48.8566, 2.3522),
-    "LYON": (45.7640, 4.8357),
-    "MARSEILLE": (43.2965, 5.3698),
-    "AIX EN PROVENCE": (43.5297, 5.4474),
-    "TOULOUSE": (43.6045, 1.4442),
-    "BORDEAUX": (44.8378, -0.5792),
-    "LILLE": (50.6292, 3.0573),
-    "NANTES": (47.2184, -1.5536),
-    "STRASBOURG": (48.5734, 7.7521),
-    "RENNES": (48.1173, -1.6778),
-    "MONTPELLIER": (43.6108, 3.8767),
-    "NICE": (43.7102, 7.2620),
-    "GRENOBLE": (45.1885, 5.7245),
-    "TOULON": (43.1242, 5.9280),
-    "DIJON": (47.3220, 5.0415),
-    "ANGERS": (47.4784, -0.5632),
-    "AVIGNON": (43.9493, 4.8055),
-    "METZ": (49.1193, 6.1757),
-    "NANCY": (48.6921, 6.1844),
-    "REIMS": (49.2583, 4.0317),
-    "LE HAVRE": (49.4944, 0.1079),
-    "BREST": (48.3904, -4.4861),
-    "ORLEANS": (47.9029, 1.9093),
-    "TOURS": (47.3941, 0.6848),
-    "CLERMONT FERRAND": (45.7772, 3.0870),
-    "CLERMONT-FERRAND": (45.7772, 3.0870),
-    "PERPIGNAN": (42.6887, 2.8948),
-    "PAU": (43.2951, -0.3708),
-    "BAYONNE": (43.4927, -1.4748),
-    "POITIERS": (46.5802, 0.3404),
-    "LA ROCHELLE": (46.1603, -1.1511),
-    "AMIENS": (49.8941, 2.2957),
-    "CAEN": (49.1829, -0.3700),
-    "ROUEN": (49.4432, 1.0993),
-    "LIMOGES": (45.8336, 1.2611),
-    "BESANCON": (47.2378, 6.0241),
-    "BESANÇON": (47.2378, 6.0241),
-    "ANNECY": (45.8992, 6.1294),
-    "VALENCIENNES": (50.3570, 3.5230),
-    "NIMES": (43.8367, 4.3601),
-    "NÎMES": (43.8367, 4.3601),
-    "NIORT": (46.3230, -0.4588),
-    "QUIMPER": (47.9961, -4.0970),
-    "COLMAR": (48.0798, 7.3585),
-    "MULHOUSE": (47.7508, 7.3359),
-    "SAINT DENIS": (48.9362, 2.3574),
-    "SAINT-DENIS": (48.9362, 2.3574),
-    "VERSAILLES": (48.8049, 2.1204),
-    "NANTERRE": (48.8924, 2.2067),
-    "BOULOGNE BILLANCOURT": (48.8397, 2.2399),
-    "COURBEVOIE": (48.8978, 2.2566),
-    "MONTREUIL": (48.8638, 2.4485),
-    "SAINT MAUR DES FOSSES": (48.7939, 2.4945),
-    "AULNAY SOUS BOIS": (48.9326, 2.4938),
-    "CLICHY": (48.9047, 2.3070),
-    "ISSY LES MOULINEAUX": (48.8210, 2.2770),
-    "NEUILLY SUR SEINE": (48.8846, 2.2686),
-    "CRETEIL": (48.7904, 2.4556),
-    "VINCENNES": (48.8470, 2.4370),
-    "MONTPELLIER": (43.6108, 3.8767),
-    "SAINT HERBLAIN": (47.2187, -1.6496),
-    "MERIGNAC": (44.8439, -0.6458),
-    "PESSAC": (44.8100, -0.6410),
-    "BAGNEUX": (48.7995, 2.3133),
+DISTRICT_TOKEN_RE = re.compile(r"\d+(?:ER|E|EME)?|ARR|ARRONDISSEMENT|CEDEX")
+CITY_TOKEN_ALIASES = {"ST": "SAINT", "STE": "SAINTE"}
+
+# Keyed by (department, city) so homonyms such as Saint-Denis (93) and
+# Saint-Denis (974) keep their own coordinates.
+CITY_COORDS: Dict[Tuple[str, str], Coords] = {
+    ("75", "PARIS"): (48.8566, 2.3522),
+    ("69", "LYON"): (45.7640, 4.8357),
+    ("13", "MARSEILLE"): (43.2965, 5.3698),
+    ("13", "AIX EN PROVENCE"): (43.5297, 5.4474),
+    ("31", "TOULOUSE"): (43.6045, 1.4442),
+    ("33", "BORDEAUX"): (44.8378, -0.5792),
+    ("59", "LILLE"): (50.6292, 3.0573),
+    ("44", "NANTES"): (47.2184, -1.5536),
+    ("67", "STRASBOURG"): (48.5734, 7.7521),
+    ("35", "RENNES"): (48.1173, -1.6778),
+    ("34", "MONTPELLIER"): (43.6108, 3.8767),
+    ("06", "NICE"): (43.7102, 7.2620),
+    ("38", "GRENOBLE"): (45.1885, 5.7245),
+    ("83", "TOULON"): (43.1242, 5.9280),
+    ("21", "DIJON"): (47.3220, 5.0415),
+    ("49", "ANGERS"): (47.4784, -0.5632),
+    ("84", "AVIGNON"): (43.9493, 4.8055),
+    ("57", "METZ"): (49.1193, 6.1757),
+    ("54", "NANCY"): (48.6921, 6.1844),
+    ("51", "REIMS"): (49.2583, 4.0317),
+    ("76", "LE HAVRE"): (49.4944, 0.1079),
+    ("29", "BREST"): (48.3904, -4.4861),
+    ("45", "ORLEANS"): (47.9029, 1.9093),
+    ("37", "TOURS"): (47.3941, 0.6848),
+    ("63", "CLERMONT FERRAND"): (45.7772, 3.0870),
+    ("66", "PERPIGNAN"): (42.6887, 2.8948),
+    ("64", "PAU"): (43.2951, -0.3708),
+    ("64", "BAYONNE"): (43.4927, -1.4748),
+    ("86", "POITIERS"): (46.5802, 0.3404),
+    ("17", "LA ROCHELLE"): (46.1603, -1.1511),
+    ("80", "AMIENS"): (49.8941, 2.2957),
+    ("14", "CAEN"): (49.1829, -0.3700),
+    ("76", "ROUEN"): (49.4432, 1.0993),
+    ("87", "LIMOGES"): (45.8336, 1.2611),
+    ("25", "BESANCON"): (47.2378, 6.0241),
+    ("74", "ANNECY"): (45.8992, 6.1294),
+    ("59", "VALENCIENNES"): (50.3570, 3.5230),
+    ("30", "NIMES"): (43.8367, 4.3601),
+    ("79", "NIORT"): (46.3230, -0.4588),
+    ("29", "QUIMPER"): (47.9961, -4.0970),
+    ("68", "COLMAR"): (48.0798, 7.3585),
+    ("68", "MULHOUSE"): (47.7508, 7.3359),
+    ("93", "SAINT DENIS"): (48.9362, 2.3574),
+    ("974", "SAINT DENIS"): (-20.8823, 55.4504),
+    ("78", "VERSAILLES"): (48.8049, 2.1204),
+    ("92", "NANTERRE"): (48.8924, 2.2067),
+    ("92", "BOULOGNE BILLANCOURT"): (48.8397, 2.2399),
+    ("92", "COURBEVOIE"): (48.8978, 2.2566),
+    ("93", "MONTREUIL"): (48.8638, 2.4485),
+    ("94", "SAINT MAUR DES FOSSES"): (48.7939, 2.4945),
+    ("93", "AULNAY SOUS BOIS"): (48.9326, 2.4938),
+    ("92", "CLICHY"): (48.9047, 2.3070),
+    ("92", "ISSY LES MOULINEAUX"): (48.8210, 2.2770),
+    ("92", "NEUILLY SUR SEINE"): (48.8846, 2.2686),
+    ("94", "CRETEIL"): (48.7904, 2.4556),
+    ("94", "VINCENNES"): (48.8470, 2.4370),
+    ("44", "SAINT HERBLAIN"): (47.2187, -1.6496),
+    ("33", "MERIGNAC"): (44.8439, -0.6458),
+    ("33", "PESSAC"): (44.8100, -0.6410),
+    ("92", "BAGNEUX"): (48.7995, 2.3133),
+    ("69", "VILLEURBANNE"): (45.7719, 4.8902),
+    ("59", "ROUBAIX"): (50.6942, 3.1746),
+    ("59", "TOURCOING"): (50.7239, 3.1612),
+    ("42", "SAINT ETIENNE"): (45.4397, 4.3872),
+    ("06", "CANNES"): (43.5528, 7.0174),
+    ("06", "ANTIBES"): (43.5808, 7.1251),
+    ("74", "ANNEMASSE"): (46.1934, 6.2342),
+    ("73", "CHAMBERY"): (45.5646, 5.9178),
+    ("14", "BAYEUX"): (49.2764, -0.7024),
+    ("56", "VANNES"): (47.6582, -2.7608),
+    ("56", "LORIENT"): (47.7483, -3.3700),
+    ("72", "LE MANS"): (48.0061, 0.1996),
+    ("44", "SAINT NAZAIRE"): (47.2735, -2.2138),
+    ("2A", "AJACCIO"): (41.9192, 8.7386),
+    ("2B", "BASTIA"): (42.6973, 9.4509),
+    ("971", "POINTE A PITRE"): (16.2411, -61.5331),
+    ("972", "FORT DE FRANCE"): (14.6161, -61.0588),
+    ("973", "CAYENNE"): (4.9224, -52.3135),
+    ("974", "SAINT PAUL"): (-21.0096, 55.2707),
+    ("974", "SAINT PIERRE"): (-21.3393, 55.4781),
+    ("976", "MAMOUDZOU"): (-12.7806, 45.2279),
+    ("987", "PAPEETE"): (-17.5516, -149.5585),
 }
 
 
@@ -363,80 +270,6 @@ def normalize_city_key(name: Optional[str]) -> str:
     return text
 
 
-def normalize_postal_code(value: Optional[str]) -> Optional[str]:
-    if value is None:
-        return None
-    text = str(value).strip()
-    if not text or text.lower() == "nan":
-        return None
-    text = text.replace(" ", "")
-    if text.endswith(".0"):
-        text = text[:-2]
-    digits = "".join(ch for ch in text if ch.isdigit())
-    if not digits:
-        return None
-    if len(digits) >= 5:
-        return digits[:5]
-    if len(digits) == 4:
-        return "0" + digits
-    if len(digits) == 3:
-        if digits.startswith(("97", "98")):
-            return digits + "00"
-        return digits
-    return digits.zfill(5)
-
-
-def department_from_postal_code(cp: Optional[str]) -> Optional[str]:
-    if not cp:
-        return None
-    if cp.startswith("97") or cp.startswith("98"):
-        return cp[:3]
-    if cp.startswith("20"):
-        third = cp[2] if len(cp) > 2 else "0"
-        return "2A" if third in {"0", "1"} else "2B"
-    return cp[:2]
-
-
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_float(value: Optional[str]) -> Optional[float]:
     if value is None:
         return None
@@ -450,40 +283,32 @@ def parse_float(value: Optional[str]) -> Optional[float]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                if elem.attrib.get("r") == "1":
-                    elem.clear()
-                    continue
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    idx = column_ref_to_index(ref)
-                    values[idx] = get_cell_value(cell, shared_strings) or ""
-                postal_code = normalize_postal_code(values.get(COL_CODE_POSTAL))
-                department = department_from_postal_code(postal_code)
-                ville = (values.get(COL_VILLE) or "").strip()
-                ville_key = normalize_city_key(ville)
-                record = Record(
-                    ville=ville,
-                    ville_key=ville_key,
-                    postal_code=postal_code,
-                    department=department,
-                    region_code=(values.get(COL_CODE_REGION) or "").strip(),
-                    actions=parse_float(values.get(COL_ACTIONS_FORMATION)),
-                    nb_stagiaires=parse_float(values.get(COL_NB_STAGIAIRES)),
-                    effectif=parse_float(values.get(COL_EFFECTIF_FORMATEURS)),
-                    specialite=(values.get(COL_SPEC1) or "").strip(),
-                )
-                records.append(record)
-                elem.clear()
+    for postal_code, raw_ville, raw_region, actions, stagiaires, effectif, spec in table.select(
+        (COL_CODE_POSTAL, normalize_postal_code),
+        COL_VILLE,
+        COL_CODE_REGION,
+        (COL_ACTIONS_FORMATION, parse_float),
+        (COL_NB_STAGIAIRES, parse_float),
+        (COL_EFFECTIF_FORMATEURS, parse_float),
+        COL_SPEC1,
+    ):
+        department = department_from_postal_code(postal_code)
+        ville = (raw_ville or "").strip()
+        ville_key = normalize_city_key(ville)
+        record = Record(
+            ville=intern_text(ville),
+            ville_key=intern_text(ville_key),
+            postal_code=intern_text(postal_code),
+            department=intern_text(department),
+            region_code=intern_text((raw_region or "").strip()),
+            actions=actions,
+            nb_stagiaires=stagiaires,
+            effectif=effectif,
+            specialite=intern_text((spec or "").strip()),
+        )
+        records.append(record)
     return records
 
 
@@ -548,34 +373,22 @@ def metro_population_label(city_key: str) -> str:
 
 
 def build_city_stats(records: List[Record]):
-    city_stats: Dict[Tuple[str, Optional[str]], Dict[str, object]] = {}
+    city_stats = group_by(
+        records,
+        lambda rec: (rec.ville_key, rec.department or None),
+        {
+            "ville": First("ville"),
+            "department": First("department"),
+            "count": Count(),
+            "total_stagiaires": Sum(lambda rec: rec.nb_stagiaires or None, start=0.0),
+            "postaux": Collect(lambda rec: rec.postal_code or None),
+            "specialites": Tally(lambda rec: rec.specialite or None),
+        },
+    )
     dept_totals: Counter = Counter()
-    total_tam = 0
-    for rec in records:
-        if not rec.department:
-            continue
-        dept_totals[rec.department] += 1
-        total_tam += 1
-        key = (rec.ville_key, rec.department)
-        stats = city_stats.setdefault(
-            key,
-            {
-                "ville": rec.ville,
-                "department": rec.department,
-                "count": 0,
-                "total_stagiaires": 0.0,
-                "postaux": [],
-                "specialites": Counter(),
-            },
-        )
-        stats["count"] += 1
-        if rec.nb_stagiaires:
-            stats["total_stagiaires"] += rec.nb_stagiaires
-        if rec.postal_code:
-            stats["postaux"].append(rec.postal_code)
-        if rec.specialite:
-            stats["specialites"][rec.specialite] += 1
-    return city_stats, dept_totals, total_tam
+    for stats in city_stats.values():
+        dept_totals[stats["department"]] += stats["count"]
+    return city_stats, dept_totals, sum(dept_totals.values())
 
 
 def format_department(dept: Optional[str]) -> str:
@@ -627,41 +440,56 @@ def compute_table1(city_stats, dept_totals):
     return table_rows, rows
 
 
-def compute_cluster_table(city_rows, dept_totals, total_tam):
-    # Map dept to list of city entries
-    dept_to_cities: Dict[str, List[Dict[str, object]]] = defaultdict(list)
-    for row in city_rows:
-        dept_to_cities[row["dept"]].append(row)
+@dataclass(slots=True)
+class Cluster:
+    name: str
+    departments: List[str]
+    cities: List[Dict[str, object]]
+    total: int
+    center: Coords
+    radius_km: int
 
-    cluster_rows = []
-    for name, dept_list, radius in CLUSTERS:
-        total = sum(dept_totals.get(dept, 0) for dept in dept_list)
-        if total == 0:
-            continue
-        cities = []
-        for dept in dept_list:
-            cities.extend(dept_to_cities.get(dept, []))
-        cities.sort(key=lambda c: -c["count"])
-        top_cities = []
+
+def detect_clusters(city_rows, eps_km: float = CLUSTER_EPS_KM, min_of: int = CLUSTER_MIN_OF) -> List[Cluster]:
+    clusters = []
+    for members in density_clusters(city_points(city_rows), eps_km, min_of):
+        cities = sorted((point.data for point in members), key=lambda c: (-c["count"], c["ville_key"]))
+        dept_counts: Counter = Counter()
         for city in cities:
-            label = city["ville_label"]
-            cp = city["cp"]
-            top_cities.append(f"{label} ({city['count']})")
-            if len(top_cities) == 3:
-                break
-        part = (total / total_tam * 100) if total_tam else 0
+            dept_counts[city["dept"]] += city["count"]
+        center = weighted_centroid(members)
+        spread = max(haversine_km(center, point.coords) for point in members)
+        step = CLUSTER_RADIUS_STEP_KM
+        clusters.append(
+            Cluster(
+                name=f"Zone {cities[0]['ville_label']}",
+                departments=sorted(dept_counts, key=lambda dept: (-dept_counts[dept], dept)),
+                cities=cities,
+                total=sum(dept_counts.values()),
+                center=center,
+                radius_km=max(step, math.ceil(spread / step) * step),
+            )
+        )
+    clusters.sort(key=lambda cluster: -cluster.total)
+    return clusters
+
+
+def compute_cluster_table(clusters: List[Cluster], total_tam: int):
+    cluster_rows = []
+    for cluster in clusters:
+        top_cities = [f"{city['ville_label']} ({city['count']})" for city in cluster.cities[:3]]
+        part = (cluster.total / total_tam * 100) if total_tam else 0
         cluster_rows.append(
             [
-                name,
-                ", ".join(dept_list),
-                format_int(total),
+                cluster.name,
+                ", ".join(cluster.departments),
+                format_int(cluster.total),
                 f"{part:.1f}%",
                 ", ".join(top_cities),
-                f"{radius} km",
-                event_type(total),
+                f"{cluster.radius_km} km",
+                event_type(cluster.total),
             ]
         )
-    cluster_rows.sort(key=lambda r: -int(r[2].replace(" ", "")))
     return cluster_rows
 
 
@@ -766,23 +594,6 @@ def compute_deserts(dept_totals: Counter):
     return rows
 
 
-def compute_city_specialites(records: List[Record]):
-    mapping: Dict[Tuple[str, Optional[str]], Counter] = defaultdict(Counter)
-    for rec in records:
-        if not rec.department:
-            continue
-        key = (rec.ville_key, rec.department)
-        if rec.specialite:
-            mapping[key][rec.specialite] += 1
-    return mapping
-
-
-def attach_specialites(city_stats, specialite_mapping):
-    for key, counter in specialite_mapping.items():
-        if key in city_stats:
-            city_stats[key]["specialites"] = counter
-
-
 def write_markdown(tables: Dict[str, List[List[str]]], synthesis: List[str]) -> None:
     ensure_output_dir()
     path = os.path.join(OUTPUT_DIR, "prompt11_clusters_denses.md")
@@ -805,30 +616,92 @@ def write_markdown(tables: Dict[str, List[List[str]]], synthesis: List[str]) ->
         f.write("\n")
 
 
-def build_coord_csv(selected_cities: List[Tuple[str, str, str, str]]) -> None:
+def city_tokens(ville_key: str) -> List[str]:
+    tokens = ville_key.replace("-", " ").replace("'", " ").split()
+    return [CITY_TOKEN_ALIASES.get(token, token) for token in tokens]
+
+
+def commune_coordinates(ville_key: str, department: Optional[str]) -> Optional[Coords]:
+    # "PARIS 15E ARRONDISSEMENT" or "LYON CEDEX 03" fall back to their commune.
+    if not department:
+        return None
+    tokens = city_tokens(ville_key)
+    while tokens:
+        coords = CITY_COORDS.get((department, " ".join(tokens)))
+        if coords is not None or len(tokens) == 1 or not DISTRICT_TOKEN_RE.fullmatch(tokens[-1]):
+            return coords
+        tokens.pop()
+    return None
+
+
+def city_coordinates(ville_key: str, department: Optional[str]) -> Optional[Coords]:
+    # Communes without coordinates of their own are placed at their department
+    # seat, so they still weigh in the clusters of their area.
+    coords = commune_coordinates(ville_key, department)
+    if coords is None and department:
+        return DEPARTMENT_SEATS.get(department)
+    return coords
+
+
+def city_points(city_rows) -> List[GeoPoint]:
+    points = []
+    for row in city_rows:
+        coords = city_coordinates(row["ville_key"], row["dept"])
+        if coords is not None:
+            points.append(GeoPoint((row["ville_key"], row["dept"]), coords[0], coords[1], row["count"], row))
+    return points
+
+
+def unlocated_cities(city_rows) -> List[Dict[str, object]]:
+    return [row for row in city_rows if city_coordinates(row["ville_key"], row["dept"]) is None]
+
+
+def seat_located_cities(city_rows) -> List[Dict[str, object]]:
+    return [
+        row
+        for row in city_rows
+        if row["dept"] in DEPARTMENT_SEATS and commune_coordinates(row["ville_key"], row["dept"]) is None
+    ]
+
+
+def build_city_index(city_rows) -> GridIndex:
+    return GridIndex(city_points(city_rows))
+
+
+def cluster_centers(clusters: List[Cluster]) -> List[GeoPoint]:
+    return [GeoPoint(cluster.name, cluster.center[0], cluster.center[1], cluster.total, cluster) for cluster in clusters]
+
+
+def locate_city(name: str, city_rows) -> Optional[Coords]:
+    # City rows come sorted by TAM count, so a homonym resolves to its largest
+    # occurrence first, then to any department known for that name.
+    ville_key = normalize_city_key(name)
+    city = " ".join(city_tokens(ville_key))
+    known = sorted({dept for dept, known_city in CITY_COORDS if known_city == city})
+    departments = [row["dept"] for row in city_rows if row["ville_key"] == ville_key] + known
+    return next(filter(None, (city_coordinates(ville_key, dept) for dept in departments)), None)
+
+
+def build_coord_csv(selected_cities: List[Tuple[str, str, str, Optional[Coords]]]) -> None:
     ensure_output_dir()
     path = os.path.join(OUTPUT_DIR, "prompt11_villes_coordonnees.csv")
     with open(path, "w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["ville", "departement", "event", "latitude", "longitude"])
-        for ville_label, dept, event, ville_key in selected_cities:
-            coords = CITY_COORDS.get(ville_key)
-            if coords is None and ville_key.startswith("PARIS"):
-                coords = CITY_COORDS.get("PARIS")
-            if coords is None and " " in ville_key:
-                base = ville_key.split(" ")[0]
-                coords = CITY_COORDS.get(base)
+        for ville_label, dept, event, coords in selected_cities:
             lat = f"{coords[0]:.4f}" if coords else ""
             lon = f"{coords[1]:.4f}" if coords else ""
             writer.writerow([ville_label, dept, event, lat, lon])
 
 
+def location_summary(rows) -> str:
+    return f"{len(rows)} villes, {format_int(sum(row['count'] for row in rows))} OF TAM"
+
+
 def build_tables():
     records = load_records()
     tam_records = filter_tam(records)
     city_stats, dept_totals, total_tam = build_city_stats(tam_records)
-    specialites = compute_city_specialites(tam_records)
-    attach_specialites(city_stats, specialites)
 
     table1_rows, city_rows = compute_table1(city_stats, dept_totals)
     table1 = [[
@@ -843,7 +716,7 @@ def build_tables():
         "Potentiel event",
     ]] + table1_rows
 
-    cluster_rows = compute_cluster_table(city_rows, dept_totals, total_tam)
+    cluster_rows = compute_cluster_table(detect_clusters(city_rows), total_tam)
     table2 = [[
         "Cluster",
         "Départements",
@@ -912,6 +785,15 @@ def build_tables():
     }
 
     synthesis = build_synthesis(cluster_rows, city_rows, mid_cities, deserts, total_tam, paris_total)
+    coverage = [
+        ("Villes placées au chef-lieu de leur département", seat_located_cities(city_rows)),
+        ("Villes sans coordonnées (exclues des clusters)", unlocated_cities(city_rows)),
+    ]
+    position = 1 + min(len(cluster_rows), 5)
+    synthesis[position:position] = [f"{label} : {location_summary(rows)}" for label, rows in coverage]
+    for label, rows in coverage:
+        if rows:
+            print(f"Attention : {label.lower()} : {location_summary(rows)}")
     write_markdown(tables, synthesis)
 
     selected_for_csv = []
@@ -921,7 +803,7 @@ def build_tables():
                 entry["name"],
                 entry.get("dept", ""),
                 entry["event"],
-                entry["ville_key"],
+                entry["coords"],
             )
         )
     build_coord_csv(selected_for_csv)
@@ -939,9 +821,8 @@ def build_planning(cluster_rows, city_rows):
         top_cities = row[4]
         primary_city = top_cities.split(",")[0] if top_cities else name
         primary_city_name = primary_city.split(" (")[0].strip()
-        primary_key = normalize_city_key(primary_city_name)
         dept = row[1]
-        cluster_events.append((name, count, evt, dept, primary_key, primary_city_name))
+        cluster_events.append((name, count, evt, dept, locate_city(primary_city_name, city_rows), primary_city_name))
 
     city_events = []
     for row in city_rows:
@@ -954,7 +835,7 @@ def build_planning(cluster_rows, city_rows):
                 count,
                 event_type(count),
                 format_department(row["dept"]),
-                row["ville_key"],
+                city_coordinates(row["ville_key"], row["dept"]),
                 row["ville_label"],
             )
         )
@@ -965,7 +846,7 @@ def build_planning(cluster_rows, city_rows):
     for idx, label in enumerate(month_labels):
         if idx >= len(combined):
             break
-        name, count, evt, dept, ville_key, base_label = combined[idx]
+        name, count, evt, dept, coords, base_label = combined[idx]
         budget = "5-10K€" if evt == "Conférence" else "2-3K€" if evt == "Meetup" else "1-2K€"
         planning_entries.append(
             {
@@ -976,7 +857,7 @@ def build_planning(cluster_rows, city_rows):
                 "budget": budget,
                 "priority": priorities[idx],
                 "dept": dept,
-                "ville_key": ville_key,
+                "coords": coords,
             }
         )
     return planning_entries
@@ -1018,5 +899,36 @@ def build_synthesis(cluster_rows, city_rows, mid_cities, deserts, total_tam, par
     return synthesis
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Clusters géographiques des OF TAM (3-10 formateurs).")
+    parser.add_argument("--near", metavar="VILLE", help="villes TAM situées autour de VILLE")
+    parser.add_argument("--radius", type=float, default=30.0, help="rayon de recherche en km (défaut: 30)")
+    parser.add_argument("--nearest-cluster", metavar="VILLE", help="cluster dense le plus proche de VILLE")
+    args = parser.parse_args()
+    if not args.near and not args.nearest_cluster:
+        build_tables()
+        return
+
+    city_stats, dept_totals, _ = build_city_stats(filter_tam(load_records()))
+    _, city_rows = compute_table1(city_stats, dept_totals)
+    for name in (args.near, args.nearest_cluster):
+        if name and locate_city(name, city_rows) is None:
+            parser.error(f"coordonnées inconnues pour {name}")
+
+    if args.near:
+        hits = build_city_index(city_rows).within(locate_city(args.near, city_rows), args.radius)
+        total = sum(point.weight for _, point in hits)
+        print(f"{format_int(int(total))} OF TAM à moins de {args.radius:g} km de {args.near}")
+        for distance, point in hits:
+            row = point.data
+            print(f"- {row['ville_label']} ({format_department(row['dept'])}) : {format_int(row['count'])} OF, {distance:.0f} km")
+
+    if args.nearest_cluster:
+        centers = GridIndex(cluster_centers(detect_clusters(city_rows)))
+        for distance, point in centers.nearest(locate_city(args.nearest_cluster, city_rows)):
+            cluster = point.data
+            print(f"{cluster.name} ({', '.join(cluster.departments)}) : {distance:.0f} km, {format_int(cluster.total)} OF TAM, rayon {cluster.radius_km} km")
+
+
 if __name__ == "__main__":
-    build_tables()
+    main()
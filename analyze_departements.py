@@ -1,14 +1,13 @@
 import csv
 import os
-import statistics
-import zipfile
-import xml.etree.ElementTree as ET
-from collections import Counter, defaultdict
-from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from of_dataset import XLSX_PATH, intern_text, load_table
+from of_geo import DEPARTMENT_NAMES, department_column
+from of_groupby import Count, Mean, Sum, Tally, group_by
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 # Column indices based on header inspection
 COL_DENOMINATION = 2
@@ -19,118 +18,6 @@ COL_ACTIONS_FORMATION = 9
 COL_NB_STAGIAIRES = 27
 COL_EFFECTIF_FORMATEURS = 29
 
-DEPARTMENT_NAMES: Dict[str, str] = {
-    "01": "Ain",
-    "02": "Aisne",
-    "03": "Allier",
-    "04": "Alpes-de-Haute-Provence",
-    "05": "Hautes-Alpes",
-    "06": "Alpes-Maritimes",
-    "07": "Ardèche",
-    "08": "Ardennes",
-    "09": "Ariège",
-    "10": "Aube",
-    "11": "Aude",
-    "12": "Aveyron",
-    "13": "Bouches-du-Rhône",
-    "14": "Calvados",
-    "15": "Cantal",
-    "16": "Charente",
-    "17": "Charente-Maritime",
-    "18": "Cher",
-    "19": "Corrèze",
-    "2A": "Corse-du-Sud",
-    "2B": "Haute-Corse",
-    "21": "Côte-d'Or",
-    "22": "Côtes-d'Armor",
-    "23": "Creuse",
-    "24": "Dordogne",
-    "25": "Doubs",
-    "26": "Drôme",
-    "27": "Eure",
-    "28": "Eure-et-Loir",
-    "29": "Finistère",
-    "30": "Gard",
-    "31": "Haute-Garonne",
-    "32": "Gers",
-    "33": "Gironde",
-    "34": "Hérault",
-    "35": "Ille-et-Vilaine",
-    "36": "Indre",
-    "37": "Indre-et-Loire",
-    "38": "Isère",
-    "39": "Jura",
-    "40": "Landes",
-    "41": "Loir-et-Cher",
-    "42": "Loire",
-    "43": "Haute-Loire",
-    "44": "Loire-Atlantique",
-    "45": "Loiret",
-    "46": "Lot",
-    "47": "Lot-et-Garonne",
-    "48": "Lozère",
-    "49": "Maine-et-Loire",
-    "50": "Manche",
-    "51": "Marne",
-    "52": "Haute-Marne",
-    "53": "Mayenne",
-    "54": "Meurthe-et-Moselle",
-    "55": "Meuse",
-    "56": "Morbihan",
-    "57": "Moselle",
-    "58": "Nièvre",
-    "59": "Nord",
-    "60": "Oise",
-    "61": "Orne",
-    "62": "Pas-de-Calais",
-    "63": "Puy-de-Dôme",
-    "64": "Pyrénées-Atlantiques",
-    "65": "Hautes-Pyrénées",
-    "66": "Pyrénées-Orientales",
-    "67": "Bas-Rhin",
-    "68": "Haut-Rhin",
-    "69": "Rhône",
-    "70": "Haute-Saône",
-    "71": "Saône-et-Loire",
-    "72": "Sarthe",
-    "73": "Savoie",
-    "74": "Haute-Savoie",
-    "75": "Paris",
-    "76": "Seine-Maritime",
-    "77": "Seine-et-Marne",
-    "78": "Yvelines",
-    "79": "Deux-Sèvres",
-    "80": "Somme",
-    "81": "Tarn",
-    "82": "Tarn-et-Garonne",
-    "83": "Var",
-    "84": "Vaucluse",
-    "85": "Vendée",
-    "86": "Vienne",
-    "87": "Haute-Vienne",
-    "88": "Vosges",
-    "89": "Yonne",
-    "90": "Territoire de Belfort",
-    "91": "Essonne",
-    "92": "Hauts-de-Seine",
-    "93": "Seine-Saint-Denis",
-    "94": "Val-de-Marne",
-    "95": "Val-d'Oise",
-    "971": "Guadeloupe",
-    "972": "Martinique",
-    "973": "Guyane",
-    "974": "La Réunion",
-    "975": "Saint-Pierre-et-Miquelon",
-    "976": "Mayotte",
-    "977": "Saint-Barthélemy",
-    "978": "Saint-Martin",
-    "986": "Wallis-et-Futuna",
-    "987": "Polynésie française",
-    "988": "Nouvelle-Calédonie",
-    "989": "Île de Clipperton",
-    "990": "Monaco",
-}
-
 REGION_NAMES: Dict[str, str] = {
     "01": "Guadeloupe",
     "02": "Martinique",
@@ -206,48 +93,20 @@ CLUSTERS = [
 ]
 
 
-def ensure_output_dir() -> None:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+@dataclass(slots=True)
+class Record:
+    denomination: str
+    code_postal_raw: Optional[str]
+    ville: Optional[str]
+    code_region: Optional[str]
+    actions_formation: Optional[float]
+    nb_stagiaires: Optional[float]
+    effectif_formateurs: Optional[float]
+    departement: Optional[str]
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
+def ensure_output_dir() -> None:
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
 def parse_float(value: Optional[str]) -> Optional[float]:
@@ -262,42 +121,6 @@ def parse_float(value: Optional[str]) -> Optional[float]:
         return None
 
 
-def normalize_postal_code(value: Optional[str]) -> Optional[str]:
-    if value is None:
-        return None
-    text = str(value).strip()
-    if not text or text.lower() == "nan":
-        return None
-    text = text.replace(" ", "")
-    if text.endswith(".0"):
-        text = text[:-2]
-    if len(text) >= 3 and text[:3].isdigit() and text[:2] in {"97", "98"}:
-        return text[:3]
-    digits = "".join(ch for ch in text if ch.isdigit())
-    if len(digits) >= 3 and digits[:2] in {"97", "98"}:
-        if digits.startswith("97") and len(digits) >= 3:
-            return digits[:3]
-        if digits.startswith("98") and len(digits) >= 3:
-            return digits[:3]
-    if len(digits) == 0:
-        return None
-    if len(digits) < 5:
-        digits = digits.zfill(5)
-    if digits.startswith("20"):
-        third = digits[2] if len(digits) > 2 else "0"
-        return "2A" if third in {"0", "1"} else "2B"
-    return digits[:2]
-
-
-def extract_department(code_postal: Optional[str]) -> Optional[str]:
-    dept = normalize_postal_code(code_postal)
-    if dept is None:
-        return None
-    if dept in DEPARTMENT_NAMES:
-        return dept
-    return dept
-
-
 def clean_region_code(value: Optional[str]) -> Optional[str]:
     if value is None:
         return None
@@ -311,39 +134,31 @@ def clean_region_code(value: Optional[str]) -> Optional[str]:
     return text
 
 
-def load_records() -> List[Dict[str, Optional[str]]]:
-    records: List[Dict[str, Optional[str]]] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                if row_index == 1:
-                    elem.clear()
-                    continue
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                record = {
-                    "denomination": values.get(COL_DENOMINATION, ""),
-                    "code_postal_raw": values.get(COL_CODE_POSTAL),
-                    "ville": values.get(COL_VILLE),
-                    "code_region": clean_region_code(values.get(COL_CODE_REGION)),
-                    "actions_formation": parse_float(values.get(COL_ACTIONS_FORMATION)),
-                    "nb_stagiaires": parse_float(values.get(COL_NB_STAGIAIRES)),
-                    "effectif_formateurs": parse_float(values.get(COL_EFFECTIF_FORMATEURS)),
-                }
-                record["departement"] = extract_department(record["code_postal_raw"])
-                records.append(record)
-                elem.clear()
+def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
+    records: List[Record] = []
+    rows = table.select(
+        COL_DENOMINATION,
+        COL_CODE_POSTAL,
+        COL_VILLE,
+        COL_CODE_REGION,
+        (COL_ACTIONS_FORMATION, parse_float),
+        (COL_NB_STAGIAIRES, parse_float),
+        (COL_EFFECTIF_FORMATEURS, parse_float),
+    )
+    for departement, (denomination, code_postal, ville, code_region, actions, stagiaires, effectif) in zip(department_column(table, COL_CODE_POSTAL), rows):
+        records.append(
+            Record(
+                denomination=denomination or "",
+                code_postal_raw=code_postal,
+                ville=intern_text(ville),
+                code_region=intern_text(clean_region_code(code_region)),
+                actions_formation=actions,
+                nb_stagiaires=stagiaires,
+                effectif_formateurs=effectif,
+                departement=departement,
+            )
+        )
     return records
 
 
@@ -359,83 +174,55 @@ def format_float(value: Optional[float], decimals: int = 1) -> str:
     return f"{value:,.{decimals}f}".replace(",", " ")
 
 
-def compute_department_stats(records: List[Dict[str, Optional[str]]]):
-    dept_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
-        "count": 0,
-        "with_city": 0,
-        "with_stagiaires": 0,
-        "stagiaires_sum": 0.0,
-        "stagiaires_count": 0,
-        "unique_cities": Counter(),
-    })
-    for rec in records:
-        dept = rec.get("departement")
-        if not dept:
-            continue
-        stats = dept_stats[dept]
-        stats["count"] += 1
-        ville = (rec.get("ville") or "").strip().upper()
-        if ville:
-            stats["with_city"] += 1
-            stats["unique_cities"][ville] += 1
-        if rec.get("nb_stagiaires") is not None:
-            stats["with_stagiaires"] += 1
-            stats["stagiaires_sum"] += float(rec["nb_stagiaires"])
-            stats["stagiaires_count"] += 1
-    return dept_stats
-
-
-def compute_region_stats(records: List[Dict[str, Optional[str]]]):
-    region_totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {
-        "with_cp": 0,
-        "without_cp": 0,
-    })
-    for rec in records:
-        region = rec.get("code_region")
-        if not region:
-            continue
-        if rec.get("departement"):
-            region_totals[region]["with_cp"] += 1
-        else:
-            region_totals[region]["without_cp"] += 1
-    return region_totals
-
-
-def top_cities(records: List[Dict[str, Optional[str]]], limit: int = 20) -> List[Dict[str, object]]:
-    city_counts: Dict[Tuple[str, str], Dict[str, object]] = defaultdict(lambda: {
-        "count": 0,
-        "dept": None,
-        "nb_stagiaires": [],
-    })
-    for rec in records:
-        dept = rec.get("departement")
-        if not dept:
-            continue
-        ville_raw = (rec.get("ville") or "").strip()
-        if not ville_raw:
-            continue
-        ville = ville_raw.upper()
-        key = (ville, dept)
-        city_counts[key]["count"] += 1
-        city_counts[key]["dept"] = dept
-        if rec.get("nb_stagiaires") is not None:
-            city_counts[key]["nb_stagiaires"].append(float(rec["nb_stagiaires"]))
-    rows: List[Tuple[str, str, float, float]] = []
-    for (ville, dept), data in city_counts.items():
-        count = data["count"]
-        avg_stagiaires = (
-            statistics.mean(data["nb_stagiaires"]) if data["nb_stagiaires"] else 0.0
-        )
-        rows.append((ville, dept, count, avg_stagiaires))
-    rows.sort(key=lambda x: x[2], reverse=True)
+def city_upper(rec: Record) -> Optional[str]:
+    return (rec.ville or "").strip().upper() or None
+
+
+def stagiaires_value(rec: Record) -> Optional[float]:
+    return float(rec.nb_stagiaires) if rec.nb_stagiaires is not None else None
+
+
+def compute_department_stats(records: List[Record]):
+    return group_by(
+        records,
+        lambda rec: rec.departement or None,
+        {
+            "count": Count(),
+            "with_city": Count(city_upper),
+            "with_stagiaires": Count("nb_stagiaires"),
+            "stagiaires_sum": Sum(stagiaires_value, start=0.0),
+            "stagiaires_count": Count("nb_stagiaires"),
+            "unique_cities": Tally(city_upper),
+        },
+    )
+
+
+def compute_region_stats(records: List[Record]):
+    return group_by(
+        records,
+        lambda rec: rec.code_region or None,
+        {
+            "with_cp": Count(where=lambda rec: rec.departement),
+            "without_cp": Count(where=lambda rec: not rec.departement),
+        },
+    )
+
+
+def top_cities(records: List[Record], limit: int = 20) -> List[Dict[str, object]]:
+    city_counts = group_by(
+        records,
+        lambda rec: (city_upper(rec), rec.departement or None),
+        {"count": Count(), "avg_stagiaires": Mean(stagiaires_value)},
+    )
+    rows = sorted(city_counts.items(), key=lambda item: item[1]["count"], reverse=True)
     return [
         {
             "ville": ville,
             "dept": dept,
-            "count": int(count),
-            "avg_stagiaires": avg_stagiaires,
+            "count": int(data["count"]),
+            "avg_stagiaires": data["avg_stagiaires"] or 0.0,
         }
-        for ville, dept, count, avg_stagiaires in rows[:limit]
+        for (ville, dept), data in rows[:limit]
     ]
 
 
@@ -598,7 +385,7 @@ def main():
     ensure_output_dir()
     records = load_records()
     total_records = len(records)
-    records_with_cp = [r for r in records if r.get("departement")]
+    records_with_cp = [r for r in records if r.departement]
     dept_stats = compute_department_stats(records)
     dept_summary = summarize_department_table(dept_stats, total_records)
     top100 = dept_summary[:100]
@@ -1,13 +1,11 @@
 import os
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
 import math
 import statistics
 
-XLSX_PATH = "OF 3-10.xlsx"
+from of_dataset import XLSX_PATH, load_table
+
 OUTPUT_DIR = "analysis_outputs"
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 # Column indices based on header inspection
 COL_DENOMINATION = 2
@@ -15,46 +13,6 @@ COL_NB_STAGIAIRES = 27
 COL_EFFECTIF = 29
 
 
-def load_shared_strings(zf):
-    shared_strings = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref):
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell, shared_strings):
-    t = cell.attrib.get("t")
-    if t == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if t == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t_el.text or "" for t_el in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_int(value):
     if value is None:
         return None
@@ -82,40 +40,22 @@ def parse_float(value):
 
 
 def load_records():
+    table = load_table(XLSX_PATH)
     records = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            row_iter = ET.iterparse(f, events=("end",))
-            for event, elem in row_iter:
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                if row_index == 1:
-                    elem.clear()
-                    continue
-                values = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                denomination = values.get(COL_DENOMINATION)
-                effectif = parse_int(values.get(COL_EFFECTIF))
-                nb_stagiaires = parse_float(values.get(COL_NB_STAGIAIRES))
-                if effectif is None:
-                    effectif = 0
-                records.append(
-                    {
-                        "denomination": denomination or "",
-                        "effectif": effectif,
-                        "nb_stagiaires": nb_stagiaires,
-                    }
-                )
-                elem.clear()
+    for denomination, effectif, nb_stagiaires in table.select(
+        COL_DENOMINATION,
+        (COL_EFFECTIF, parse_int),
+        (COL_NB_STAGIAIRES, parse_float),
+    ):
+        if effectif is None:
+            effectif = 0
+        records.append(
+            {
+                "denomination": denomination or "",
+                "effectif": effectif,
+                "nb_stagiaires": nb_stagiaires,
+            }
+        )
     return records
 
 
@@ -9,8 +9,8 @@ from analyze_specialites import (
     Record,
     format_float,
     format_int,
+    filter_tam,
     load_records,
-    is_tam,
 )
 
 OUTPUT_DIR = "analysis_outputs"
@@ -497,7 +497,7 @@ def build_summary(
 def main() -> None:
     ensure_output_dir()
     records = load_records()
-    tam_records = [rec for rec in records if is_tam(rec)]
+    tam_records = filter_tam(records)
 
     table1, exclusive = compute_table1(records, tam_records)
     table2 = compute_table2(tam_records)
@@ -1,15 +1,14 @@
 import math
 import os
 import statistics
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from of_arrays import Mask, mask_and, numeric_column, take
+from of_dataset import XLSX_PATH, OFTable, load_table
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 TARGET_MIN = 3
 TARGET_MAX = 10
@@ -58,7 +57,7 @@ SEGMENTS = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     denomination: str
     effectif: Optional[int]
@@ -83,46 +82,6 @@ def ensure_output_dir():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]):
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t_el.text or "" for t_el in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_int(value) -> Optional[int]:
     if value is None:
         return None
@@ -150,88 +109,38 @@ def parse_float(value) -> Optional[float]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {
-                "denomination": None,
-                "effectif": None,
-                "stagiaires": None,
-                "actions": None,
-                "region": None,
-            }
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                if row_index == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    for key, header in [
-                        ("denomination", "denominationSociale"),
-                        ("effectif", "informationsDeclarees.effectifFormateurs"),
-                        ("stagiaires", "informationsDeclarees.nbStagiaires"),
-                        ("actions", "certifications.actionsDeFormation"),
-                        ("region", "adressePhysiqueOrganismeFormation.codeRegion"),
-                    ]:
-                        target_indices[key] = next(
-                            (idx for idx, name in header_map.items() if name == header),
-                            None,
-                        )
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                values: Dict[int, str] = {}
-                found = set()
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                        found.add(col_idx)
-                    if found == indices:
-                        break
-
-                records.append(
-                    Record(
-                        denomination=str(values.get(target_indices["denomination"], "")),
-                        effectif=parse_int(values.get(target_indices["effectif"])),
-                        nb_stagiaires=parse_float(values.get(target_indices["stagiaires"])),
-                        actions_cert=parse_float(values.get(target_indices["actions"])),
-                        code_region=parse_int(values.get(target_indices["region"])),
-                    )
-                )
-                elem.clear()
+    for denomination, effectif, stagiaires, actions, region in table.select(
+        "denominationSociale",
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("certifications.actionsDeFormation", parse_float),
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+    ):
+        records.append(
+            Record(
+                denomination=str(denomination or ""),
+                effectif=effectif,
+                nb_stagiaires=stagiaires,
+                actions_cert=actions,
+                code_region=region,
+            )
+        )
     return records
 
 
-def filter_tam(records: Iterable[Record]) -> List[Record]:
-    result: List[Record] = []
-    for rec in records:
-        if rec.effectif is None or not (TARGET_MIN <= rec.effectif <= TARGET_MAX):
-            continue
-        if rec.actions_cert is None or rec.actions_cert <= 0:
-            continue
-        if rec.nb_stagiaires is None or rec.nb_stagiaires <= 0:
-            continue
-        if rec.livrables is None:
-            continue
-        result.append(rec)
-    return result
+def tam_mask(table: OFTable) -> Mask:
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_float)
+    return mask_and(effectif.between(TARGET_MIN, TARGET_MAX), actions.positive(), stagiaires.positive())
+
+
+def filter_tam(records: Sequence[Record]) -> List[Record]:
+    # records come from load_records, one per workbook row; livrables is always
+    # set once effectif and nbStagiaires are.
+    return take(records, tam_mask(load_table(XLSX_PATH)))
 
 
 def safe_mean(values: Iterable[float]) -> Optional[float]:
@@ -1,19 +1,13 @@
 import os
 import statistics
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from compute_tam import (
-    NS,
-    column_ref_to_index,
-    get_cell_value,
-    load_shared_strings,
-)
+from of_dataset import XLSX_PATH, load_table
+from of_geo import department_column
+from of_groupby import Count, Mean, Median, Sum, Tally, group_by
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
 
 COL_REGION = 8
@@ -116,19 +110,31 @@ class RegionMetrics:
     tam_stag_sum: float = 0.0
     tam_actions_sum: float = 0.0
     tam_effectif_sum: int = 0
-    tam_stag_list: List[float] = field(default_factory=list)
-    tam_actions_list: List[float] = field(default_factory=list)
-    tam_effectif_list: List[int] = field(default_factory=list)
+    tam_stag_mean: Optional[float] = None
+    tam_stag_median: Optional[float] = None
+    tam_actions_mean: Optional[float] = None
+    tam_effectif_mean: Optional[float] = None
     tam_distribution: Counter = field(default_factory=Counter)
     departments: Counter = field(default_factory=Counter)
     cities: Counter = field(default_factory=Counter)
     specialities: Counter = field(default_factory=Counter)
     soft_skills: int = 0
 
-    def record_cp(self, has_cp: bool):
-        self.base_total += 1
-        if has_cp:
-            self.cp_filled += 1
+
+@dataclass(slots=True)
+class RegionRow:
+    region: str
+    has_cp: bool
+    effectif: Optional[int]
+    actions: Optional[float]
+    nb_stagiaires: Optional[float]
+    in_target: bool
+    certified: bool
+    tam: bool
+    department: Optional[str] = None
+    city: Optional[str] = None
+    specialities: Tuple[str, ...] = ()
+    soft: bool = False
 
 
 SOFT_CODES_PREFIXES = {"15", "14"}
@@ -173,18 +179,6 @@ def ensure_output_dir():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def safe_mean(values: List[float]) -> Optional[float]:
-    if not values:
-        return None
-    return sum(values) / len(values)
-
-
-def safe_median(values: List[float]) -> Optional[float]:
-    if not values:
-        return None
-    return statistics.median(values)
-
-
 def format_number(value: Optional[float], decimals: int = 0) -> str:
     if value is None:
         return "-"
@@ -222,20 +216,6 @@ def is_soft_speciality(code: Optional[str], label: Optional[str]) -> bool:
     return False
 
 
-def extract_department(code_postal: Optional[str]) -> Optional[str]:
-    if not code_postal:
-        return None
-    text = code_postal.strip()
-    if not text:
-        return None
-    if len(text) >= 2:
-        if text[:2].isdigit():
-            return text[:2]
-    if len(text) >= 3 and text[:3].isdigit():
-        return text[:3]
-    return None
-
-
 def format_city(name: Optional[str]) -> Optional[str]:
     if not name:
         return None
@@ -245,6 +225,74 @@ def format_city(name: Optional[str]) -> Optional[str]:
     return cleaned.title()
 
 
+def effectif_bucket(row: RegionRow) -> str:
+    if row.effectif <= 5:
+        return "3-5"
+    if row.effectif <= 8:
+        return "6-8"
+    return "9-10"
+
+
+def iter_region_rows() -> Iterator[RegionRow]:
+    table = load_table(XLSX_PATH)
+    departments = department_column(table, COL_CODE_POSTAL)
+    for department, (
+        region,
+        code_postal,
+        effectif,
+        actions,
+        nb_stagiaires,
+        ville,
+        code1,
+        label1,
+        code2,
+        label2,
+        code3,
+        label3,
+    ) in zip(departments, table.select(
+        (COL_REGION, parse_int),
+        COL_CODE_POSTAL,
+        (COL_EFFECTIF, parse_int),
+        (COL_ACTIONS, parse_float),
+        (COL_NB_STAGIAIRES, parse_float),
+        COL_VILLE,
+        21,
+        COL_SPECIALITE1,
+        23,
+        COL_SPECIALITE2,
+        25,
+        COL_SPECIALITE3,
+    )):
+        in_target = effectif is not None and TARGET_MIN <= effectif <= TARGET_MAX
+        certified = in_target and actions is not None and actions > 0
+        row = RegionRow(
+            region=normalize_region(region),
+            has_cp=bool(code_postal and str(code_postal).strip()),
+            effectif=effectif,
+            actions=actions,
+            nb_stagiaires=nb_stagiaires,
+            in_target=in_target,
+            certified=certified,
+            tam=certified and nb_stagiaires is not None and nb_stagiaires > 0,
+        )
+        if row.tam:
+            speciality_pairs = []
+            for code_value, label_value in [
+                (code1, label1),
+                (code2, label2),
+                (code3, label3),
+            ]:
+                code_clean = code_value.strip() if code_value else None
+                label_clean = label_value.strip() if label_value else None
+                if code_clean or label_clean:
+                    speciality_pairs.append((code_clean, label_clean))
+            row.department = department
+            row.city = format_city(ville)
+            row.specialities = tuple(dict.fromkeys(label for _, label in speciality_pairs if label))
+            row.soft = any(is_soft_speciality(code, label) for code, label in speciality_pairs)
+        yield row
+
+
 def load_region_metrics() -> Dict[str, RegionMetrics]:
     metrics: Dict[str, RegionMetrics] = {
         code: RegionMetrics(code=code, name=name)
@@ -252,95 +300,34 @@ def load_region_metrics() -> Dict[str, RegionMetrics]:
     }
     metrics["DOM-TOM"] = RegionMetrics(code="DOM-TOM", name="DOM-TOM")
 
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                if row_index == 1:
-                    elem.clear()
-                    continue
-
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-
-                code_region = normalize_region(parse_int(values.get(COL_REGION)))
-                metric = metrics[code_region]
-
-                code_postal = values.get(COL_CODE_POSTAL)
-                metric.record_cp(bool(code_postal and str(code_postal).strip()))
-
-                effectif = parse_int(values.get(COL_EFFECTIF))
-                if effectif is not None and TARGET_MIN <= effectif <= TARGET_MAX:
-                    metric.of_3_10 += 1
-
-                actions = parse_float(values.get(COL_ACTIONS))
-                nb_stagiaires = parse_float(values.get(COL_NB_STAGIAIRES))
-
-                if effectif is not None and TARGET_MIN <= effectif <= TARGET_MAX:
-                    if actions is not None and actions > 0:
-                        metric.certified += 1
-                        if nb_stagiaires is not None and nb_stagiaires > 0:
-                            metric.tam_total += 1
-                            metric.tam_stag_sum += nb_stagiaires
-                            metric.tam_actions_sum += actions
-                            metric.tam_effectif_sum += effectif
-                            metric.tam_stag_list.append(nb_stagiaires)
-                            metric.tam_actions_list.append(actions)
-                            metric.tam_effectif_list.append(effectif)
-
-                            if effectif <= 5:
-                                metric.tam_distribution["3-5"] += 1
-                            elif effectif <= 8:
-                                metric.tam_distribution["6-8"] += 1
-                            else:
-                                metric.tam_distribution["9-10"] += 1
-
-                            department = extract_department(code_postal)
-                            if department:
-                                metric.departments[department] += 1
-
-                            city = format_city(values.get(COL_VILLE))
-                            if city:
-                                metric.cities[city] += 1
-
-                            speciality_pairs = []
-                            for code_idx, label_idx in [
-                                (21, COL_SPECIALITE1),
-                                (23, COL_SPECIALITE2),
-                                (25, COL_SPECIALITE3),
-                            ]:
-                                code_value = values.get(code_idx)
-                                label_value = values.get(label_idx)
-                                code_clean = code_value.strip() if code_value else None
-                                label_clean = label_value.strip() if label_value else None
-                                if code_clean or label_clean:
-                                    speciality_pairs.append((code_clean, label_clean))
-
-                            seen_labels = set()
-                            for _, label in speciality_pairs:
-                                if label and label not in seen_labels:
-                                    metric.specialities[label] += 1
-                                    seen_labels.add(label)
-
-                            soft_flag = any(
-                                is_soft_speciality(code, label)
-                                for code, label in speciality_pairs
-                            )
-                            if soft_flag:
-                                metric.soft_skills += 1
-
-                elem.clear()
-
+    def tam(row: RegionRow) -> bool:
+        return row.tam
+
+    stats = group_by(
+        iter_region_rows(),
+        "region",
+        {
+            "base_total": Count(),
+            "cp_filled": Count(where=lambda row: row.has_cp),
+            "of_3_10": Count(where=lambda row: row.in_target),
+            "certified": Count(where=lambda row: row.certified),
+            "tam_total": Count(where=tam),
+            "tam_stag_sum": Sum("nb_stagiaires", where=tam, start=0.0),
+            "tam_actions_sum": Sum("actions", where=tam, start=0.0),
+            "tam_effectif_sum": Sum("effectif", where=tam),
+            "tam_stag_mean": Mean("nb_stagiaires", where=tam),
+            "tam_stag_median": Median("nb_stagiaires", where=tam),
+            "tam_actions_mean": Mean("actions", where=tam),
+            "tam_effectif_mean": Mean("effectif", where=tam),
+            "tam_distribution": Tally(effectif_bucket, where=tam),
+            "departments": Tally("department", where=tam),
+            "cities": Tally("city", where=tam),
+            "specialities": Tally("specialities", where=tam, many=True),
+            "soft_skills": Count(where=lambda row: row.tam and row.soft),
+        },
+    )
+    for code, values in stats.items():
+        metrics[code] = RegionMetrics(code=code, name=metrics[code].name, **values)
     return metrics
 
 
@@ -363,10 +350,10 @@ def compute_region_profiles(metrics: Dict[str, RegionMetrics]):
         base_share = (metric.base_total / total_base) if total_base else 0
         tam_share = (metric.tam_total / total_tam) if total_tam else 0
         stag_share = (metric.tam_stag_sum / total_stagiaires) if total_stagiaires else 0
-        stag_mean = safe_mean(metric.tam_stag_list)
-        stag_median = safe_median(metric.tam_stag_list)
-        actions_mean = safe_mean(metric.tam_actions_list)
-        effectif_mean = safe_mean(metric.tam_effectif_list)
+        stag_mean = metric.tam_stag_mean
+        stag_median = metric.tam_stag_median
+        actions_mean = metric.tam_actions_mean
+        effectif_mean = metric.tam_effectif_mean
         cert_rate = (metric.certified / metric.of_3_10) if metric.of_3_10 else None
         cp_rate = (metric.cp_filled / metric.base_total) if metric.base_total else None
         production_month = (actions_mean / 12) if actions_mean is not None else None
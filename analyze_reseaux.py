@@ -1,21 +1,25 @@
 import csv
+import heapq
 import os
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
 from dataclasses import dataclass
+from itertools import groupby
+from operator import itemgetter
 from statistics import mean
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from analyze_specialites import MACRO_THEMES, classify_specialite
+from of_dataset import XLSX_PATH, intern_text, load_table
+from of_entities import SIREN_LENGTH, SIRET_LENGTH, declaration_numbers, load_entity_index, normalize_name, parse_identifier
+from of_groupby import Collect, Sum, Tally, group_by
+from of_matching import NameMatcher
 
-
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MARKDOWN = os.path.join(OUTPUT_DIR, "reseaux_nationaux.md")
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, "reseaux_top50.csv")
+OUTPUT_MERGES_CSV = os.path.join(OUTPUT_DIR, "reseaux_rapprochements.csv")
 
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+MAX_MERGE_PROPOSALS = 10
 
 TARGET_MIN = 3
 TARGET_MAX = 10
@@ -51,7 +55,7 @@ REGION_NAMES: Dict[int, str] = {
 PRIORITY_THEMES = {"Soft Skills", "Tech/Digital", "Commerce/Gestion", "Santé"}
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     siren: str
     siret: str
@@ -67,33 +71,16 @@ class Record:
         return classify_specialite(self.specialite_label)
 
 
-@dataclass
+@dataclass(slots=True)
 class Network:
     siren: str
     denomination: str
     etablissements: List[Record]
-
-    @property
-    def siret_count(self) -> int:
-        return len({rec.siret for rec in self.etablissements if rec.siret})
-
-    @property
-    def effectif_total(self) -> int:
-        return sum(rec.effectif or 0 for rec in self.etablissements)
-
-    @property
-    def tam_records(self) -> List[Record]:
-        return [rec for rec in self.etablissements if is_tam(rec)]
-
-    @property
-    def tam_count(self) -> int:
-        return len(self.tam_records)
-
-    @property
-    def regions(self) -> List[str]:
-        codes = {rec.region_code for rec in self.etablissements if rec.region_code is not None}
-        names = [REGION_NAMES.get(code, "Autres territoires") for code in codes]
-        return sorted(names)
+    siret_count: int
+    effectif_total: int
+    tam_count: int
+    regions: List[str]
+    main_theme: str
 
     @property
     def coverage_type(self) -> str:
@@ -104,65 +91,11 @@ class Network:
             return "Régionale"
         return "Locale"
 
-    @property
-    def main_theme(self) -> str:
-        records = self.tam_records or self.etablissements
-        counter: Counter[str] = Counter(rec.macro_theme for rec in records)
-        if not counter:
-            return "Autre"
-        most_common = counter.most_common()
-        best_count = most_common[0][1]
-        candidates = [theme for theme, count in most_common if count == best_count]
-        for theme in MACRO_THEMES:
-            if theme in candidates:
-                return theme
-        return candidates[0]
-
 
 def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_int(value: Optional[str]) -> Optional[int]:
     if value is None:
         return None
@@ -206,35 +139,6 @@ def safe_mean(values: Iterable[float]) -> Optional[float]:
     return mean(data)
 
 
-def parse_identifier(value: Optional[str], length: Optional[int] = None) -> str:
-    if value is None:
-        return ""
-    text = str(value).strip()
-    if not text:
-        return ""
-    digits = "".join(ch for ch in text if ch.isdigit())
-    if digits:
-        result = digits
-    else:
-        try:
-            number = int(float(text))
-            result = str(number)
-        except ValueError:
-            result = text
-    if length and result.isdigit() and len(result) < length:
-        result = result.zfill(length)
-    return result
-
-
-def normalize_name(name: str) -> str:
-    import re
-
-    text = name.upper()
-    text = re.sub(r"[^A-Z0-9]", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
-
 def classify_network_type(network: Network) -> Tuple[str, str]:
     names = [normalize_name(rec.denomination) for rec in network.etablissements if rec.denomination]
     if not names:
@@ -259,132 +163,52 @@ def is_tam(record: Record) -> bool:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
+    index = load_entity_index(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, int] = {}
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                values: Dict[int, str] = {}
-                if row_index == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[idx] = val
-                    target_indices = {
-                        "denomination": next(
-                            (idx for idx, name in header_map.items() if name == "denomination"),
-                            None,
-                        ),
-                        "siren": next((idx for idx, name in header_map.items() if name == "siren"), None),
-                        "siret": next(
-                            (
-                                idx
-                                for idx, name in header_map.items()
-                                if name == "siretEtablissementDeclarant"
-                            ),
-                            None,
-                        ),
-                        "region": next(
-                            (
-                                idx
-                                for idx, name in header_map.items()
-                                if name == "adressePhysiqueOrganismeFormation.codeRegion"
-                            ),
-                            None,
-                        ),
-                        "actions": next(
-                            (
-                                idx
-                                for idx, name in header_map.items()
-                                if name == "certifications.actionsDeFormation"
-                            ),
-                            None,
-                        ),
-                        "stagiaires": next(
-                            (
-                                idx
-                                for idx, name in header_map.items()
-                                if name == "informationsDeclarees.nbStagiaires"
-                            ),
-                            None,
-                        ),
-                        "effectif": next(
-                            (
-                                idx
-                                for idx, name in header_map.items()
-                                if name == "informationsDeclarees.effectifFormateurs"
-                            ),
-                            None,
-                        ),
-                        "specialite": next(
-                            (
-                                idx
-                                for idx, name in header_map.items()
-                                if name
-                                == "informationsDeclarees.specialitesDeFormation.libelleSpecialite1"
-                            ),
-                            None,
-                        ),
-                    }
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                if not indices:
-                    continue
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    idx = column_ref_to_index(ref)
-                    if idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[idx] = val
-
-                raw_siren = values.get(target_indices["siren"]) if target_indices["siren"] is not None else None
-                raw_siret = values.get(target_indices["siret"]) if target_indices["siret"] is not None else None
-                siren = parse_identifier(raw_siren, length=9)
-                siret = parse_identifier(raw_siret, length=14)
-                denomination = (
-                    str(values.get(target_indices["denomination"], ""))
-                    if target_indices["denomination"] is not None
-                    else ""
-                )
-                if not siren:
-                    elem.clear()
-                    continue
-
-                record = Record(
-                    siren=siren.strip(),
-                    siret=siret.strip(),
-                    denomination=denomination.strip(),
-                    region_code=parse_int(values.get(target_indices["region"])),
-                    effectif=parse_int(values.get(target_indices["effectif"])),
-                    nb_stagiaires=parse_float(values.get(target_indices["stagiaires"])),
-                    actions_form=parse_float(values.get(target_indices["actions"])),
-                    specialite_label=values.get(target_indices["specialite"]),
-                )
-                records.append(record)
-                elem.clear()
+    for raw_siren, raw_siret, nda, previous, denomination, region, effectif, stagiaires, actions, specialite in table.select(
+        "siren",
+        "siretEtablissementDeclarant",
+        "numeroDeclarationActivite",
+        "numerosDeclarationActivitePrecedent",
+        "denomination",
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("certifications.actionsDeFormation", parse_float),
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+    ):
+        siret = parse_identifier(raw_siret, length=SIRET_LENGTH)
+        siren = index.resolve(parse_identifier(raw_siren, length=SIREN_LENGTH), siret, declaration_numbers(nda, previous))
+        if not siren:
+            continue
+
+        record = Record(
+            siren=siren,
+            siret=siret,
+            denomination=str(denomination or "").strip(),
+            region_code=region,
+            effectif=effectif,
+            nb_stagiaires=stagiaires,
+            actions_form=actions,
+            specialite_label=intern_text(specialite),
+        )
+        records.append(record)
     return records
 
 
+NETWORK_AGGREGATIONS = {
+    "etablissements": Collect(),
+    "sirets": Tally("siret", where=lambda rec: rec.siret),
+    "effectif_total": Sum(lambda rec: rec.effectif or 0),
+    "region_codes": Tally("region_code"),
+    "tam_themes": Tally("macro_theme", where=is_tam),
+    "names": Tally(lambda rec: rec.denomination.strip() or None),
+}
+
+
 def build_networks(records: Sequence[Record]) -> Tuple[List[Network], Dict[str, int]]:
-    grouped: Dict[str, List[Record]] = defaultdict(list)
-    for rec in records:
-        if rec.siren:
-            grouped[rec.siren].append(rec)
+    grouped = group_by(records, "siren", NETWORK_AGGREGATIONS, where=lambda rec: rec.siren)
 
     networks: List[Network] = []
     diagnostics: Dict[str, int] = {
@@ -393,30 +217,52 @@ def build_networks(records: Sequence[Record]) -> Tuple[List[Network], Dict[str,
         "effectif_ok": 0,
         "tam_ok": 0,
     }
-    for siren, recs in grouped.items():
-        network = Network(siren=siren, denomination=select_network_name(recs), etablissements=recs)
-        if network.siret_count < 3:
+    for siren, aggregates in grouped.items():
+        siret_count = len(aggregates["sirets"])
+        if siret_count < 3:
             continue
         diagnostics["multi_site"] += 1
-        if network.effectif_total < 10:
+        if aggregates["effectif_total"] < 10:
             continue
         diagnostics["effectif_ok"] += 1
-        if network.tam_count == 0:
+        tam_themes: Counter[str] = aggregates["tam_themes"]
+        tam_count = sum(tam_themes.values())
+        if tam_count == 0:
             continue
         diagnostics["tam_ok"] += 1
-        networks.append(network)
+        networks.append(
+            Network(
+                siren=siren,
+                denomination=select_network_name(aggregates["names"]),
+                etablissements=aggregates["etablissements"],
+                siret_count=siret_count,
+                effectif_total=aggregates["effectif_total"],
+                tam_count=tam_count,
+                regions=sorted(REGION_NAMES.get(code, "Autres territoires") for code in aggregates["region_codes"]),
+                main_theme=select_main_theme(tam_themes),
+            )
+        )
     diagnostics["effectif_missing"] = diagnostics["multi_site"] - diagnostics["effectif_ok"]
     diagnostics["tam_missing"] = diagnostics["effectif_ok"] - diagnostics["tam_ok"]
     return networks, diagnostics
 
 
-def select_network_name(records: Sequence[Record]) -> str:
-    counter = Counter(
-        rec.denomination.strip() for rec in records if rec.denomination and rec.denomination.strip()
-    )
-    if not counter:
+def select_network_name(names: Counter[str]) -> str:
+    if not names:
         return "Non renseigné"
-    return counter.most_common(1)[0][0]
+    return names.most_common(1)[0][0]
+
+
+def select_main_theme(themes: Counter[str]) -> str:
+    if not themes:
+        return "Autre"
+    most_common = themes.most_common()
+    best_count = most_common[0][1]
+    candidates = [theme for theme, count in most_common if count == best_count]
+    for theme in MACRO_THEMES:
+        if theme in candidates:
+            return theme
+    return candidates[0]
 
 
 def compute_table1(networks: List[Network]) -> List[Dict[str, object]]:
@@ -1053,6 +899,61 @@ def write_csv_export(table1: List[Dict[str, object]], networks: List[Network]) -
             )
 
 
+def compute_merge_proposals(
+    records: Sequence[Record], networks: List[Network], max_per_network: int = MAX_MERGE_PROPOSALS
+) -> List[Dict[str, object]]:
+    sirens = group_by(
+        records,
+        "siren",
+        {"names": Tally(lambda rec: rec.denomination or None), "sirets": Tally("siret", where=lambda rec: rec.siret)},
+    )
+    # Both sides are matched on the name that is displayed for them, so a proposal
+    # never comes from an alias that does not appear in the CSV.
+    names = {siren: select_network_name(aggregates["names"]) for siren, aggregates in sirens.items()}
+    matcher = NameMatcher(names.items())
+    rows: List[Dict[str, object]] = []
+    for network in sorted(networks, key=lambda n: n.effectif_total, reverse=True):
+        core = matcher.key(network.denomination)
+        if core is None:
+            continue
+        seen = {network.siren}
+        for score, group in groupby(matcher.matches(core), key=itemgetter(0)):
+            if len(seen) > max_per_network:
+                break
+            candidates = set().union(*(keys for _, keys in group)) - seen
+            for siren in heapq.nsmallest(max_per_network + 1 - len(seen), candidates):
+                seen.add(siren)
+                rows.append(
+                    {
+                        "siren": network.siren,
+                        "name": network.denomination,
+                        "candidate_siren": siren,
+                        "candidate_name": names[siren],
+                        "candidate_etab": len(sirens[siren]["sirets"]),
+                        "score": score,
+                    }
+                )
+    return rows
+
+
+def write_merge_proposals(rows: List[Dict[str, object]]) -> None:
+    ensure_output_dir()
+    with open(OUTPUT_MERGES_CSV, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["siren", "nom", "siren_candidat", "nom_candidat", "nb_etablissements_candidat", "score"])
+        for row in rows:
+            writer.writerow(
+                [
+                    row["siren"],
+                    row["name"],
+                    row["candidate_siren"],
+                    row["candidate_name"],
+                    row["candidate_etab"],
+                    f"{row['score']:.2f}",
+                ]
+            )
+
+
 def recommended_action_by_coverage(coverage: str) -> str:
     if coverage == "Nationale":
         return "Contacter direction nationale"
@@ -1077,6 +978,7 @@ def main() -> None:
     summary = build_summary(networks, table1, table5, diagnostics)
     write_markdown(table1, table2, table3, table4, table5, table6, table7, summary)
     write_csv_export(table1, networks)
+    write_merge_proposals(compute_merge_proposals(records, networks))
 
 
 if __name__ == "__main__":
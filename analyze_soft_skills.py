@@ -1,16 +1,14 @@
 import csv
 import os
 import statistics
-import zipfile
-import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-XLSX_PATH = "OF 3-10.xlsx"
+from of_dataset import XLSX_PATH, intern_text, load_table
+
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MARKDOWN = os.path.join(OUTPUT_DIR, "soft_skills_analysis.md")
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, "soft_skills_tam.csv")
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 SOFT_LABEL_MAP = {
     "développement des capacités comportementales et relationnelles": "Comportementales",
@@ -50,7 +48,7 @@ REGION_NAMES: Dict[int, str] = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     nda: str
     denomination: str
@@ -84,46 +82,6 @@ def normalize_label(label: str) -> str:
     return label.strip().casefold()
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_float(value: Optional[str]) -> Optional[float]:
     if value is None:
         return None
@@ -149,83 +107,31 @@ def parse_int(value: Optional[str]) -> Optional[int]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {
-                "nda": None,
-                "denomination": None,
-                "stagiaires": None,
-                "effectif": None,
-                "actions": None,
-                "region": None,
-                "spec1": None,
-                "spec2": None,
-                "spec3": None,
-            }
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    target_indices["nda"] = next((idx for idx, name in header_map.items() if name == "numeroDeclarationActivite"), None)
-                    target_indices["denomination"] = next((idx for idx, name in header_map.items() if name == "denomination"), None)
-                    target_indices["stagiaires"] = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.nbStagiaires"), None)
-                    target_indices["effectif"] = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.effectifFormateurs"), None)
-                    target_indices["actions"] = next((idx for idx, name in header_map.items() if name == "certifications.actionsDeFormation"), None)
-                    target_indices["region"] = next((idx for idx, name in header_map.items() if name == "adressePhysiqueOrganismeFormation.codeRegion"), None)
-                    target_indices["spec1"] = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.libelleSpecialite1"), None)
-                    target_indices["spec2"] = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.libelleSpecialite2"), None)
-                    target_indices["spec3"] = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.libelleSpecialite3"), None)
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                if not indices:
-                    continue
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                nda = str(values.get(target_indices["nda"], "")).strip()
-                denomination = str(values.get(target_indices["denomination"], "")).strip()
-                nb_stagiaires = parse_float(values.get(target_indices["stagiaires"]))
-                effectif = parse_int(values.get(target_indices["effectif"]))
-                actions = parse_float(values.get(target_indices["actions"]))
-                region = parse_int(values.get(target_indices["region"]))
-                spec1 = values.get(target_indices["spec1"])
-                spec2 = values.get(target_indices["spec2"])
-                spec3 = values.get(target_indices["spec3"])
-                specs = tuple(s.strip() if isinstance(s, str) and s.strip() else None for s in (spec1, spec2, spec3))
-                records.append(
-                    Record(
-                        nda=nda,
-                        denomination=denomination,
-                        nb_stagiaires=nb_stagiaires,
-                        effectif=effectif,
-                        actions_cert=actions,
-                        region_code=region,
-                        specialites=specs,
-                    )
-                )
-                elem.clear()
+    for nda, denomination, stagiaires, effectif, actions, region, spec1, spec2, spec3 in table.select(
+        "numeroDeclarationActivite",
+        "denomination",
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("certifications.actionsDeFormation", parse_float),
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite2",
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite3",
+    ):
+        specs = tuple(intern_text(s.strip()) if isinstance(s, str) and s.strip() else None for s in (spec1, spec2, spec3))
+        records.append(
+            Record(
+                nda=str(nda or "").strip(),
+                denomination=str(denomination or "").strip(),
+                nb_stagiaires=stagiaires,
+                effectif=effectif,
+                actions_cert=actions,
+                region_code=region,
+                specialites=specs,
+            )
+        )
     return records
 
 
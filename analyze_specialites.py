@@ -1,17 +1,19 @@
 import csv
+import hashlib
+import json
 import os
-import zipfile
-import xml.etree.ElementTree as ET
+import re
 from collections import Counter, defaultdict
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from of_arrays import Mask, mask_and, numeric_column, take
+from of_dataset import XLSX_PATH, OFTable, intern_text, load_table
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MARKDOWN = os.path.join(OUTPUT_DIR, "specialites_analysis.md")
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, "specialites_export.csv")
 
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 TARGET_MIN = 3
 TARGET_MAX = 10
 
@@ -44,7 +46,7 @@ REGION_NAMES: Dict[int, str] = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     region_code: Optional[int]
     effectif: Optional[int]
@@ -69,46 +71,6 @@ def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_int(value: Optional[str]) -> Optional[int]:
     if value is None:
         return None
@@ -143,106 +105,34 @@ def clean_text(value: Optional[str]) -> Optional[str]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
+    prefix = "informationsDeclarees.specialitesDeFormation."
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            idx_region = idx_effectif = idx_stagiaires = idx_actions = None
-            idx_spec1_code = idx_spec1_label = None
-            idx_spec2_code = idx_spec2_label = None
-            idx_spec3_code = idx_spec3_label = None
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    idx_region = next((idx for idx, name in header_map.items() if name == "adressePhysiqueOrganismeFormation.codeRegion"), None)
-                    idx_actions = next((idx for idx, name in header_map.items() if name == "certifications.actionsDeFormation"), None)
-                    idx_spec1_code = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.codeSpecialite1"), None)
-                    idx_spec1_label = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.libelleSpecialite1"), None)
-                    idx_spec2_code = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.codeSpecialite2"), None)
-                    idx_spec2_label = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.libelleSpecialite2"), None)
-                    idx_spec3_code = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.codeSpecialite3"), None)
-                    idx_spec3_label = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.specialitesDeFormation.libelleSpecialite3"), None)
-                    idx_stagiaires = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.nbStagiaires"), None)
-                    idx_effectif = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.effectifFormateurs"), None)
-                    elem.clear()
-                    continue
-
-                target_indices = {
-                    idx
-                    for idx in [
-                        idx_region,
-                        idx_actions,
-                        idx_spec1_code,
-                        idx_spec1_label,
-                        idx_spec2_code,
-                        idx_spec2_label,
-                        idx_spec3_code,
-                        idx_spec3_label,
-                        idx_stagiaires,
-                        idx_effectif,
-                    ]
-                    if idx is not None
-                }
-                if not target_indices:
-                    continue
-
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in target_indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-
-                spec1 = None
-                if idx_spec1_code is not None or idx_spec1_label is not None:
-                    spec1 = (
-                        clean_text(values.get(idx_spec1_code)),
-                        clean_text(values.get(idx_spec1_label)),
-                    )
-                    if not spec1[0] and not spec1[1]:
-                        spec1 = None
-                spec2 = None
-                if idx_spec2_code is not None or idx_spec2_label is not None:
-                    spec2 = (
-                        clean_text(values.get(idx_spec2_code)),
-                        clean_text(values.get(idx_spec2_label)),
-                    )
-                    if not spec2[0] and not spec2[1]:
-                        spec2 = None
-                spec3 = None
-                if idx_spec3_code is not None or idx_spec3_label is not None:
-                    spec3 = (
-                        clean_text(values.get(idx_spec3_code)),
-                        clean_text(values.get(idx_spec3_label)),
-                    )
-                    if not spec3[0] and not spec3[1]:
-                        spec3 = None
-
-                record = Record(
-                    region_code=parse_int(values.get(idx_region)) if idx_region is not None else None,
-                    effectif=parse_int(values.get(idx_effectif)) if idx_effectif is not None else None,
-                    nb_stagiaires=parse_float(values.get(idx_stagiaires)) if idx_stagiaires is not None else None,
-                    actions_cert=parse_float(values.get(idx_actions)) if idx_actions is not None else None,
-                    specialites=(spec1, spec2, spec3),
-                )
-                records.append(record)
-                elem.clear()
+    for region, effectif, stagiaires, actions, *spec_values in table.select(
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("certifications.actionsDeFormation", parse_float),
+        prefix + "codeSpecialite1",
+        prefix + "libelleSpecialite1",
+        prefix + "codeSpecialite2",
+        prefix + "libelleSpecialite2",
+        prefix + "codeSpecialite3",
+        prefix + "libelleSpecialite3",
+    ):
+        specialites = []
+        for pos in range(0, 6, 2):
+            spec = (intern_text(clean_text(spec_values[pos])), intern_text(clean_text(spec_values[pos + 1])))
+            specialites.append(spec if spec[0] or spec[1] else None)
+
+        record = Record(
+            region_code=region,
+            effectif=effectif,
+            nb_stagiaires=stagiaires,
+            actions_cert=actions,
+            specialites=tuple(specialites),
+        )
+        records.append(record)
     return records
 
 
@@ -341,32 +231,78 @@ KEYWORD_RULES: List[Tuple[str, Tuple[str, ...]]] = [
 ]
 
 
+EXCLUDED_KEYWORDS: Tuple[str, ...] = ("formations générales", "non class")
+
+
 def normalize_label(label: str) -> str:
     return label.strip().lower()
 
 
+class SpecialiteClassifier:
+    def __init__(
+        self,
+        mapping: Dict[str, str],
+        rules: Sequence[Tuple[str, Sequence[str]]],
+        excluded: Sequence[str] = EXCLUDED_KEYWORDS,
+        default: str = "Autre",
+    ):
+        self._mapping = mapping
+        self._rules = rules
+        self._excluded_keywords = excluded
+        self._default = default
+        self._themes = [theme for theme, _ in rules]
+        self._ranks: Dict[str, int] = {}
+        for rank, (_, keywords) in enumerate(rules):
+            for keyword in keywords:
+                self._ranks.setdefault(keyword, rank)
+        # A lookahead captures, at every offset, the highest-priority keyword
+        # starting there, so overlapping keywords are all seen in one scan.
+        alternatives = "|".join(re.escape(keyword) for keyword in sorted(self._ranks, key=self._ranks.__getitem__))
+        self._keywords = re.compile(f"(?=({alternatives}))") if alternatives else None
+        self._excluded = re.compile("|".join(re.escape(keyword) for keyword in excluded)) if excluded else None
+        self._cache: Dict[str, str] = {}
+
+    def __call__(self, label: Optional[str]) -> str:
+        if not label:
+            return self._default
+        theme = self._cache.get(label)
+        if theme is None:
+            theme = self._cache[label] = self._classify(normalize_label(label))
+        return theme
+
+    def signature(self) -> str:
+        # Changes whenever the mapping or the rules do, so cached classifications can be invalidated.
+        payload = [sorted(self._mapping.items()), [[theme, list(keywords)] for theme, keywords in self._rules], list(self._excluded_keywords), self._default]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _classify(self, norm: str) -> str:
+        if norm in self._mapping:
+            return self._mapping[norm]
+        if self._excluded is not None and self._excluded.search(norm):
+            return self._default
+        if self._keywords is None:
+            return self._default
+        ranks = [self._ranks[match.group(1)] for match in self._keywords.finditer(norm)]
+        return self._themes[min(ranks)] if ranks else self._default
+
+
+SPECIALITE_CLASSIFIER = SpecialiteClassifier(SPECIFIC_MAPPING, KEYWORD_RULES)
+
+
 def classify_specialite(label: Optional[str]) -> str:
-    if not label:
-        return "Autre"
-    norm = normalize_label(label)
-    if norm in SPECIFIC_MAPPING:
-        return SPECIFIC_MAPPING[norm]
-    if "formations générales" in norm or "non class" in norm:
-        return "Autre"
-    for theme, keywords in KEYWORD_RULES:
-        if any(keyword in norm for keyword in keywords):
-            return theme
-    return "Autre"
-
-
-def is_tam(record: Record) -> bool:
-    if record.effectif is None or not (TARGET_MIN <= record.effectif <= TARGET_MAX):
-        return False
-    if record.actions_cert is None:
-        return False
-    if record.nb_stagiaires is None or record.nb_stagiaires <= 0:
-        return False
-    return True
+    return SPECIALITE_CLASSIFIER(label)
+
+
+def tam_mask(table: OFTable) -> Mask:
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_float)
+    return mask_and(effectif.between(TARGET_MIN, TARGET_MAX), actions.valid, stagiaires.positive())
+
+
+def filter_tam(records: Sequence[Record]) -> List[Record]:
+    # records come from load_records, one per workbook row.
+    return take(records, tam_mask(load_table(XLSX_PATH)))
 
 
 def safe_div(num: float, den: int) -> float:
@@ -375,7 +311,7 @@ def safe_div(num: float, den: int) -> float:
 
 def compute_top_specialites(records: List[Record]) -> Tuple[List[Dict[str, object]], int, int]:
     total_base = len(records)
-    tam_records = [r for r in records if is_tam(r)]
+    tam_records = filter_tam(records)
     total_tam = len(tam_records)
 
     base_counter: Dict[Tuple[str, str], int] = Counter()
@@ -415,7 +351,7 @@ def compute_macro_themes(records: List[Record], total_base: int, total_tam: int)
     tam_stag_sum: Dict[str, float] = defaultdict(float)
     tam_prod_sum: Dict[str, float] = defaultdict(float)
 
-    tam_records = [r for r in records if is_tam(r)]
+    tam_records = filter_tam(records)
 
     for rec in records:
         if rec.spec1 is None:
@@ -465,7 +401,7 @@ def compute_macro_themes(records: List[Record], total_base: int, total_tam: int)
 
 
 def compute_top_specialites_by_theme(records: List[Record]) -> Dict[str, List[str]]:
-    tam_records = [r for r in records if is_tam(r) and r.spec1 is not None]
+    tam_records = [r for r in filter_tam(records) if r.spec1 is not None]
     theme_counter: Dict[str, Counter] = defaultdict(Counter)
     for rec in tam_records:
         code, label = rec.spec1
@@ -518,7 +454,7 @@ def compute_specialites_secondary(records: List[Record]) -> Tuple[List[Dict[str,
 
 
 def compute_macro_theme_priorities(records: List[Record], theme_stats: Dict[str, Dict[str, object]]) -> List[Dict[str, object]]:
-    tam_records = [r for r in records if is_tam(r) and r.spec1 is not None]
+    tam_records = [r for r in filter_tam(records) if r.spec1 is not None]
     total_tam = len(tam_records)
     if total_tam == 0:
         return []
@@ -559,7 +495,7 @@ def compute_macro_theme_priorities(records: List[Record], theme_stats: Dict[str,
 def compute_niches(records: List[Record], total_base: int, total_tam: int) -> List[Dict[str, object]]:
     base_counter: Counter = Counter()
     tam_counter: Counter = Counter()
-    tam_records = [r for r in records if is_tam(r)]
+    tam_records = filter_tam(records)
 
     for rec in records:
         if rec.spec1 is None:
@@ -2,14 +2,13 @@ import csv
 import math
 import os
 import statistics
-import zipfile
-import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from typing import Dict, Iterable, List, Optional, Tuple
 
-XLSX_PATH = "OF 3-10.xlsx"
+from of_arrays import Mask, mask_and, numeric_column, take
+from of_dataset import XLSX_PATH, OFTable, intern_text, load_table
+
 OUTPUT_DIR = "analysis_outputs"
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 REGION_NAMES: Dict[int, str] = {
     11: "Île-de-France",
@@ -42,7 +41,7 @@ REGION_NAMES: Dict[int, str] = {
 METRO_REGION_CODES = [11, 24, 27, 28, 32, 44, 52, 53, 75, 76, 84, 93, 94]
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     denomination: str
     nb_stagiaires: float
@@ -56,46 +55,6 @@ def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_float(value: Optional[str]) -> Optional[float]:
     if value is None:
         return None
@@ -121,113 +80,30 @@ def parse_int(value: Optional[str]) -> Optional[int]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {
-                "denomination": None,
-                "nb_stagiaires": None,
-                "effectif": None,
-                "actions": None,
-                "region": None,
-                "specialite": None,
-            }
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    target_indices["denomination"] = next(
-                        (idx for idx, name in header_map.items() if name == "denomination"),
-                        None,
-                    )
-                    target_indices["nb_stagiaires"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.nbStagiaires"
-                        ),
-                        None,
-                    )
-                    target_indices["effectif"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.effectifFormateurs"
-                        ),
-                        None,
-                    )
-                    target_indices["actions"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "certifications.actionsDeFormation"
-                        ),
-                        None,
-                    )
-                    target_indices["region"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.codeRegion"
-                        ),
-                        None,
-                    )
-                    target_indices["specialite"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name
-                            == "informationsDeclarees.specialitesDeFormation.libelleSpecialite1"
-                        ),
-                        None,
-                    )
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                denomination = str(values.get(target_indices["denomination"], ""))
-                nb_stagiaires = parse_float(values.get(target_indices["nb_stagiaires"])) or 0.0
-                effectif = parse_int(values.get(target_indices["effectif"]))
-                actions = parse_int(values.get(target_indices["actions"]))
-                region_code = parse_int(values.get(target_indices["region"]))
-                specialite = values.get(target_indices["specialite"])
-                if specialite is not None:
-                    specialite = specialite.strip()
-                    if not specialite:
-                        specialite = None
-                records.append(
-                    Record(
-                        denomination=denomination.strip(),
-                        nb_stagiaires=nb_stagiaires,
-                        effectif=effectif,
-                        qualiopi_actions=actions,
-                        region_code=region_code,
-                        specialite=specialite,
-                    )
-                )
-                elem.clear()
+    for denomination, stagiaires, effectif, actions, region, specialite in table.select(
+        "denomination",
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("certifications.actionsDeFormation", parse_int),
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+    ):
+        if specialite is not None:
+            specialite = specialite.strip()
+            if not specialite:
+                specialite = None
+        records.append(
+            Record(
+                denomination=str(denomination or "").strip(),
+                nb_stagiaires=stagiaires or 0.0,
+                effectif=effectif,
+                qualiopi_actions=actions,
+                region_code=region,
+                specialite=intern_text(specialite),
+            )
+        )
     return records
 
 
@@ -356,17 +232,16 @@ def aggregate_tranches(records: List[Record]) -> Tuple[List[List[str]], Dict[str
     return rows, {name: counts[name] for name in counts}
 
 
+def tam_mask(table: OFTable) -> Mask:
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_int)
+    return mask_and(effectif.between(3, 10), actions.equals(1), stagiaires.positive())
+
+
 def filter_tam(records: List[Record]) -> List[Record]:
-    result: List[Record] = []
-    for rec in records:
-        if rec.effectif is None or rec.effectif < 3 or rec.effectif > 10:
-            continue
-        if rec.qualiopi_actions != 1:
-            continue
-        if rec.nb_stagiaires <= 0:
-            continue
-        result.append(rec)
-    return result
+    # records come from load_records, one per workbook row.
+    return take(records, tam_mask(load_table(XLSX_PATH)))
 
 
 def build_table2(tam_records: List[Record]) -> List[List[str]]:
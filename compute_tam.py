@@ -1,15 +1,11 @@
 import csv
 import os
-import statistics
-import zipfile
-import xml.etree.ElementTree as ET
-from collections import defaultdict
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional
-
-XLSX_PATH = "OF 3-10.xlsx"
+from typing import Dict, List, Optional
+
+from of_arrays import group_stats, mask_and, mask_count, numeric_column, summary_stats
+from of_dataset import XLSX_PATH, load_table
+
 OUTPUT_DIR = "analysis_outputs"
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 TARGET_MIN = 3
 TARGET_MAX = 10
@@ -59,55 +55,6 @@ REGION_ORDER = [
 ]
 
 
-@dataclass
-class Record:
-    denomination: str
-    effectif: Optional[int]
-    nb_stagiaires: Optional[float]
-    actions_cert: Optional[float]
-    code_region: Optional[int]
-
-
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]):
-    t = cell.attrib.get("t")
-    if t == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if t == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t_el.text or "" for t_el in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_int(value) -> Optional[int]:
     if value is None:
         return None
@@ -138,94 +85,6 @@ def ensure_output_dir():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_records() -> List[Record]:
-    records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            denom_idx = effectif_idx = stagiaires_idx = actions_idx = region_idx = None
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                values: Dict[int, str] = {}
-                if row_index == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    denom_idx = next((idx for idx, name in header_map.items() if name == "denominationSociale"), None)
-                    effectif_idx = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.effectifFormateurs"), None)
-                    stagiaires_idx = next((idx for idx, name in header_map.items() if name == "informationsDeclarees.nbStagiaires"), None)
-                    actions_idx = next((idx for idx, name in header_map.items() if name == "certifications.actionsDeFormation"), None)
-                    region_idx = next((idx for idx, name in header_map.items() if name == "adressePhysiqueOrganismeFormation.codeRegion"), None)
-                    elem.clear()
-                    continue
-
-                target_indices = {
-                    idx
-                    for idx in [denom_idx, effectif_idx, stagiaires_idx, actions_idx, region_idx]
-                    if idx is not None
-                }
-                found = set()
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in target_indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                        found.add(col_idx)
-                    if found == target_indices:
-                        break
-
-                record = Record(
-                    denomination=str(values.get(denom_idx, "")),
-                    effectif=parse_int(values.get(effectif_idx)),
-                    nb_stagiaires=parse_float(values.get(stagiaires_idx)),
-                    actions_cert=parse_float(values.get(actions_idx)),
-                    code_region=parse_int(values.get(region_idx)),
-                )
-                records.append(record)
-                elem.clear()
-    return records
-
-
-def filter_tam(records: Iterable[Record]) -> List[Record]:
-    result: List[Record] = []
-    for rec in records:
-        if rec.effectif is None:
-            continue
-        if not (TARGET_MIN <= rec.effectif <= TARGET_MAX):
-            continue
-        if rec.actions_cert is None:
-            continue
-        if rec.nb_stagiaires is None or rec.nb_stagiaires <= 0:
-            continue
-        result.append(rec)
-    return result
-
-
-def safe_mean(values: List[float]) -> Optional[float]:
-    if not values:
-        return None
-    return sum(values) / len(values)
-
-
-def safe_median(values: List[float]) -> Optional[float]:
-    if not values:
-        return None
-    return statistics.median(values)
-
-
 def format_number(value: Optional[float], decimals: int = 0) -> str:
     if value is None:
         return "-"
@@ -245,57 +104,62 @@ def write_table(markdown_lines: List[str], table_name: str, headers: List[str],
 
 def main():
     ensure_output_dir()
-    records = load_records()
-    total_base = len(records)
-
-    filtered_effectif = [r for r in records if r.effectif is not None and TARGET_MIN <= r.effectif <= TARGET_MAX]
-    filtered_cert = [r for r in filtered_effectif if r.actions_cert is not None]
-    filtered_active = [r for r in filtered_cert if r.nb_stagiaires is not None and r.nb_stagiaires > 0]
-
-    tam_records = filtered_active
+    table = load_table(XLSX_PATH)
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_float)
+    region = numeric_column(table, "adressePhysiqueOrganismeFormation.codeRegion", parse_int)
+    total_base = table.row_count
+
+    filtered_effectif = effectif.between(TARGET_MIN, TARGET_MAX)
+    filtered_cert = mask_and(filtered_effectif, actions.valid)
+    filtered_active = mask_and(filtered_cert, stagiaires.positive())
+
+    tam_mask = filtered_active
+    effectif_keys = effectif.keys()
+    region_keys = region.keys()
+    stagiaires_by_effectif = group_stats(effectif_keys, stagiaires.values, tam_mask)
+    stagiaires_by_region = group_stats(region_keys, stagiaires.values, tam_mask)
+    effectif_by_region = group_stats(region_keys, effectif.values, tam_mask)
+    region_effectif_counts = group_stats((region_keys, effectif_keys), effectif.values, tam_mask)
+    overall_stagiaires = summary_stats(stagiaires.values, tam_mask)
+    overall_effectif = summary_stats(effectif.values, tam_mask)
 
     # Table 1
     effectif_distribution: List[List[str]] = []
-    total_count = len(tam_records)
-    total_stagiaires = sum(r.nb_stagiaires for r in tam_records)
+    total_count = overall_stagiaires.count
+    total_stagiaires = overall_stagiaires.total
     effectif_totals = {}
     for eff in range(TARGET_MIN, TARGET_MAX + 1):
-        subset = [r for r in tam_records if r.effectif == eff]
-        count = len(subset)
+        stats = stagiaires_by_effectif.get(eff)
+        count = stats.count if stats else 0
         pct = (count / total_count * 100) if total_count else 0
-        stagiaires = [r.nb_stagiaires for r in subset]
-        mean_stagiaires = safe_mean(stagiaires)
-        median_stagiaires = safe_median(stagiaires)
-        total_stagiaires_eff = sum(stagiaires)
         effectif_totals[eff] = count
         effectif_distribution.append([
             str(eff),
             format_number(count),
             f"{pct:,.1f}%".replace(",", " "),
-            format_number(mean_stagiaires, 1),
-            format_number(median_stagiaires, 1),
-            format_number(total_stagiaires_eff),
+            format_number(stats.mean if stats else None, 1),
+            format_number(stats.median if stats else None, 1),
+            format_number(stats.total if stats else 0),
         ])
     effectif_distribution.append([
         "TOTAL",
         format_number(total_count),
         "100%",
-        format_number(safe_mean([r.nb_stagiaires for r in tam_records]), 1),
-        format_number(safe_median([r.nb_stagiaires for r in tam_records]), 1),
+        format_number(overall_stagiaires.mean, 1),
+        format_number(overall_stagiaires.median, 1),
         format_number(total_stagiaires),
     ])
 
     # Table 2 and 3
-    region_counts: Dict[int, List[Record]] = defaultdict(list)
-    for rec in tam_records:
-        region_counts[rec.code_region or 0].append(rec)
+    region_counts: Dict[int, int] = {code: stats.count for code, stats in stagiaires_by_region.items()}
 
     region_rows: List[List[str]] = []
-    for code, recs in sorted(region_counts.items(), key=lambda item: len(item[1]), reverse=True):
-        count = len(recs)
+    for code, count in sorted(region_counts.items(), key=lambda item: item[1], reverse=True):
         pct = (count / total_count * 100) if total_count else 0
-        mean_stagiaires = safe_mean([r.nb_stagiaires for r in recs])
-        mean_effectif = safe_mean([r.effectif for r in recs if r.effectif is not None])
+        mean_stagiaires = stagiaires_by_region[code].mean
+        mean_effectif = effectif_by_region[code].mean
         name = REGION_NAMES.get(code, "Autres DOM-TOM")
         region_rows.append([
             str(code),
@@ -311,16 +175,11 @@ def main():
         "France",
         format_number(total_count),
         "100%",
-        format_number(safe_mean([r.nb_stagiaires for r in tam_records]), 1),
-        format_number(safe_mean([r.effectif for r in tam_records]), 1),
+        format_number(overall_stagiaires.mean, 1),
+        format_number(overall_effectif.mean, 1),
     ])
 
     # Table 3 matrix
-    region_effectif_counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
-    for rec in tam_records:
-        code = rec.code_region or 0
-        region_effectif_counts[code][rec.effectif] += 1
-
     ordered_regions = REGION_ORDER + [code for code in region_counts if code not in REGION_ORDER]
 
     table3_rows: List[List[str]] = []
@@ -331,7 +190,8 @@ def main():
         row = [str(code), name]
         row_total = 0
         for eff in range(TARGET_MIN, TARGET_MAX + 1):
-            count = region_effectif_counts[code].get(eff, 0)
+            stats = region_effectif_counts.get((code, eff))
+            count = stats.count if stats else 0
             row.append(format_number(count))
             row_total += count
         row.append(format_number(row_total))
@@ -347,10 +207,9 @@ def main():
     # Table 4 top regions by intensity
     intensity_rows: List[List[str]] = []
     intensity_data = []
-    for code, recs in region_counts.items():
-        count = len(recs)
-        mean_stagiaires = safe_mean([r.nb_stagiaires for r in recs])
-        mean_effectif = safe_mean([r.effectif for r in recs if r.effectif is not None])
+    for code, count in region_counts.items():
+        mean_stagiaires = stagiaires_by_region[code].mean
+        mean_effectif = effectif_by_region[code].mean
         if mean_stagiaires is None:
             continue
         ratio = mean_stagiaires / mean_effectif if mean_effectif else None
@@ -448,9 +307,9 @@ def main():
     synth_lines.append(f"TAM TOTAL QUALIFIÉ : {format_number(tam_total)} OF")
     synth_lines.append("")
     synth_lines.append("Base France : {0} OF".format(format_number(total_base)))
-    synth_lines.append(f"↓ 3-10 formateurs : {format_number(len(filtered_effectif))} OF")
-    synth_lines.append(f"↓ + Certifiés Qualiopi : {format_number(len(filtered_cert))} OF")
-    synth_lines.append(f"↓ + Actifs : {format_number(len(filtered_active))} OF")
+    synth_lines.append(f"↓ 3-10 formateurs : {format_number(mask_count(filtered_effectif))} OF")
+    synth_lines.append(f"↓ + Certifiés Qualiopi : {format_number(mask_count(filtered_cert))} OF")
+    synth_lines.append(f"↓ + Actifs : {format_number(mask_count(filtered_active))} OF")
     synth_lines.append("")
     reference = 12303
     if reference:
@@ -462,11 +321,11 @@ def main():
         synth_lines.append("")
 
     # Top insights
-    top_regions = sorted(region_counts.items(), key=lambda item: len(item[1]), reverse=True)
+    top_regions = sorted(region_counts.items(), key=lambda item: item[1], reverse=True)
     if top_regions:
-        top_region_code, top_region_recs = top_regions[0]
+        top_region_code, top_region_count = top_regions[0]
         synth_lines.append(
-            f"1. {REGION_NAMES.get(top_region_code, 'Autres DOM-TOM')} concentre {format_number(len(top_region_recs))} OF, soit {len(top_region_recs) / tam_total * 100:.1f}% du TAM."
+            f"1. {REGION_NAMES.get(top_region_code, 'Autres DOM-TOM')} concentre {format_number(top_region_count)} OF, soit {top_region_count / tam_total * 100:.1f}% du TAM."
         )
     top_effectif = max(effectif_totals.items(), key=lambda item: item[1]) if effectif_totals else None
     if top_effectif:
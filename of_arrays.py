@@ -0,0 +1,145 @@
+import math
+import statistics
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+from of_dataset import ColumnKey, OFTable, Parser
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+Mask = Sequence[bool]
+Keys = Union[Sequence[Hashable], Tuple[Sequence[Hashable], ...]]
+
+
+@dataclass
+class NumericColumn:
+    values: Sequence[float]
+    valid: Mask
+    failures: int = 0
+
+    def between(self, low: float, high: float) -> Mask:
+        if HAS_NUMPY:
+            return self.valid & (low <= self.values) & (self.values <= high)
+        return [ok and low <= value <= high for value, ok in zip(self.values, self.valid)]
+
+    def positive(self) -> Mask:
+        # NaN parsed from a literal "nan" is kept, as `value <= 0` is False in the loops.
+        if HAS_NUMPY:
+            return self.valid & ~(self.values <= 0)
+        return [ok and not value <= 0 for value, ok in zip(self.values, self.valid)]
+
+    def equals(self, target: float) -> Mask:
+        if HAS_NUMPY:
+            return self.valid & (self.values == target)
+        return [ok and value == target for value, ok in zip(self.values, self.valid)]
+
+    def keys(self, default: int = 0) -> Sequence[int]:
+        if HAS_NUMPY:
+            return np.where(self.valid, self.values, default).astype(np.int64)
+        return [int(value) if ok else default for value, ok in zip(self.values, self.valid)]
+
+
+@dataclass
+class GroupStats:
+    count: int
+    total: float
+    mean: Optional[float]
+    median: Optional[float]
+
+
+def numeric_column(table: OFTable, key: ColumnKey, parse: Parser) -> NumericColumn:
+    parsed = table.parsed(key, parse)
+    values = [math.nan if value is None else float(value) for value in parsed.values]
+    valid = [value is not None for value in parsed.values]
+    if HAS_NUMPY:
+        return NumericColumn(np.array(values, dtype=np.float64), np.array(valid, dtype=bool), parsed.failures)
+    return NumericColumn(values, valid, parsed.failures)
+
+
+def mask_and(*masks: Mask) -> Mask:
+    if HAS_NUMPY:
+        return np.logical_and.reduce(masks)
+    return [all(flags) for flags in zip(*masks)]
+
+
+def mask_count(mask: Mask) -> int:
+    if HAS_NUMPY:
+        return int(np.count_nonzero(mask))
+    return sum(1 for flag in mask if flag)
+
+
+def take(values: Sequence, mask: Mask) -> List:
+    if HAS_NUMPY:
+        return [values[index] for index in np.flatnonzero(mask)]
+    return [value for value, flag in zip(values, mask) if flag]
+
+
+def summary_stats(values: Sequence[float], mask: Optional[Mask] = None) -> GroupStats:
+    zeros = np.zeros(len(values), dtype=np.int64) if HAS_NUMPY else [0] * len(values)
+    groups = group_stats(zeros, values, mask)
+    return groups.get(0, GroupStats(0, 0.0, None, None))
+
+
+def group_stats(keys: Keys, values: Sequence[float], mask: Optional[Mask] = None) -> Dict[Hashable, GroupStats]:
+    if HAS_NUMPY:
+        return _group_stats_numpy(keys, values, mask)
+    return _group_stats_python(keys, values, mask)
+
+
+def _group_stats_python(keys: Keys, values: Sequence[float], mask: Optional[Mask]) -> Dict[Hashable, GroupStats]:
+    columns = keys if isinstance(keys, tuple) else (keys,)
+    flags = mask if mask is not None else [True] * len(values)
+    buckets: Dict[Hashable, List[float]] = {}
+    for flag, value, *parts in zip(flags, values, *columns):
+        if not flag:
+            continue
+        key = tuple(parts) if isinstance(keys, tuple) else parts[0]
+        buckets.setdefault(key, []).append(value)
+    result: Dict[Hashable, GroupStats] = {}
+    for key, bucket in buckets.items():
+        total = sum(bucket)
+        result[key] = GroupStats(len(bucket), total, total / len(bucket), statistics.median(bucket))
+    return result
+
+
+def _group_stats_numpy(keys: Keys, values: Sequence[float], mask: Optional[Mask]) -> Dict[Hashable, GroupStats]:
+    columns = [np.asarray(column) for column in (keys if isinstance(keys, tuple) else (keys,))]
+    data = np.asarray(values, dtype=np.float64)
+    if mask is not None:
+        selected = np.asarray(mask, dtype=bool)
+        columns = [column[selected] for column in columns]
+        data = data[selected]
+    if data.size == 0:
+        return {}
+    uniques = []
+    codes = np.zeros(data.size, dtype=np.int64)
+    for column in columns:
+        unique, inverse = np.unique(column, return_inverse=True)
+        uniques.append(unique)
+        codes = codes * len(unique) + inverse.reshape(-1)
+    groups, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # bincount accumulates in row order, like the per-record loops.
+    counts = np.bincount(inverse, minlength=len(groups))
+    totals = np.bincount(inverse, weights=data, minlength=len(groups))
+    ordered = data[np.lexsort((data, inverse))]
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    medians = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+    result: Dict[Hashable, GroupStats] = {}
+    for group in np.argsort(first, kind="stable"):
+        code = int(groups[group])
+        parts = []
+        for unique in reversed(uniques):
+            code, position = divmod(code, len(unique))
+            parts.append(unique[position].item())
+        key = tuple(reversed(parts)) if isinstance(keys, tuple) else parts[0]
+        size = int(counts[group])
+        total = float(totals[group])
+        result[key] = GroupStats(size, total, total / size, float(medians[group]))
+    return result
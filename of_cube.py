@@ -0,0 +1,112 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Coords = Tuple[int, ...]
+
+
+class SparseCube:
+    # Only non-empty cells are stored (coordinate -> measures), axis labels are
+    # interned to integer codes, and every axis keeps a code -> cells index so a
+    # filtered query only walks the cells of its most selective slice.
+    def __init__(self, axes: Sequence[str], measures: Sequence[str]):
+        self.axes = tuple(axes)
+        self.measures = tuple(measures)
+        self.labels: List[List[str]] = [[] for _ in self.axes]
+        self.codes: List[Dict[str, int]] = [{} for _ in self.axes]
+        self.cells: Dict[Coords, List[float]] = {}
+        self.slices: List[Dict[int, List[Coords]]] = [{} for _ in self.axes]
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def _code(self, axis: int, label: str) -> int:
+        code = self.codes[axis].get(label)
+        if code is None:
+            code = self.codes[axis][label] = len(self.labels[axis])
+            self.labels[axis].append(label)
+        return code
+
+    def declare(self, axis: str, labels: Iterable[str]) -> None:
+        # Declared labels are valid filters even when no cell carries them yet.
+        index = self.axes.index(axis)
+        for label in labels:
+            self._code(index, label)
+
+    def add(self, labels: Sequence[str], values: Sequence[float]) -> None:
+        coords = tuple(self._code(axis, label) for axis, label in enumerate(labels))
+        cell = self.cells.get(coords)
+        if cell is None:
+            cell = self.cells[coords] = [0.0] * len(self.measures)
+            for axis, code in enumerate(coords):
+                self.slices[axis].setdefault(code, []).append(coords)
+        for position, value in enumerate(values):
+            cell[position] += value
+
+    def values(self, axis: str) -> List[str]:
+        return list(self.labels[self.axes.index(axis)])
+
+    def _select(self, filters: Dict[str, str]) -> Iterable[Coords]:
+        wanted: List[Tuple[int, int]] = []
+        for name, label in filters.items():
+            if label is None:
+                continue
+            axis = self.axes.index(name)
+            code = self.codes[axis].get(label)
+            if code is None:
+                raise ValueError(f"valeur inconnue pour {name} : {label} (valeurs possibles : {', '.join(sorted(self.labels[axis]))})")
+            wanted.append((axis, code))
+        if not wanted:
+            return self.cells.keys()
+        smallest = min(wanted, key=lambda item: len(self.slices[item[0]].get(item[1], ())))
+        return [
+            coords
+            for coords in self.slices[smallest[0]].get(smallest[1], ())
+            if all(coords[axis] == code for axis, code in wanted)
+        ]
+
+    def total(self, measure: str, **filters: Optional[str]) -> float:
+        position = self.measures.index(measure)
+        return sum(self.cells[coords][position] for coords in self._select(filters))
+
+    def share(self, numerator: str, denominator: str, **filters: Optional[str]) -> Optional[float]:
+        top, bottom = self.measures.index(numerator), self.measures.index(denominator)
+        num = den = 0.0
+        for coords in self._select(filters):
+            cell = self.cells[coords]
+            num += cell[top]
+            den += cell[bottom]
+        return num / den if den else None
+
+    def breakdown(self, axis: str, **filters: Optional[str]) -> Dict[str, List[float]]:
+        index = self.axes.index(axis)
+        result: Dict[str, List[float]] = {}
+        for coords in self._select(filters):
+            label = self.labels[index][coords[index]]
+            row = result.setdefault(label, [0.0] * len(self.measures))
+            for position, value in enumerate(self.cells[coords]):
+                row[position] += value
+        return result
+
+    def rows(self) -> Iterable[Tuple[Tuple[str, ...], List[float]]]:
+        for coords, cell in self.cells.items():
+            yield tuple(self.labels[axis][code] for axis, code in enumerate(coords)), cell
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "axes": list(self.axes),
+            "measures": list(self.measures),
+            "labels": self.labels,
+            "cells": [[list(coords), cell] for coords, cell in self.cells.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "SparseCube":
+        cube = cls(data["axes"], data["measures"])
+        for axis, labels in enumerate(data["labels"]):
+            for label in labels:
+                cube._code(axis, label)
+        for coords, cell in data["cells"]:
+            coords = tuple(coords)
+            cube.cells[coords] = list(cell)
+            for axis, code in enumerate(coords):
+                cube.slices[axis].setdefault(code, []).append(coords)
+        return cube
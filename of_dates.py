@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import re
+import struct
+from array import array
+from collections import Counter
+from datetime import date, datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from of_dataset import XLSX_PATH, ColumnKey, cache_path_for, load_table, workbook_digest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EXCEL_EPOCH = date(1899, 12, 30)
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y")
+FORMAT_SAMPLE_SIZE = 256
+
+DATE_CACHE_MAGIC = b"OFD1"
+DATE_CACHE_VERSION = 1
+
+MAX_ORDINAL = date.max.toordinal()
+
+
+def serial_to_date(serial: float) -> Optional[date]:
+    ordinal = EXCEL_EPOCH.toordinal() + int(round(serial))
+    if not 1 <= ordinal <= MAX_ORDINAL:
+        return None
+    return date.fromordinal(ordinal)
+
+
+def parse_date_text(text: str, formats: Sequence[str] = DATE_FORMATS) -> Optional[date]:
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        return None
+
+
+def split_serial(value: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    if value is None:
+        return None, None
+    text = str(value).strip()
+    if not text:
+        return None, None
+    try:
+        serial = float(text)
+    except ValueError:
+        return None, text
+    if math.isnan(serial) or serial <= 0:
+        return None, text
+    return serial, None
+
+
+def _separators(fmt: str) -> str:
+    return re.sub(r"%.", "", fmt)
+
+
+def detect_formats(texts: Iterable[str], formats: Sequence[str] = DATE_FORMATS, sample_size: int = FORMAT_SAMPLE_SIZE) -> List[str]:
+    # Formats with different separators never match the same text, so only their
+    # relative order may change; "05/04/2023" still goes to %d/%m/%Y first.
+    hits: Counter = Counter()
+    for text in islice(texts, sample_size):
+        for fmt in formats:
+            try:
+                datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+            hits[_separators(fmt)] += 1
+            break
+    return sorted(formats, key=lambda fmt: -hits[_separators(fmt)])
+
+
+def serials_to_ordinals(serials: Sequence[float]) -> List[int]:
+    base = EXCEL_EPOCH.toordinal()
+    if np is not None:
+        values = np.asarray(serials, dtype=np.float64)
+        in_range = values < MAX_ORDINAL
+        ordinals = base + np.rint(np.where(in_range, values, 0)).astype(np.int64)
+        return np.where(in_range & (ordinals <= MAX_ORDINAL), ordinals, 0).tolist()
+    ordinals = [base + int(round(serial)) if serial < MAX_ORDINAL else 0 for serial in serials]
+    return [ordinal if ordinal <= MAX_ORDINAL else 0 for ordinal in ordinals]
+
+
+def parse_date_ordinals(raw: Sequence[Optional[str]]) -> array:
+    serial_values: List[str] = []
+    serials: List[float] = []
+    texts: Dict[str, str] = {}
+    for value in set(raw):
+        serial, text = split_serial(value)
+        if serial is not None:
+            serial_values.append(value)
+            serials.append(serial)
+        elif text is not None:
+            texts[value] = text
+    ordinals: Dict[Optional[str], int] = dict(zip(serial_values, serials_to_ordinals(serials)))
+    formats = detect_formats(texts.values())
+    for value, text in texts.items():
+        parsed = parse_date_text(text, formats)
+        ordinals[value] = parsed.toordinal() if parsed is not None else 0
+    return array("i", (ordinals.get(value, 0) for value in raw))
+
+
+def ordinals_to_dates(ordinals: Sequence[int]) -> List[Optional[date]]:
+    dates = {ordinal: date.fromordinal(ordinal) for ordinal in set(ordinals) if ordinal}
+    return [dates.get(ordinal) for ordinal in ordinals]
+
+
+def parse_date_column(raw: Sequence[Optional[str]]) -> List[Optional[date]]:
+    return ordinals_to_dates(parse_date_ordinals(raw))
+
+
+def date_cache_path(path: str, index: int) -> str:
+    return "%s.dates-%d" % (cache_path_for(path), index)
+
+
+def read_date_cache(cache_path: str, digest: str, row_count: int) -> Optional[array]:
+    try:
+        with open(cache_path, "rb") as f:
+            if f.read(4) != DATE_CACHE_MAGIC:
+                return None
+            (meta_length,) = struct.unpack("<I", f.read(4))
+            meta = json.loads(f.read(meta_length).decode("utf-8"))
+            if meta.get("version") != DATE_CACHE_VERSION or meta.get("sha256") != digest or meta.get("row_count") != row_count:
+                return None
+            ordinals = array("i")
+            ordinals.frombytes(f.read(row_count * ordinals.itemsize))
+    except (OSError, ValueError, struct.error):
+        return None
+    if len(ordinals) != row_count:
+        return None
+    return ordinals
+
+
+def write_date_cache(cache_path: str, digest: str, ordinals: array) -> None:
+    meta = json.dumps({"version": DATE_CACHE_VERSION, "sha256": digest, "row_count": len(ordinals)}).encode("utf-8")
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(DATE_CACHE_MAGIC)
+        f.write(struct.pack("<I", len(meta)))
+        f.write(meta)
+        f.write(ordinals.tobytes())
+    os.replace(tmp_path, cache_path)
+
+
+def load_date_column(key: ColumnKey, path: str = XLSX_PATH, use_cache: bool = True) -> List[Optional[date]]:
+    table = load_table(path, use_cache=use_cache)
+    index = table.index_of(key) if isinstance(key, str) else key
+    if index is None or not use_cache:
+        return parse_date_column(table.column(index))
+    cache_path = date_cache_path(path, index)
+    digest = workbook_digest(path)
+    ordinals = read_date_cache(cache_path, digest, table.row_count)
+    if ordinals is None:
+        ordinals = parse_date_ordinals(table.column(index))
+        try:
+            write_date_cache(cache_path, digest, ordinals)
+        except OSError:
+            pass
+    return ordinals_to_dates(ordinals)
@@ -0,0 +1,336 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from of_dataset import XLSX_PATH, cache_path_for, load_table, workbook_digest
+
+SIREN_LENGTH = 9
+SIRET_LENGTH = 14
+NDA_LENGTH = 11
+
+ENTITY_CACHE_VERSION = 3
+MAX_ENTITY_SIRENS = 50
+
+NAME_SEPARATOR_RE = re.compile(r"[^A-Z0-9]+")
+NDA_SEPARATOR_RE = re.compile(r"[\s,;|/]+")
+
+IDENTIFIER_COLUMNS = (
+    "siren",
+    "siretEtablissementDeclarant",
+    "numeroDeclarationActivite",
+    "numerosDeclarationActivitePrecedent",
+    "denomination",
+)
+
+
+def parse_identifier(value: Optional[str], length: Optional[int] = None) -> str:
+    if value is None:
+        return ""
+    text = str(value).strip()
+    if not text:
+        return ""
+    digits = "".join(ch for ch in text if ch.isdigit())
+    if digits:
+        result = digits
+    else:
+        try:
+            number = int(float(text))
+            result = str(number)
+        except ValueError:
+            result = text
+    if length and result.isdigit() and len(result) < length:
+        result = result.zfill(length)
+    return result
+
+
+def declaration_numbers(current: Optional[str], previous: Optional[str] = None) -> Tuple[str, ...]:
+    numbers = [parse_identifier(current, length=NDA_LENGTH)]
+    if previous is not None:
+        numbers.extend(parse_identifier(part, length=NDA_LENGTH) for part in NDA_SEPARATOR_RE.split(str(previous)))
+    return tuple(dict.fromkeys(number for number in numbers if number))
+
+
+def normalize_name(name: str) -> str:
+    return NAME_SEPARATOR_RE.sub(" ", name.upper()).strip()
+
+
+class EntityIndex:
+    # SIREN -> SIRETs -> NDAs, plus the links between SIRENs that share a SIRET or a
+    # declaration number. Two SIRENs are merged only when they are directly linked
+    # and share the same representative (most frequent) normalized denomination, so
+    # a SIREN that used several names cannot chain unrelated groups together. Links
+    # are merged as they arrive; when a SIREN's representative changes, only its
+    # group is split and merged again. Groups never grow beyond MAX_ENTITY_SIRENS.
+    def __init__(self) -> None:
+        self.parents: Dict[str, str] = {}
+        self.members: Dict[str, List[str]] = {}
+        self.siren_sirets: Dict[str, Set[str]] = {}
+        self.siret_ndas: Dict[str, Set[str]] = {}
+        self.siret_sirens: Dict[str, str] = {}
+        self.nda_sirens: Dict[str, str] = {}
+        self.names: Dict[str, Counter] = {}
+        self.links: Dict[str, Set[str]] = {}
+        self.capped: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def __contains__(self, siren: str) -> bool:
+        return siren in self.parents
+
+    def find(self, siren: str) -> str:
+        root = self.parents.get(siren)
+        if root is None:
+            return siren
+        while root != self.parents[root]:
+            root = self.parents[root]
+        while siren != root:
+            self.parents[siren], siren = root, self.parents[siren]
+        return root
+
+    def representative(self, siren: str) -> str:
+        names = self.names.get(siren)
+        if not names:
+            return ""
+        return min(names.items(), key=lambda item: (-item[1], item[0]))[0]
+
+    def lookup(self, siret: str = "", ndas: Iterable[str] = ()) -> str:
+        siren = self.siret_sirens.get(siret, "") if siret else ""
+        if not siren:
+            siren = next((self.nda_sirens[nda] for nda in ndas if nda in self.nda_sirens), "")
+        if not siren and len(siret) == SIRET_LENGTH and siret.isdigit():
+            siren = siret[:SIREN_LENGTH]
+        return siren
+
+    def resolve(self, siren: str = "", siret: str = "", ndas: Iterable[str] = ()) -> str:
+        siren = siren or self.lookup(siret, ndas)
+        return self.find(siren) if siren else ""
+
+    def add(self, siren: str, siret: str = "", ndas: Sequence[str] = (), denomination: str = "") -> str:
+        siren = siren or self.lookup(siret, ndas)
+        if not siren:
+            return ""
+        if siren not in self.parents:
+            self.parents[siren] = siren
+            self.members[siren] = [siren]
+        name = normalize_name(denomination) if denomination else ""
+        if name:
+            previous = self.representative(siren)
+            names = self.names.setdefault(siren, Counter())
+            names[name] += 1
+            if name != previous and (not previous or (-names[name], name) < (-names[previous], previous)):
+                self._regroup(siren)
+        if siret:
+            self.siren_sirets.setdefault(siren, set()).add(siret)
+            self.siret_ndas.setdefault(siret, set()).update(ndas)
+            self._link(siren, self.siret_sirens.setdefault(siret, siren))
+            if len(siret) == SIRET_LENGTH and siret.isdigit():
+                self._link(siren, siret[:SIREN_LENGTH])
+        for nda in ndas:
+            self._link(siren, self.nda_sirens.setdefault(nda, siren))
+        return siren
+
+    def update(self, rows: Iterable[Tuple[Optional[str], Optional[str], Optional[str], Optional[str], Optional[str]]]) -> int:
+        added = 0
+        for raw_siren, raw_siret, nda, previous, denomination in rows:
+            siren = self.add(
+                parse_identifier(raw_siren, length=SIREN_LENGTH),
+                parse_identifier(raw_siret, length=SIRET_LENGTH),
+                declaration_numbers(nda, previous),
+                str(denomination or "").strip(),
+            )
+            added += bool(siren)
+        return added
+
+    def entities(self) -> Dict[str, List[str]]:
+        return self.members
+
+    def sirens(self, siren: str) -> List[str]:
+        if siren not in self.parents:
+            return []
+        return list(self.members[self.find(siren)])
+
+    def sirets(self, siren: str) -> Set[str]:
+        sirets: Set[str] = set()
+        for member in self.sirens(siren):
+            sirets |= self.siren_sirets.get(member, set())
+        return sirets
+
+    def ndas(self, siret: str) -> Set[str]:
+        return set(self.siret_ndas.get(siret, ()))
+
+    def _link(self, siren: str, other: str) -> None:
+        if other == siren or other in self.links.get(siren, ()):
+            return
+        self.links.setdefault(siren, set()).add(other)
+        self.links.setdefault(other, set()).add(siren)
+        self._join(siren, other)
+
+    def _join(self, siren: str, other: str) -> None:
+        name = self.representative(siren)
+        if name and other in self.parents and self.representative(other) == name:
+            self._merge(siren, other)
+
+    def _regroup(self, siren: str) -> None:
+        # Only the group of the renamed SIREN can lose or gain links, so it is
+        # split back into single SIRENs and merged again from their own links.
+        root = self.find(siren)
+        members = self.members[root]
+        for member in members:
+            self.parents[member] = member
+            self.members[member] = [member]
+        self.capped.discard(root)
+        for member in sorted(members):
+            for other in sorted(self.links.get(member, ())):
+                self._join(member, other)
+
+    def _merge(self, siren: str, other: str) -> None:
+        # The smallest SIREN of the group stays its canonical identifier.
+        root, other_root = sorted((self.find(siren), self.find(other)))
+        if root == other_root:
+            return
+        members, others = self.members[root], self.members[other_root]
+        if len(members) + len(others) > MAX_ENTITY_SIRENS:
+            self.capped.add(root)
+            return
+        if other_root in self.capped:
+            self.capped.discard(other_root)
+            self.capped.add(root)
+        del self.members[other_root]
+        if len(members) < len(others):
+            members, others = others, members
+        members.extend(others)
+        self.members[root] = members
+        self.parents[other_root] = root
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "parents": {siren: self.find(siren) for siren in self.parents},
+            "siren_sirets": {siren: sorted(sirets) for siren, sirets in self.siren_sirets.items()},
+            "siret_ndas": {siret: sorted(ndas) for siret, ndas in self.siret_ndas.items()},
+            "siret_sirens": self.siret_sirens,
+            "nda_sirens": self.nda_sirens,
+            "names": {siren: dict(names) for siren, names in self.names.items()},
+            "links": {siren: sorted(others) for siren, others in self.links.items()},
+            "capped": sorted(self.capped),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "EntityIndex":
+        index = cls()
+        index.parents = dict(data["parents"])
+        for siren, root in index.parents.items():
+            index.members.setdefault(root, []).append(siren)
+        index.siren_sirets = {siren: set(sirets) for siren, sirets in data["siren_sirets"].items()}
+        index.siret_ndas = {siret: set(ndas) for siret, ndas in data["siret_ndas"].items()}
+        index.siret_sirens = dict(data["siret_sirens"])
+        index.nda_sirens = dict(data["nda_sirens"])
+        index.names = {siren: Counter(names) for siren, names in data["names"].items()}
+        index.links = {siren: set(others) for siren, others in data["links"].items()}
+        index.capped = set(data["capped"])
+        return index
+
+
+def entity_cache_path(path: str) -> str:
+    return cache_path_for(path) + ".entities"
+
+
+def row_key(row: Sequence[Optional[str]]) -> str:
+    text = "\x1f".join("" if value is None else str(value) for value in row)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def read_entity_cache(cache_path: str) -> Optional[Tuple[str, Counter, EntityIndex]]:
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != ENTITY_CACHE_VERSION:
+            return None
+        return data["sha256"], Counter(data["rows"]), EntityIndex.from_dict(data["index"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def write_entity_cache(cache_path: str, digest: str, rows: Counter, index: EntityIndex) -> None:
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": ENTITY_CACHE_VERSION, "sha256": digest, "rows": rows, "index": index.to_dict()},
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(tmp_path, cache_path)
+
+
+def build_entity_index(path: str = XLSX_PATH, use_cache: bool = True) -> EntityIndex:
+    index = EntityIndex()
+    index.update(load_table(path, use_cache=use_cache).select(*IDENTIFIER_COLUMNS))
+    return index
+
+
+def load_entity_index(path: str = XLSX_PATH, use_cache: bool = True) -> EntityIndex:
+    # A new export is applied on top of the previous index when it only adds
+    # rows: the rows already indexed are recognised by their key and skipped.
+    # Links cannot be undone, so an export that drops rows is indexed anew.
+    if not use_cache:
+        return build_entity_index(path, use_cache=False)
+    cache_path = entity_cache_path(path)
+    digest = workbook_digest(path)
+    cached = read_entity_cache(cache_path)
+    if cached is not None and cached[0] == digest:
+        return cached[2]
+    rows = list(load_table(path).select(*IDENTIFIER_COLUMNS))
+    keys = [row_key(row) for row in rows]
+    counts = Counter(keys)
+    if cached is not None and not cached[1] - counts:
+        seen, index = cached[1], cached[2]
+    else:
+        seen, index = Counter(), EntityIndex()
+    pending = []
+    for key, row in zip(keys, rows):
+        if seen[key]:
+            seen[key] -= 1
+        else:
+            pending.append(row)
+    index.update(pending)
+    try:
+        write_entity_cache(cache_path, digest, counts, index)
+    except OSError:
+        pass
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Interroge l'index SIREN → SIRET → NDA des organismes.")
+    parser.add_argument("path", nargs="?", default=XLSX_PATH)
+    parser.add_argument("--siren", default="", help="SIREN à résoudre")
+    parser.add_argument("--siret", default="", help="SIRET à résoudre")
+    parser.add_argument("--nda", default="", help="numéro de déclaration d'activité à résoudre")
+    parser.add_argument("--no-cache", action="store_true", help="reconstruit l'index sans lire ni écrire le cache")
+    args = parser.parse_args()
+    index = load_entity_index(args.path, use_cache=not args.no_cache)
+    print(f"{len(index)} SIREN indexés, {len(index.entities())} entités après rapprochement")
+    if index.capped:
+        print(f"Attention : {len(index.capped)} entités plafonnées à {MAX_ENTITY_SIRENS} SIREN, rapprochements restants ignorés")
+    if not (args.siren or args.siret or args.nda):
+        return
+    siren = index.resolve(
+        parse_identifier(args.siren, length=SIREN_LENGTH),
+        parse_identifier(args.siret, length=SIRET_LENGTH),
+        declaration_numbers(args.nda),
+    )
+    if siren not in index:
+        print("Organisme introuvable")
+        return
+    print(f"Entité {siren} : SIREN {', '.join(sorted(index.sirens(siren)))}")
+    for siret in sorted(index.sirets(siren)):
+        print(f"  {siret} : NDA {', '.join(sorted(index.ndas(siret))) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
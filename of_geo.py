@@ -0,0 +1,276 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from of_dataset import ColumnKey, OFTable
+
+DEPARTMENT_NAMES: Dict[str, str] = {
+    "01": "Ain",
+    "02": "Aisne",
+    "03": "Allier",
+    "04": "Alpes-de-Haute-Provence",
+    "05": "Hautes-Alpes",
+    "06": "Alpes-Maritimes",
+    "07": "Ardèche",
+    "08": "Ardennes",
+    "09": "Ariège",
+    "10": "Aube",
+    "11": "Aude",
+    "12": "Aveyron",
+    "13": "Bouches-du-Rhône",
+    "14": "Calvados",
+    "15": "Cantal",
+    "16": "Charente",
+    "17": "Charente-Maritime",
+    "18": "Cher",
+    "19": "Corrèze",
+    "2A": "Corse-du-Sud",
+    "2B": "Haute-Corse",
+    "21": "Côte-d'Or",
+    "22": "Côtes-d'Armor",
+    "23": "Creuse",
+    "24": "Dordogne",
+    "25": "Doubs",
+    "26": "Drôme",
+    "27": "Eure",
+    "28": "Eure-et-Loir",
+    "29": "Finistère",
+    "30": "Gard",
+    "31": "Haute-Garonne",
+    "32": "Gers",
+    "33": "Gironde",
+    "34": "Hérault",
+    "35": "Ille-et-Vilaine",
+    "36": "Indre",
+    "37": "Indre-et-Loire",
+    "38": "Isère",
+    "39": "Jura",
+    "40": "Landes",
+    "41": "Loir-et-Cher",
+    "42": "Loire",
+    "43": "Haute-Loire",
+    "44": "Loire-Atlantique",
+    "45": "Loiret",
+    "46": "Lot",
+    "47": "Lot-et-Garonne",
+    "48": "Lozère",
+    "49": "Maine-et-Loire",
+    "50": "Manche",
+    "51": "Marne",
+    "52": "Haute-Marne",
+    "53": "Mayenne",
+    "54": "Meurthe-et-Moselle",
+    "55": "Meuse",
+    "56": "Morbihan",
+    "57": "Moselle",
+    "58": "Nièvre",
+    "59": "Nord",
+    "60": "Oise",
+    "61": "Orne",
+    "62": "Pas-de-Calais",
+    "63": "Puy-de-Dôme",
+    "64": "Pyrénées-Atlantiques",
+    "65": "Hautes-Pyrénées",
+    "66": "Pyrénées-Orientales",
+    "67": "Bas-Rhin",
+    "68": "Haut-Rhin",
+    "69": "Rhône",
+    "70": "Haute-Saône",
+    "71": "Saône-et-Loire",
+    "72": "Sarthe",
+    "73": "Savoie",
+    "74": "Haute-Savoie",
+    "75": "Paris",
+    "76": "Seine-Maritime",
+    "77": "Seine-et-Marne",
+    "78": "Yvelines",
+    "79": "Deux-Sèvres",
+    "80": "Somme",
+    "81": "Tarn",
+    "82": "Tarn-et-Garonne",
+    "83": "Var",
+    "84": "Vaucluse",
+    "85": "Vendée",
+    "86": "Vienne",
+    "87": "Haute-Vienne",
+    "88": "Vosges",
+    "89": "Yonne",
+    "90": "Territoire de Belfort",
+    "91": "Essonne",
+    "92": "Hauts-de-Seine",
+    "93": "Seine-Saint-Denis",
+    "94": "Val-de-Marne",
+    "95": "Val-d'Oise",
+    "971": "Guadeloupe",
+    "972": "Martinique",
+    "973": "Guyane",
+    "974": "La Réunion",
+    "975": "Saint-Pierre-et-Miquelon",
+    "976": "Mayotte",
+    "977": "Saint-Barthélemy",
+    "978": "Saint-Martin",
+    "986": "Wallis-et-Futuna",
+    "987": "Polynésie française",
+    "988": "Nouvelle-Calédonie",
+    "989": "Île de Clipperton",
+    "990": "Monaco",
+}
+
+# Chef-lieu of each department, used when a city has no coordinates of its own.
+DEPARTMENT_SEATS: Dict[str, Tuple[float, float]] = {
+    "01": (46.2052, 5.2255),
+    "02": (49.5641, 3.6199),
+    "03": (46.5646, 3.3326),
+    "04": (44.0925, 6.2356),
+    "05": (44.5594, 6.0786),
+    "06": (43.7102, 7.2620),
+    "07": (44.7353, 4.5990),
+    "08": (49.7621, 4.7263),
+    "09": (42.9653, 1.6069),
+    "10": (48.2973, 4.0744),
+    "11": (43.2130, 2.3491),
+    "12": (44.3506, 2.5750),
+    "13": (43.2965, 5.3698),
+    "14": (49.1829, -0.3707),
+    "15": (44.9264, 2.4397),
+    "16": (45.6484, 0.1562),
+    "17": (46.1603, -1.1511),
+    "18": (47.0810, 2.3988),
+    "19": (45.2658, 1.7722),
+    "2A": (41.9192, 8.7386),
+    "2B": (42.6973, 9.4509),
+    "21": (47.3220, 5.0415),
+    "22": (48.5136, -2.7653),
+    "23": (46.1716, 1.8717),
+    "24": (45.1847, 0.7214),
+    "25": (47.2378, 6.0241),
+    "26": (44.9334, 4.8924),
+    "27": (49.0270, 1.1508),
+    "28": (48.4439, 1.4890),
+    "29": (47.9960, -4.1024),
+    "30": (43.8367, 4.3601),
+    "31": (43.6045, 1.4442),
+    "32": (43.6460, 0.5857),
+    "33": (44.8378, -0.5792),
+    "34": (43.6108, 3.8767),
+    "35": (48.1173, -1.6778),
+    "36": (46.8103, 1.6913),
+    "37": (47.3941, 0.6848),
+    "38": (45.1885, 5.7245),
+    "39": (46.6744, 5.5546),
+    "40": (43.8902, -0.4999),
+    "41": (47.5861, 1.3359),
+    "42": (45.4397, 4.3872),
+    "43": (45.0434, 3.8855),
+    "44": (47.2184, -1.5536),
+    "45": (47.9030, 1.9093),
+    "46": (44.4475, 1.4419),
+    "47": (44.2033, 0.6163),
+    "48": (44.5181, 3.5006),
+    "49": (47.4784, -0.5632),
+    "50": (49.1157, -1.0906),
+    "51": (48.9566, 4.3631),
+    "52": (48.1113, 5.1392),
+    "53": (48.0707, -0.7734),
+    "54": (48.6921, 6.1844),
+    "55": (48.7727, 5.1600),
+    "56": (47.6582, -2.7608),
+    "57": (49.1193, 6.1757),
+    "58": (46.9908, 3.1591),
+    "59": (50.6292, 3.0573),
+    "60": (49.4295, 2.0807),
+    "61": (48.4329, 0.0913),
+    "62": (50.2910, 2.7775),
+    "63": (45.7772, 3.0870),
+    "64": (43.2951, -0.3708),
+    "65": (43.2328, 0.0781),
+    "66": (42.6887, 2.8948),
+    "67": (48.5734, 7.7521),
+    "68": (48.0794, 7.3585),
+    "69": (45.7640, 4.8357),
+    "70": (47.6198, 6.1544),
+    "71": (46.3069, 4.8287),
+    "72": (48.0061, 0.1996),
+    "73": (45.5646, 5.9178),
+    "74": (45.8992, 6.1294),
+    "75": (48.8566, 2.3522),
+    "76": (49.4432, 1.0999),
+    "77": (48.5421, 2.6554),
+    "78": (48.8049, 2.1204),
+    "79": (46.3237, -0.4588),
+    "80": (49.8941, 2.2958),
+    "81": (43.9289, 2.1464),
+    "82": (44.0176, 1.3550),
+    "83": (43.1242, 5.9280),
+    "84": (43.9493, 4.8055),
+    "85": (46.6705, -1.4260),
+    "86": (46.5802, 0.3404),
+    "87": (45.8336, 1.2611),
+    "88": (48.1724, 6.4496),
+    "89": (47.7982, 3.5673),
+    "90": (47.6397, 6.8638),
+    "91": (48.6243, 2.4290),
+    "92": (48.8924, 2.2071),
+    "93": (48.9077, 2.4397),
+    "94": (48.7904, 2.4556),
+    "95": (49.0364, 2.0761),
+    "971": (15.9985, -61.7261),
+    "972": (14.6161, -61.0588),
+    "973": (4.9224, -52.3135),
+    "974": (-20.8823, 55.4504),
+    "976": (-12.7806, 45.2279),
+    "987": (-17.5516, -149.5585),
+    "988": (-22.2758, 166.4580),
+}
+
+OVERSEAS_PREFIXES = ("97", "98")
+
+
+def _prefix_department(prefix: str) -> str:
+    if prefix.startswith(OVERSEAS_PREFIXES):
+        return prefix
+    if prefix.startswith("20"):
+        return "2A" if prefix[2] in {"0", "1"} else "2B"
+    return prefix[:2]
+
+
+CP_PREFIX_DEPARTMENTS: Dict[str, str] = {"%03d" % prefix: _prefix_department("%03d" % prefix) for prefix in range(1000)}
+
+
+@lru_cache(maxsize=None)
+def normalize_postal_code(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text or text.lower() == "nan":
+        return None
+    text = text.replace(" ", "")
+    if text.endswith(".0"):
+        text = text[:-2]
+    digits = "".join(ch for ch in text if ch.isdigit())
+    if not digits:
+        return None
+    if len(digits) >= 5:
+        return digits[:5]
+    if len(digits) == 4:
+        return "0" + digits
+    if len(digits) == 3:
+        if digits.startswith(OVERSEAS_PREFIXES):
+            return digits + "00"
+        return digits
+    return digits.zfill(5)
+
+
+def department_from_postal_code(cp: Optional[str]) -> Optional[str]:
+    if not cp:
+        return None
+    return CP_PREFIX_DEPARTMENTS.get(cp[:3], cp[:2])
+
+
+@lru_cache(maxsize=None)
+def postal_department(value: Optional[str]) -> Optional[str]:
+    return department_from_postal_code(normalize_postal_code(value))
+
+
+def department_column(table: OFTable, key: ColumnKey) -> List[Optional[str]]:
+    return table.parsed(key, postal_department).values
+
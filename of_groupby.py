@@ -0,0 +1,154 @@
+import math
+import statistics
+from collections import Counter
+from operator import attrgetter
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Union
+
+Getter = Union[str, Sequence[str], Callable[[object], object]]
+Predicate = Optional[Callable[[object], object]]
+
+
+def getter(spec: Getter) -> Callable[[object], object]:
+    if callable(spec):
+        return spec
+    if isinstance(spec, str):
+        return attrgetter(spec)
+    return attrgetter(*spec)
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class Aggregation:
+    def __init__(self, value: Optional[Getter] = None, where: Predicate = None):
+        self.value = getter(value) if value is not None else None
+        self.where = where
+
+    def start(self):
+        return None
+
+    def add(self, state, value):
+        return state
+
+    def finish(self, state):
+        return state
+
+
+class Count(Aggregation):
+    def start(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1
+
+
+class Sum(Aggregation):
+    def __init__(self, value: Getter, where: Predicate = None, start: float = 0):
+        super().__init__(value, where)
+        self.initial = start
+
+    def start(self):
+        return self.initial
+
+    def add(self, state, value):
+        return state + value
+
+
+class Mean(Aggregation):
+    def start(self):
+        return [0, 0]
+
+    def add(self, state, value):
+        state[0] += value
+        state[1] += 1
+        return state
+
+    def finish(self, state):
+        return state[0] / state[1] if state[1] else None
+
+
+class Collect(Aggregation):
+    def start(self):
+        return []
+
+    def add(self, state, value):
+        state.append(value)
+        return state
+
+
+class Median(Collect):
+    def finish(self, state):
+        return statistics.median(state) if state else None
+
+
+class Percentile(Collect):
+    def __init__(self, value: Getter, q: float, where: Predicate = None):
+        super().__init__(value, where)
+        self.q = q
+
+    def finish(self, state):
+        return percentile(state, self.q)
+
+
+class First(Aggregation):
+    def add(self, state, value):
+        return value if state is None else state
+
+
+class Tally(Aggregation):
+    def __init__(self, value: Getter, where: Predicate = None, many: bool = False):
+        super().__init__(value, where)
+        self.many = many
+
+    def start(self):
+        return Counter()
+
+    def add(self, state, value):
+        if self.many:
+            state.update(value)
+        else:
+            state[value] += 1
+        return state
+
+
+def group_by(
+    rows: Iterable[object],
+    key: Getter,
+    aggregations: Dict[str, Aggregation],
+    where: Predicate = None,
+) -> Dict[Hashable, Dict[str, object]]:
+    # Rows whose key (or any key part) is None are skipped, and so are the None
+    # values of an aggregation; groups keep the order in which they first appear.
+    key_of = getter(key)
+    specs = list(aggregations.items())
+    states: Dict[Hashable, List[object]] = {}
+    for row in rows:
+        if where is not None and not where(row):
+            continue
+        group = key_of(row)
+        if group is None or (isinstance(group, tuple) and None in group):
+            continue
+        state = states.get(group)
+        if state is None:
+            state = states[group] = [aggregation.start() for _, aggregation in specs]
+        for position, (_, aggregation) in enumerate(specs):
+            if aggregation.where is not None and not aggregation.where(row):
+                continue
+            if aggregation.value is None:
+                value = row
+            else:
+                value = aggregation.value(row)
+                if value is None:
+                    continue
+            state[position] = aggregation.add(state[position], value)
+    return {
+        group: {name: aggregation.finish(value) for (name, aggregation), value in zip(specs, state)}
+        for group, state in states.items()
+    }
@@ -0,0 +1,147 @@
+import argparse
+import math
+from collections import Counter
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+from of_dataset import XLSX_PATH, load_table
+from of_entities import normalize_name
+
+NGRAM_SIZE = 3
+MATCH_THRESHOLD = 0.6
+GENERIC_TOKEN_SHARE = 0.02
+GENERIC_TOKEN_MIN = 20
+
+LEGAL_FORMS = frozenset({"SA", "SAS", "SASU", "SARL", "EURL", "SNC", "SCOP", "SCIC", "SELARL", "GIE", "ASSOCIATION", "ASSO"})
+
+Tokens = Tuple[str, ...]
+
+
+def name_tokens(name: str) -> Tokens:
+    # "X.Y.Z." normalizes to "X Y Z": runs of single letters are glued back into one
+    # acronym; numbers and legal forms never identify a brand.
+    tokens: List[str] = []
+    letters: List[str] = []
+    for token in normalize_name(name).split() + [""]:
+        if len(token) == 1 and token.isalpha():
+            letters.append(token)
+            continue
+        if letters:
+            tokens.append("".join(letters))
+            letters = []
+        if token and not token.isdigit() and token not in LEGAL_FORMS:
+            tokens.append(token)
+    return tuple(tokens)
+
+
+def token_ngrams(tokens: Iterable[str], size: int = NGRAM_SIZE) -> FrozenSet[str]:
+    pad = "#" * (size - 1)
+    grams: Set[str] = set()
+    for token in tokens:
+        padded = pad + token + pad
+        grams.update(padded[i : i + size] for i in range(len(padded) - size + 1))
+    return frozenset(grams)
+
+
+def dice(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class NameMatcher:
+    # Candidate pairs come from a prefix-filtered n-gram index: every name is only
+    # indexed under its rarest n-grams, and two names whose Dice score reaches the
+    # threshold always share one of them, so no pair above the threshold is missed
+    # while frequent n-grams ("FOR", "ION"...) never produce huge blocks.
+    def __init__(self, names: Iterable[Tuple[Hashable, str]], threshold: float = MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.jaccard = threshold / (2 - threshold)
+        named: Dict[Tokens, Set[Hashable]] = {}
+        for key, name in names:
+            tokens = name_tokens(name) if name else ()
+            if tokens:
+                named.setdefault(tokens, set()).add(key)
+        token_counts: Counter = Counter(token for tokens in named for token in set(tokens))
+        limit = max(GENERIC_TOKEN_MIN, GENERIC_TOKEN_SHARE * len(named))
+        self.generic = frozenset(token for token, count in token_counts.items() if count > limit)
+        cores: Dict[FrozenSet[str], Set[Hashable]] = {}
+        for tokens, keys in named.items():
+            cores.setdefault(self.grams(tokens), set()).update(keys)
+        self.entries: List[Tuple[FrozenSet[str], Set[Hashable]]] = list(cores.items())
+        self.gram_counts: Counter = Counter(gram for grams, _ in self.entries for gram in grams)
+        self.postings: Dict[str, List[int]] = {}
+        self.cache: Dict[FrozenSet[str], List[Tuple[float, Set[Hashable]]]] = {}
+        for position, (grams, _) in enumerate(self.entries):
+            for gram in self.prefix(grams):
+                self.postings.setdefault(gram, []).append(position)
+
+    def grams(self, tokens: Tokens) -> FrozenSet[str]:
+        core = [token for token in tokens if token not in self.generic] or list(tokens)
+        return token_ngrams(core)
+
+    def prefix(self, grams: FrozenSet[str]) -> List[str]:
+        ordered = sorted(grams, key=lambda gram: (self.gram_counts.get(gram, 0), gram))
+        return ordered[: len(ordered) - math.ceil(self.jaccard * len(ordered) - 1e-9) + 1]
+
+    def _candidates(self, grams: FrozenSet[str]) -> Iterable[int]:
+        low, high = self.jaccard * len(grams) - 1e-9, len(grams) / self.jaccard + 1e-9
+        seen: Set[int] = set()
+        for gram in self.prefix(grams):
+            for position in self.postings.get(gram, ()):
+                if position not in seen and low <= len(self.entries[position][0]) <= high:
+                    seen.add(position)
+                    yield position
+
+    def key(self, name: str) -> Optional[FrozenSet[str]]:
+        tokens = name_tokens(name) if name else ()
+        return self.grams(tokens) if tokens else None
+
+    def matches(self, grams: FrozenSet[str]) -> List[Tuple[float, Set[Hashable]]]:
+        found = self.cache.get(grams)
+        if found is None:
+            found = []
+            for position in self._candidates(grams):
+                other, keys = self.entries[position]
+                score = dice(grams, other)
+                if score >= self.threshold:
+                    found.append((score, keys))
+            found.sort(key=lambda match: -match[0])
+            self.cache[grams] = found
+        return found
+
+    def query(self, name: str) -> List[Tuple[Hashable, float]]:
+        grams = self.key(name)
+        if grams is None:
+            return []
+        scores: Dict[Hashable, float] = {}
+        for score, keys in self.matches(grams):
+            for key in keys:
+                scores.setdefault(key, score)
+        return sorted(scores.items(), key=lambda item: (-item[1], str(item[0])))
+
+    def pairs(self) -> Iterable[Tuple[Set[Hashable], Set[Hashable], float]]:
+        for position, (grams, keys) in enumerate(self.entries):
+            for other in self._candidates(grams):
+                if other <= position:
+                    continue
+                other_grams, other_keys = self.entries[other]
+                score = dice(grams, other_grams)
+                if score >= self.threshold:
+                    yield keys, other_keys, score
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recherche les dénominations proches d'un nom d'organisme.")
+    parser.add_argument("name", help="dénomination à rapprocher")
+    parser.add_argument("--path", default=XLSX_PATH)
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD, help="score de Dice minimal (défaut: %(default)s)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+    names = {str(name).strip() for name in load_table(args.path).column("denomination") if name and str(name).strip()}
+    matcher = NameMatcher(((name, name) for name in names), threshold=args.threshold)
+    for name, score in matcher.query(args.name)[: args.top]:
+        print(f"{score:.2f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+DEFAULT_CELL_KM = 25.0
+
+Coords = Tuple[float, float]
+
+
+@dataclass(slots=True, eq=False)
+class GeoPoint:
+    key: Hashable
+    lat: float
+    lon: float
+    weight: float = 1.0
+    data: object = None
+
+    @property
+    def coords(self) -> Coords:
+        return self.lat, self.lon
+
+
+def haversine_km(a: Coords, b: Coords) -> float:
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def weighted_centroid(points: Iterable[GeoPoint]) -> Optional[Coords]:
+    total = lat = lon = 0.0
+    for point in points:
+        total += point.weight
+        lat += point.lat * point.weight
+        lon += point.lon * point.weight
+    if total <= 0:
+        return None
+    return lat / total, lon / total
+
+
+class GridIndex:
+    def __init__(self, points: Iterable[GeoPoint], cell_km: float = DEFAULT_CELL_KM):
+        self.step = cell_km / KM_PER_DEGREE
+        self.cells: Dict[Tuple[int, int], List[GeoPoint]] = {}
+        self.size = 0
+        for point in points:
+            self.cells.setdefault(self._cell(point.lat, point.lon), []).append(point)
+            self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.step), math.floor(lon / self.step)
+
+    def within(self, coords: Coords, radius_km: float) -> List[Tuple[float, GeoPoint]]:
+        lat, lon = coords
+        dlat = radius_km / KM_PER_DEGREE
+        widest = min(89.9, abs(lat) + dlat)
+        dlon = min(180.0, dlat / math.cos(math.radians(widest)))
+        low_row, low_col = self._cell(lat - dlat, lon - dlon)
+        high_row, high_col = self._cell(lat + dlat, lon + dlon)
+        hits: List[Tuple[float, GeoPoint]] = []
+        if (high_row - low_row + 1) * (high_col - low_col + 1) > len(self.cells):
+            candidates: Iterable[List[GeoPoint]] = self.cells.values()
+        else:
+            candidates = (
+                self.cells[(row, col)]
+                for row in range(low_row, high_row + 1)
+                for col in range(low_col, high_col + 1)
+                if (row, col) in self.cells
+            )
+        for bucket in candidates:
+            for point in bucket:
+                distance = haversine_km(coords, point.coords)
+                if distance <= radius_km:
+                    hits.append((distance, point))
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    def nearest(self, coords: Coords, k: int = 1) -> List[Tuple[float, GeoPoint]]:
+        if not self.size:
+            return []
+        radius = self.step * KM_PER_DEGREE
+        while True:
+            hits = self.within(coords, radius)
+            if len(hits) >= min(k, self.size) or radius >= math.pi * EARTH_RADIUS_KM:
+                return hits[:k]
+            radius *= 2
+
+
+def density_clusters(points: List[GeoPoint], eps_km: float, min_weight: float) -> List[List[GeoPoint]]:
+    # DBSCAN where a point is a core point when the weights within eps_km add up to
+    # min_weight; each neighbourhood is queried once through the grid.
+    index = GridIndex(points, cell_km=eps_km)
+    assigned: Dict[GeoPoint, int] = {}
+    clusters: List[List[GeoPoint]] = []
+    for seed in sorted(points, key=lambda point: -point.weight):
+        if seed in assigned:
+            continue
+        around = [point for _, point in index.within(seed.coords, eps_km)]
+        if sum(point.weight for point in around) < min_weight:
+            continue
+        members: List[GeoPoint] = []
+        assigned[seed] = len(clusters)
+        queue = deque([(seed, around)])
+        while queue:
+            point, around = queue.popleft()
+            members.append(point)
+            if around is None:
+                around = [other for _, other in index.within(point.coords, eps_km)]
+            if sum(other.weight for other in around) < min_weight:
+                continue
+            for other in around:
+                if other not in assigned:
+                    assigned[other] = len(clusters)
+                    queue.append((other, None))
+        clusters.append(members)
+    return clusters
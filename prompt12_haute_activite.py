@@ -1,16 +1,17 @@
 import csv
 import os
-import zipfile
-import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 
-XLSX_PATH = "OF 3-10.xlsx"
+from analyze_specialites import MACRO_THEMES, classify_specialite
+from of_arrays import Mask, mask_and, numeric_column, take
+from of_dataset import XLSX_PATH, OFTable, intern_text, load_table
+from of_geo import postal_department
+
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MARKDOWN = os.path.join(OUTPUT_DIR, "prompt12_haute_activite.md")
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, "prompt12_top50_haute_activite.csv")
 
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 TARGET_MIN = 3
 TARGET_MAX = 10
 
@@ -42,172 +43,8 @@ REGION_NAMES: Dict[int, str] = {
     989: "Îles de Clipperton",
 }
 
-MACRO_THEMES = [
-    "Soft Skills",
-    "Tech/Digital",
-    "Commerce/Gestion",
-    "Santé",
-    "Langues",
-    "Juridique",
-    "Industrie",
-    "Services",
-    "Sécurité",
-    "Autre",
-]
-
-SPECIFIC_MAPPING: Dict[str, str] = {
-    "enseignement, formation": "Soft Skills",
-    "ressources humaines, gestion du personnel, gestion de l'emploi": "Soft Skills",
-    "développement des capacités comportementales et relationnelles": "Soft Skills",
-    "développement des capacités d'orientation, d'insertion ou de réinsertion sociales et professionnelles": "Soft Skills",
-    "formations générales": "Autre",
-    "pluridisciplinaire": "Autre",
-    "finances, banque, assurances": "Commerce/Gestion",
-    "banque et assurances": "Commerce/Gestion",
-    "comptabilité, gestion": "Commerce/Gestion",
-    "techniques de vente": "Commerce/Gestion",
-    "commerce, vente": "Commerce/Gestion",
-    "marketing": "Commerce/Gestion",
-    "soins infirmiers": "Santé",
-    "santé": "Santé",
-    "sanitaire et social": "Santé",
-    "travail social": "Santé",
-    "action sociale": "Santé",
-    "services domestiques": "Services",
-    "services à la personne": "Services",
-    "transport, manutention, magasinage": "Services",
-    "logistique, transport": "Services",
-    "bâtiment et travaux publics": "Industrie",
-    "génie civil, construction, bois": "Industrie",
-    "mécanique générale": "Industrie",
-    "mécanique et structures métalliques": "Industrie",
-    "maintenance industrielle": "Industrie",
-    "électronique": "Tech/Digital",
-    "électricité": "Industrie",
-    "énergie": "Industrie",
-    "informatique": "Tech/Digital",
-    "programmation, développement": "Tech/Digital",
-    "réseaux informatiques": "Tech/Digital",
-    "langues vivantes": "Langues",
-    "linguistique": "Langues",
-    "traduction, interprétation": "Langues",
-    "droit": "Juridique",
-    "sécurité des biens et des personnes": "Sécurité",
-    "sécurité, armée, police": "Sécurité",
-    "hôtellerie, restauration": "Services",
-    "tourisme": "Services",
-    "esthétique, coiffure": "Services",
-    "coiffure": "Services",
-    "esthétique": "Services",
-    "agriculture": "Autre",
-    "agronomie": "Autre",
-    "environnement": "Autre",
-}
 
-KEYWORD_RULES: List[Tuple[str, Tuple[str, ...]]] = [
-    (
-        "Tech/Digital",
-        (
-            "informatique",
-            "numér",
-            "programm",
-            "réseau",
-            "logiciel",
-            "digital",
-            "donnée",
-            "cyber",
-            "cloud",
-            "web",
-            "intelligence artificielle",
-            "information",
-        ),
-    ),
-    (
-        "Soft Skills",
-        (
-            "orientation",
-            "ressources humaines",
-            "gestion du personnel",
-            "enseignement",
-            "pédagog",
-            "insertion",
-            "comportement",
-            "formation de formateurs",
-        ),
-    ),
-    (
-        "Commerce/Gestion",
-        (
-            "vente",
-            "commercial",
-            "marketing",
-            "gestion",
-            "finance",
-            "banque",
-            "assurance",
-            "comptabil",
-            "achats",
-            "immobilier",
-        ),
-    ),
-    (
-        "Santé",
-        (
-            "sant",
-            "médic",
-            "paraméd",
-            "infirm",
-            "social",
-            "soin",
-            "pharma",
-            "handicap",
-        ),
-    ),
-    ("Langues", ("langue", "lingu", "tradu", "interpr")),
-    ("Juridique", ("droit", "jurid", "justice", "crimin", "sciences politiques")),
-    (
-        "Industrie",
-        (
-            "mécan",
-            "industri",
-            "électric",
-            "électrotech",
-            "maintenance",
-            "fabrication",
-            "production",
-            "chim",
-            "bâtiment",
-            "travaux publics",
-            "construction",
-            "métall",
-            "plasturg",
-            "energie",
-        ),
-    ),
-    (
-        "Services",
-        (
-            "service",
-            "transport",
-            "logist",
-            "coiff",
-            "esthé",
-            "restauration",
-            "hôtel",
-            "tourisme",
-            "nettoyage",
-            "sport",
-            "animation",
-            "santé animale",
-            "assistan",
-            "secrét",
-        ),
-    ),
-    ("Sécurité", ("sécur", "police", "gendar", "sûreté", "pompier", "secours", "défense")),
-]
-
-
-@dataclass
+@dataclass(slots=True)
 class Record:
     denomination: str
     nb_stagiaires: float
@@ -224,46 +61,6 @@ def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared
-    with zf.open(path) as f:
-        for _, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared.append(text)
-                elem.clear()
-    return shared
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_float(value: Optional[str]) -> Optional[float]:
     if value is None:
         return None
@@ -289,177 +86,55 @@ def parse_int(value: Optional[str]) -> Optional[int]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {
-                "denomination": None,
-                "nb_stagiaires": None,
-                "effectif": None,
-                "actions": None,
-                "region": None,
-                "specialite": None,
-                "adresse": None,
-                "code_postal": None,
-                "ville": None,
-            }
-            for _, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    target_indices["denomination"] = next(
-                        (idx for idx, name in header_map.items() if name == "denomination"),
-                        None,
-                    )
-                    target_indices["nb_stagiaires"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.nbStagiaires"
-                        ),
-                        None,
-                    )
-                    target_indices["effectif"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.effectifFormateurs"
-                        ),
-                        None,
-                    )
-                    target_indices["actions"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "certifications.actionsDeFormation"
-                        ),
-                        None,
-                    )
-                    target_indices["region"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.codeRegion"
-                        ),
-                        None,
-                    )
-                    target_indices["specialite"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name
-                            == "informationsDeclarees.specialitesDeFormation.libelleSpecialite1"
-                        ),
-                        None,
-                    )
-                    target_indices["adresse"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.voie"
-                        ),
-                        None,
-                    )
-                    target_indices["code_postal"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.codePostal"
-                        ),
-                        None,
-                    )
-                    target_indices["ville"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.ville"
-                        ),
-                        None,
-                    )
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                denomination = str(values.get(target_indices["denomination"], ""))
-                nb_stagiaires = parse_float(values.get(target_indices["nb_stagiaires"])) or 0.0
-                effectif = parse_int(values.get(target_indices["effectif"]))
-                actions = parse_int(values.get(target_indices["actions"]))
-                region_code = parse_int(values.get(target_indices["region"]))
-                specialite = values.get(target_indices["specialite"])
-                if specialite is not None:
-                    specialite = specialite.strip()
-                    if not specialite:
-                        specialite = None
-                adresse = values.get(target_indices["adresse"])
-                if adresse:
-                    adresse = adresse.strip()
-                code_postal = values.get(target_indices["code_postal"])
-                if code_postal:
-                    code_postal = code_postal.strip()
-                ville = values.get(target_indices["ville"])
-                if ville:
-                    ville = ville.strip()
-                records.append(
-                    Record(
-                        denomination=denomination.strip(),
-                        nb_stagiaires=nb_stagiaires,
-                        effectif=effectif,
-                        actions=actions,
-                        region_code=region_code,
-                        specialite=specialite,
-                        adresse=adresse,
-                        code_postal=code_postal,
-                        ville=ville,
-                    )
-                )
-                elem.clear()
+    for denomination, stagiaires, effectif, actions, region, specialite, adresse, code_postal, ville in table.select(
+        "denomination",
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("certifications.actionsDeFormation", parse_int),
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+        "adressePhysiqueOrganismeFormation.voie",
+        "adressePhysiqueOrganismeFormation.codePostal",
+        "adressePhysiqueOrganismeFormation.ville",
+    ):
+        if specialite is not None:
+            specialite = specialite.strip()
+            if not specialite:
+                specialite = None
+        if adresse:
+            adresse = adresse.strip()
+        if code_postal:
+            code_postal = code_postal.strip()
+        if ville:
+            ville = ville.strip()
+        records.append(
+            Record(
+                denomination=str(denomination or "").strip(),
+                nb_stagiaires=stagiaires or 0.0,
+                effectif=effectif,
+                actions=actions,
+                region_code=region,
+                specialite=intern_text(specialite),
+                adresse=adresse,
+                code_postal=code_postal,
+                ville=intern_text(ville),
+            )
+        )
     return records
 
 
-def is_tam(record: Record) -> bool:
-    if record.effectif is None or not (TARGET_MIN <= record.effectif <= TARGET_MAX):
-        return False
-    if record.actions != 1:
-        return False
-    if record.nb_stagiaires <= 0:
-        return False
-    return True
+def tam_mask(table: OFTable) -> Mask:
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_int)
+    return mask_and(effectif.between(TARGET_MIN, TARGET_MAX), actions.equals(1), stagiaires.positive())
 
 
-def classify_specialite(label: Optional[str]) -> str:
-    if not label:
-        return "Autre"
-    norm = label.strip().lower()
-    if norm in SPECIFIC_MAPPING:
-        return SPECIFIC_MAPPING[norm]
-    if "formations générales" in norm or "non class" in norm:
-        return "Autre"
-    for theme, keywords in KEYWORD_RULES:
-        if any(keyword in norm for keyword in keywords):
-            return theme
-    return "Autre"
+def filter_tam(records: List[Record]) -> List[Record]:
+    # records come from load_records, one per workbook row.
+    return take(records, tam_mask(load_table(XLSX_PATH)))
 
 
 def format_int(value: float) -> str:
@@ -482,15 +157,6 @@ def compute_prod(nb_stagiaires: float) -> float:
     return nb_stagiaires / 12.0
 
 
-def derive_dept(code_postal: Optional[str]) -> str:
-    if not code_postal:
-        return "-"
-    code = code_postal.strip()
-    if len(code) < 2:
-        return "-"
-    return code[:2]
-
-
 def build_table1(
     high_records: List[Record], tam_records: List[Record]
 ) -> Tuple[List[List[str]], List[Dict[str, float]]]:
@@ -720,7 +386,7 @@ def build_table5(high_records: List[Record]) -> Tuple[List[List[str]], List[Dict
     rows: List[List[str]] = []
     csv_rows: List[Dict[str, str]] = []
     for rank, rec in enumerate(sorted_records[:50], start=1):
-        dept = derive_dept(rec.code_postal)
+        dept = postal_department(rec.code_postal) or "-"
         ratio = safe_div(rec.nb_stagiaires, rec.effectif or 0)
         prod = compute_prod(rec.nb_stagiaires)
         rows.append(
@@ -814,7 +480,7 @@ def render_table(title: str, headers: List[str], rows: List[List[str]]) -> List[
 def generate_markdown() -> None:
     ensure_output_dir()
     records = load_records()
-    tam_records = [r for r in records if is_tam(r)]
+    tam_records = filter_tam(records)
     high_records = [r for r in tam_records if r.nb_stagiaires >= 500]
 
     table1, tranche_stats = build_table1(high_records, tam_records)
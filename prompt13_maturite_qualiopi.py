@@ -1,19 +1,17 @@
 import csv
-import math
 import os
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import defaultdict
-from datetime import date, datetime, timedelta
+from dataclasses import dataclass
 from typing import Dict, Iterable, List, Optional, Tuple
 
-XLSX_PATH = "OF 3-10.xlsx"
+from of_dataset import XLSX_PATH, intern_text, load_table
+from of_dates import load_date_column
+from of_geo import postal_department
+
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MARKDOWN = os.path.join(OUTPUT_DIR, "prompt13_maturite_qualiopi.md")
 OUTPUT_CSV_REGIONS = os.path.join(OUTPUT_DIR, "prompt13_regions_maturite.csv")
 
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
-
 COL_REGION = 8
 COL_CERT_ACTIONS = 9
 COL_DATE_DERNIERE_DECL = 18
@@ -50,59 +48,20 @@ REGION_NAMES: Dict[int, str] = {
 }
 
 
-class Record(Tuple):
+@dataclass(slots=True)
+class Record:
     region_code: Optional[int]
     is_certified: bool
     nb_stagiaires: Optional[float]
     effectif_formateurs: Optional[float]
     code_postal: Optional[str]
-    annee_derniere_declaration: Optional[int]
+    annee_decl: Optional[int]
 
 
 def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        value = cell.find(NS + "v")
-        if value is None or value.text is None:
-            return None
-        return shared_strings[int(value.text)]
-    if cell_type == "inlineStr":
-        inline = cell.find(NS + "is")
-        if inline is None:
-            return None
-        return "".join(t_el.text or "" for t_el in inline.findall('.//' + NS + 't'))
-    value = cell.find(NS + "v")
-    if value is None:
-        return None
-    return value.text
-
-
 def parse_int(value: Optional[str]) -> Optional[int]:
     if value is None:
         return None
@@ -138,87 +97,27 @@ def parse_bool(value: Optional[str]) -> bool:
     return text in {"1", "true", "vrai", "oui", "o", "y", "yes"}
 
 
-def parse_excel_year(value: Optional[str]) -> Optional[int]:
-    if value is None:
-        return None
-    text = str(value).strip()
-    if not text:
-        return None
-    # Try Excel serial number
-    try:
-        serial = float(text)
-        if math.isnan(serial) or serial <= 0:
-            raise ValueError
-        base = date(1899, 12, 30)
-        day_count = int(round(serial))
-        dt = base + timedelta(days=day_count)
-        return dt.year
-    except ValueError:
-        pass
-    # Try ISO formats
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(text, fmt).year
-        except ValueError:
-            continue
-    try:
-        return datetime.fromisoformat(text).year
-    except ValueError:
-        return None
-
-
-def extract_departement(code_postal: Optional[str]) -> Optional[str]:
-    if not code_postal:
-        return None
-    cp = str(code_postal).strip()
-    if not cp:
-        return None
-    digits = "".join(ch for ch in cp if ch.isdigit())
-    if len(digits) >= 3 and digits.startswith(("97", "98")):
-        return digits[:3]
-    if len(digits) >= 2:
-        return digits[:2]
-    return None
-
-
-def load_records() -> List[Dict[str, Optional[object]]]:
-    records: List[Dict[str, Optional[object]]] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index_text = elem.attrib.get("r")
-                if row_index_text == "1":
-                    elem.clear()
-                    continue
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                region_code = parse_int(values.get(COL_REGION))
-                is_certified = parse_bool(values.get(COL_CERT_ACTIONS))
-                nb_stagiaires = parse_float(values.get(COL_NB_STAGIAIRES))
-                effectif_formateurs = parse_float(values.get(COL_EFFECTIF_FORMATEURS))
-                code_postal = values.get(COL_CODE_POSTAL)
-                annee_decl = parse_excel_year(values.get(COL_DATE_DERNIERE_DECL))
-                records.append(
-                    {
-                        "region_code": region_code,
-                        "is_certified": is_certified,
-                        "nb_stagiaires": nb_stagiaires,
-                        "effectif_formateurs": effectif_formateurs,
-                        "code_postal": code_postal,
-                        "annee_decl": annee_decl,
-                    }
-                )
-                elem.clear()
+def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
+    records: List[Record] = []
+    rows = table.select(
+        (COL_REGION, parse_int),
+        (COL_CERT_ACTIONS, parse_bool),
+        (COL_NB_STAGIAIRES, parse_float),
+        (COL_EFFECTIF_FORMATEURS, parse_float),
+        COL_CODE_POSTAL,
+    )
+    for (region, cert_actions, stagiaires, effectif, code_postal), date_decl in zip(rows, load_date_column(COL_DATE_DERNIERE_DECL)):
+        records.append(
+            Record(
+                region_code=region,
+                is_certified=cert_actions,
+                nb_stagiaires=stagiaires,
+                effectif_formateurs=effectif,
+                code_postal=intern_text(code_postal),
+                annee_decl=date_decl.year if date_decl else None,
+            )
+        )
     return records
 
 
@@ -247,20 +146,20 @@ def write_markdown_table(headers: List[str], rows: List[List[str]]) -> List[str]
     return lines
 
 
-def compute_region_stats(records: List[Dict[str, Optional[object]]]) -> Dict[str, Dict[str, float]]:
+def compute_region_stats(records: List[Record]) -> Dict[str, Dict[str, float]]:
     stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
     for rec in records:
-        region = region_label(rec["region_code"])
+        region = region_label(rec.region_code)
         stats[region]["total"] += 1
-        if rec["is_certified"]:
+        if rec.is_certified:
             stats[region]["certified"] += 1
-        if rec["nb_stagiaires"] is not None:
-            stats[region]["sum_stagiaires"] += float(rec["nb_stagiaires"])
-        if rec["is_certified"] and rec["nb_stagiaires"] is not None:
-            stats[region]["sum_stagiaires_cert"] += float(rec["nb_stagiaires"])
+        if rec.nb_stagiaires is not None:
+            stats[region]["sum_stagiaires"] += float(rec.nb_stagiaires)
+        if rec.is_certified and rec.nb_stagiaires is not None:
+            stats[region]["sum_stagiaires_cert"] += float(rec.nb_stagiaires)
             stats[region]["count_cert"] += 1
-        if (not rec["is_certified"]) and rec["nb_stagiaires"] is not None:
-            stats[region]["sum_stagiaires_non"] += float(rec["nb_stagiaires"])
+        if (not rec.is_certified) and rec.nb_stagiaires is not None:
+            stats[region]["sum_stagiaires_non"] += float(rec.nb_stagiaires)
             stats[region]["count_non"] += 1
     return stats
 
@@ -274,16 +173,16 @@ def main() -> None:
     records = load_records()
 
     total_of = len(records)
-    total_cert = sum(1 for r in records if r["is_certified"])
+    total_cert = sum(1 for r in records if r.is_certified)
     national_rate = safe_div(total_cert, total_of)
 
     # Region stats for all sizes
     region_stats_all: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
     for rec in records:
-        region = region_label(rec["region_code"])
+        region = region_label(rec.region_code)
         region_data = region_stats_all[region]
         region_data["total"] += 1
-        if rec["is_certified"]:
+        if rec.is_certified:
             region_data["certified"] += 1
 
     table1_rows: List[List[str]] = []
@@ -320,33 +219,33 @@ def main() -> None:
     target_records = [
         r
         for r in records
-        if r["effectif_formateurs"] is not None
-        and 3 <= r["effectif_formateurs"] <= 10
+        if r.effectif_formateurs is not None
+        and 3 <= r.effectif_formateurs <= 10
     ]
 
     total_target = len(target_records)
-    total_target_cert = sum(1 for r in target_records if r["is_certified"])
+    total_target_cert = sum(1 for r in target_records if r.is_certified)
     rate_target = safe_div(total_target_cert, total_target)
 
     region_stats_target: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
     for rec in target_records:
-        region = region_label(rec["region_code"])
+        region = region_label(rec.region_code)
         data = region_stats_target[region]
         data["total"] += 1
-        if rec["is_certified"]:
+        if rec.is_certified:
             data["certified"] += 1
-        if rec["nb_stagiaires"] is not None:
-            data["sum_stagiaires"] += float(rec["nb_stagiaires"])
-        if rec["nb_stagiaires"] and rec["nb_stagiaires"] > 0:
+        if rec.nb_stagiaires is not None:
+            data["sum_stagiaires"] += float(rec.nb_stagiaires)
+        if rec.nb_stagiaires and rec.nb_stagiaires > 0:
             data["active_count"] += 1
-        if rec["is_certified"] and rec["nb_stagiaires"] is not None:
+        if rec.is_certified and rec.nb_stagiaires is not None:
             data.setdefault("sum_stag_cert", 0.0)
-            data["sum_stag_cert"] += float(rec["nb_stagiaires"])
+            data["sum_stag_cert"] += float(rec.nb_stagiaires)
             data.setdefault("count_cert", 0.0)
             data["count_cert"] += 1
-        if (not rec["is_certified"]) and rec["nb_stagiaires"] is not None:
+        if (not rec.is_certified) and rec.nb_stagiaires is not None:
             data.setdefault("sum_stag_non", 0.0)
-            data["sum_stag_non"] += float(rec["nb_stagiaires"])
+            data["sum_stag_non"] += float(rec.nb_stagiaires)
             data.setdefault("count_non", 0.0)
             data["count_non"] += 1
 
@@ -382,33 +281,33 @@ def main() -> None:
     )
 
     # Certification vs activity (3-10)
-    certified_group = [r for r in target_records if r["is_certified"]]
-    non_certified_group = [r for r in target_records if not r["is_certified"]]
+    certified_group = [r for r in target_records if r.is_certified]
+    non_certified_group = [r for r in target_records if not r.is_certified]
 
-    def avg_stag(group: Iterable[Dict[str, Optional[object]]]) -> float:
+    def avg_stag(group: Iterable[Record]) -> float:
         total = 0.0
         count = 0
         for rec in group:
-            if rec["nb_stagiaires"] is not None:
-                total += float(rec["nb_stagiaires"])
+            if rec.nb_stagiaires is not None:
+                total += float(rec.nb_stagiaires)
                 count += 1
         return total / count if count else 0.0
 
-    def share_active(group: Iterable[Dict[str, Optional[object]]]) -> float:
+    def share_active(group: Iterable[Record]) -> float:
         total = 0
         active = 0
         for rec in group:
             total += 1
-            if rec["nb_stagiaires"] and rec["nb_stagiaires"] > 0:
+            if rec.nb_stagiaires and rec.nb_stagiaires > 0:
                 active += 1
         return active / total if total else 0.0
 
-    def avg_effectif(group: Iterable[Dict[str, Optional[object]]]) -> float:
+    def avg_effectif(group: Iterable[Record]) -> float:
         total = 0.0
         count = 0
         for rec in group:
-            if rec["effectif_formateurs"] is not None:
-                total += float(rec["effectif_formateurs"])
+            if rec.effectif_formateurs is not None:
+                total += float(rec.effectif_formateurs)
                 count += 1
         return total / count if count else 0.0
 
@@ -454,9 +353,9 @@ def main() -> None:
     # Dynamics by year (3-10 subset, using last declaration as proxy)
     year_counts: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
     for rec in target_records:
-        if not rec["is_certified"]:
+        if not rec.is_certified:
             continue
-        year = rec["annee_decl"]
+        year = rec.annee_decl
         if year is None:
             continue
         year_counts[year]["new_certified"] += 1
@@ -511,12 +410,12 @@ def main() -> None:
     # Department maturity (3-10 subset)
     dept_stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
     for rec in target_records:
-        dept = extract_departement(rec["code_postal"])
+        dept = postal_department(rec.code_postal)
         if not dept:
             continue
         data = dept_stats[dept]
         data["total"] += 1
-        if rec["is_certified"]:
+        if rec.is_certified:
             data["certified"] += 1
 
     dept_rows: List[List[str]] = []
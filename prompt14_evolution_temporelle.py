@@ -1,20 +1,17 @@
 import csv
-import math
 import os
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter, defaultdict
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta
+from datetime import date
 from typing import Dict, Iterable, List, Optional
 
-XLSX_PATH = "OF 3-10.xlsx"
+from of_dataset import XLSX_PATH, load_table
+from of_dates import load_date_column
+
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MARKDOWN = os.path.join(OUTPUT_DIR, "prompt14_evolution_temporelle.md")
 OUTPUT_CSV_REGIONS = os.path.join(OUTPUT_DIR, "prompt14_evolution_regions.csv")
 
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
-
 COL_NUM_DECL = 0
 COL_PREV_DECL = 1
 COL_REGION = 8
@@ -70,7 +67,7 @@ MAINLAND_REGION_ORDER = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     numero: Optional[str]
     prev_numero: Optional[str]
@@ -87,46 +84,6 @@ def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        value = cell.find(NS + "v")
-        if value is None or value.text is None:
-            return None
-        return shared_strings[int(value.text)]
-    if cell_type == "inlineStr":
-        inline = cell.find(NS + "is")
-        if inline is None:
-            return None
-        return "".join(t_el.text or "" for t_el in inline.findall('.//' + NS + 't'))
-    value = cell.find(NS + "v")
-    if value is None:
-        return None
-    return value.text
-
-
 def parse_int(value: Optional[str]) -> Optional[int]:
     if value is None:
         return None
@@ -162,84 +119,35 @@ def parse_bool(value: Optional[str]) -> bool:
     return text in {"1", "true", "vrai", "oui", "o", "y", "yes"}
 
 
-def parse_excel_date(value: Optional[str]) -> Optional[date]:
-    if value is None:
-        return None
-    text = str(value).strip()
-    if not text:
-        return None
-    try:
-        serial = float(text)
-        if math.isnan(serial) or serial <= 0:
-            raise ValueError
-        base = date(1899, 12, 30)
-        day_count = int(round(serial))
-        return base + timedelta(days=day_count)
-    except ValueError:
-        pass
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(text, fmt).date()
-        except ValueError:
-            continue
-    try:
-        return datetime.fromisoformat(text).date()
-    except ValueError:
-        return None
-
-
-def parse_excel_year(value: Optional[str]) -> Optional[int]:
-    parsed_date = parse_excel_date(value)
-    if parsed_date is None:
-        return None
-    return parsed_date.year
-
-
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                if elem.attrib.get("r") == "1":
-                    elem.clear()
-                    continue
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in {
-                        COL_NUM_DECL,
-                        COL_PREV_DECL,
-                        COL_REGION,
-                        COL_CERT_ACTIONS,
-                        COL_DATE_DERNIERE_DECL,
-                        COL_DEBUT_EXERCICE,
-                        COL_FIN_EXERCICE,
-                        COL_NB_STAGIAIRES,
-                        COL_EFFECTIF,
-                    }:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                record = Record(
-                    numero=str(values.get(COL_NUM_DECL, "")) or None,
-                    prev_numero=str(values.get(COL_PREV_DECL, "")) or None,
-                    region_code=parse_int(values.get(COL_REGION)),
-                    is_certified=parse_bool(values.get(COL_CERT_ACTIONS)),
-                    year_last_decl=parse_excel_year(values.get(COL_DATE_DERNIERE_DECL)),
-                    start_date=parse_excel_date(values.get(COL_DEBUT_EXERCICE)),
-                    end_date=parse_excel_date(values.get(COL_FIN_EXERCICE)),
-                    nb_stagiaires=parse_float(values.get(COL_NB_STAGIAIRES)),
-                    effectif=parse_float(values.get(COL_EFFECTIF)),
-                )
-                records.append(record)
-                elem.clear()
+    rows = table.select(
+        COL_NUM_DECL,
+        COL_PREV_DECL,
+        (COL_REGION, parse_int),
+        (COL_CERT_ACTIONS, parse_bool),
+        (COL_NB_STAGIAIRES, parse_float),
+        (COL_EFFECTIF, parse_float),
+    )
+    dates = zip(
+        load_date_column(COL_DATE_DERNIERE_DECL),
+        load_date_column(COL_DEBUT_EXERCICE),
+        load_date_column(COL_FIN_EXERCICE),
+    )
+    for (numero, prev_numero, region, cert_actions, stagiaires, effectif), (date_decl, debut, fin) in zip(rows, dates):
+        record = Record(
+            numero=str(numero or "") or None,
+            prev_numero=str(prev_numero or "") or None,
+            region_code=region,
+            is_certified=cert_actions,
+            year_last_decl=date_decl.year if date_decl else None,
+            start_date=debut,
+            end_date=fin,
+            nb_stagiaires=stagiaires,
+            effectif=effectif,
+        )
+        records.append(record)
     return records
 
 
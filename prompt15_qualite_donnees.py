@@ -6,17 +6,12 @@ from decimal import Decimal, InvalidOperation
 from typing import Dict, Iterable, List, Optional, Tuple
 
 from compute_tam import (
-    NS,
     OUTPUT_DIR,
     REGION_NAMES,
     TARGET_MAX,
     TARGET_MIN,
-    column_ref_to_index,
-    get_cell_value,
-    load_shared_strings,
 )
-
-XLSX_PATH = "OF 3-10.xlsx"
+from of_dataset import XLSX_PATH, intern_text, load_table
 
 TARGET_HEADERS = {
     "nda": "numeroDeclarationActivite",
@@ -34,7 +29,7 @@ TARGET_HEADERS = {
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class OFRecord:
     nda: Optional[str]
     denomination: Optional[str]
@@ -102,57 +97,35 @@ def normalize_numeric_text(value: Optional[str], pad_to: Optional[int] = None) -
     return normalized
 
 
+NUMERIC_PARSERS = {
+    "effectif": parse_float,
+    "stagiaires": parse_float,
+    "region": parse_int,
+}
+
+
 def load_records() -> List[OFRecord]:
+    table = load_table(XLSX_PATH)
     records: List[OFRecord] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {key: None for key in TARGET_HEADERS}
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_index = int(elem.attrib.get("r"))
-                if row_index == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        header_map[col_idx] = get_cell_value(cell, shared_strings)
-                    for key, header_name in TARGET_HEADERS.items():
-                        target_indices[key] = next(
-                            (idx for idx, name in header_map.items() if name == header_name),
-                            None,
-                        )
-                    elem.clear()
-                    continue
-
-                values: Dict[str, Optional[str]] = {key: None for key in TARGET_HEADERS}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    for key, idx in target_indices.items():
-                        if idx is not None and col_idx == idx:
-                            values[key] = get_cell_value(cell, shared_strings)
-                record = OFRecord(
-                    nda=normalize_numeric_text(values["nda"]),
-                    denomination=parse_text(values["denomination"]),
-                    effectif=parse_float(values["effectif"]),
-                    stagiaires=parse_float(values["stagiaires"]),
-                    region_code=parse_int(values["region"]),
-                    code_postal=normalize_numeric_text(values["cp"], pad_to=5),
-                    ville=parse_text(values["ville"]),
-                    voie=parse_text(values["voie"]),
-                    actions=parse_text(values["actions"]),
-                    spe1=parse_text(values["spe1"]),
-                    spe2=parse_text(values["spe2"]),
-                    spe3=parse_text(values["spe3"]),
-                )
-                records.append(record)
-                elem.clear()
+    for row in table.select(
+        *((header, NUMERIC_PARSERS[name]) if name in NUMERIC_PARSERS else header for name, header in TARGET_HEADERS.items())
+    ):
+        values: Dict[str, object] = dict(zip(TARGET_HEADERS, row))
+        record = OFRecord(
+            nda=normalize_numeric_text(values["nda"]),
+            denomination=parse_text(values["denomination"]),
+            effectif=values["effectif"],
+            stagiaires=values["stagiaires"],
+            region_code=values["region"],
+            code_postal=normalize_numeric_text(values["cp"], pad_to=5),
+            ville=intern_text(parse_text(values["ville"])),
+            voie=parse_text(values["voie"]),
+            actions=parse_text(values["actions"]),
+            spe1=intern_text(parse_text(values["spe1"])),
+            spe2=intern_text(parse_text(values["spe2"])),
+            spe3=intern_text(parse_text(values["spe3"])),
+        )
+        records.append(record)
     return records
 
 
@@ -248,13 +221,6 @@ def write_markdown_table(lines: List[str], title: str, headers: List[str], rows:
     lines.append("")
 
 
-try:
-    import zipfile
-    import xml.etree.ElementTree as ET
-except ImportError as exc:  # pragma: no cover
-    raise SystemExit(f"Missing standard library dependency: {exc}")
-
-
 def main() -> None:
     ensure_output_dir()
     records = load_records()
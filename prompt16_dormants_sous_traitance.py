@@ -1,17 +1,21 @@
+import argparse
 import csv
+import hashlib
+import heapq
+import json
 import os
-import zipfile
-import xml.etree.ElementTree as ET
 from collections import Counter
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import re
 
-from compute_tam import NS, column_ref_to_index, get_cell_value, load_shared_strings
+from analyze_specialites import MACRO_THEMES, SPECIALITE_CLASSIFIER, classify_specialite
+from of_cube import SparseCube
+from of_dataset import XLSX_PATH, cache_path_for, intern_text, load_table, workbook_digest
+from of_geo import postal_department
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
 
 TARGET_MIN = 3
@@ -45,7 +49,7 @@ SPECIALITE_PONCTUELLE_KEYWORDS = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class OFRecord:
     denomination: str
     code_postal: Optional[str]
@@ -110,192 +114,70 @@ def parse_int(value: Optional[str]) -> Optional[int]:
 
 
 def load_records() -> List[OFRecord]:
+    table = load_table(XLSX_PATH)
     records: List[OFRecord] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {
-                "denomination": None,
-                "code_postal": None,
-                "region": None,
-                "actions": None,
-                "nb_stagiaires": None,
-                "nb_confies": None,
-                "effectif": None,
-                "date_declaration": None,
-                "specialite1": None,
-                "specialite2": None,
-                "specialite3": None,
-            }
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    target_indices["denomination"] = next(
-                        (idx for idx, name in header_map.items() if name == "denomination"),
-                        None,
-                    )
-                    target_indices["code_postal"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.codePostal"
-                        ),
-                        None,
-                    )
-                    target_indices["region"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "adressePhysiqueOrganismeFormation.codeRegion"
-                        ),
-                        None,
-                    )
-                    target_indices["actions"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "certifications.actionsDeFormation"
-                        ),
-                        None,
-                    )
-                    target_indices["nb_stagiaires"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.nbStagiaires"
-                        ),
-                        None,
-                    )
-                    target_indices["nb_confies"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.nbStagiairesConfiesParUnAutreOF"
-                        ),
-                        None,
-                    )
-                    target_indices["effectif"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.effectifFormateurs"
-                        ),
-                        None,
-                    )
-                    target_indices["date_declaration"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name == "informationsDeclarees.dateDerniereDeclaration"
-                        ),
-                        None,
-                    )
-                    target_indices["specialite1"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name
-                            == "informationsDeclarees.specialitesDeFormation.libelleSpecialite1"
-                        ),
-                        None,
-                    )
-                    target_indices["specialite2"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name
-                            == "informationsDeclarees.specialitesDeFormation.libelleSpecialite2"
-                        ),
-                        None,
-                    )
-                    target_indices["specialite3"] = next(
-                        (
-                            idx
-                            for idx, name in header_map.items()
-                            if name
-                            == "informationsDeclarees.specialitesDeFormation.libelleSpecialite3"
-                        ),
-                        None,
-                    )
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-
-                denomination = (values.get(target_indices["denomination"], "") or "").strip()
-                code_postal = values.get(target_indices["code_postal"])
-                if code_postal is not None:
-                    code_postal = code_postal.strip()
-                    if not code_postal:
-                        code_postal = None
-                region_code = parse_int(values.get(target_indices["region"]))
-                actions = parse_float(values.get(target_indices["actions"]))
-                nb_stagiaires = parse_float(values.get(target_indices["nb_stagiaires"]))
-                nb_confies = parse_float(values.get(target_indices["nb_confies"]))
-                effectif = parse_int(values.get(target_indices["effectif"]))
-                raw_date = values.get(target_indices["date_declaration"])
-                date_decl: Optional[str] = None
-                if raw_date is not None:
-                    text_date = raw_date.strip()
-                    if text_date:
-                        try:
-                            serial = float(text_date)
-                        except ValueError:
-                            date_decl = text_date
-                        else:
-                            if serial > 0:
-                                base = datetime(1899, 12, 30)
-                                dt = base + timedelta(days=int(serial))
-                                date_decl = dt.strftime("%Y-%m-%d")
-                            else:
-                                date_decl = None
-                specialites: List[str] = []
-                for key in ("specialite1", "specialite2", "specialite3"):
-                    idx = target_indices[key]
-                    if idx is None:
-                        continue
-                    val = values.get(idx)
-                    if val is None:
-                        continue
-                    label = val.strip()
-                    if label:
-                        specialites.append(label)
-                records.append(
-                    OFRecord(
-                        denomination=denomination,
-                        code_postal=code_postal,
-                        region_code=region_code,
-                        effectif=effectif,
-                        actions=actions,
-                        nb_stagiaires=nb_stagiaires,
-                        nb_confies=nb_confies,
-                        date_declaration=date_decl,
-                        specialites=specialites,
-                    )
-                )
-                elem.clear()
+    for (
+        denomination,
+        code_postal,
+        region,
+        actions,
+        stagiaires,
+        confies,
+        effectif,
+        raw_date,
+        *raw_specialites,
+    ) in table.select(
+        "denomination",
+        "adressePhysiqueOrganismeFormation.codePostal",
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        ("certifications.actionsDeFormation", parse_float),
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("informationsDeclarees.nbStagiairesConfiesParUnAutreOF", parse_float),
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        "informationsDeclarees.dateDerniereDeclaration",
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite2",
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite3",
+    ):
+        if code_postal is not None:
+            code_postal = code_postal.strip()
+            if not code_postal:
+                code_postal = None
+        date_decl: Optional[str] = None
+        if raw_date is not None:
+            text_date = raw_date.strip()
+            if text_date:
+                try:
+                    serial = float(text_date)
+                except ValueError:
+                    date_decl = text_date
+                else:
+                    if serial > 0:
+                        base = datetime(1899, 12, 30)
+                        dt = base + timedelta(days=int(serial))
+                        date_decl = dt.strftime("%Y-%m-%d")
+                    else:
+                        date_decl = None
+        specialites: List[str] = []
+        for val in raw_specialites:
+            if val is None:
+                continue
+            label = val.strip()
+            if label:
+                specialites.append(intern_text(label))
+        records.append(
+            OFRecord(
+                denomination=(denomination or "").strip(),
+                code_postal=code_postal,
+                region_code=region,
+                effectif=effectif,
+                actions=actions,
+                nb_stagiaires=stagiaires,
+                nb_confies=confies,
+                date_declaration=date_decl,
+                specialites=specialites,
+            )
+        )
     return records
 
 
@@ -330,17 +212,7 @@ def safe_mean(values: List[float]) -> Optional[float]:
     return sum(cleaned) / len(cleaned)
 
 
-def department_from_cp(cp: Optional[str]) -> str:
-    if not cp:
-        return "-"
-    cp = cp.strip()
-    if len(cp) >= 3 and cp.startswith(("97", "98")):
-        return cp[:3]
-    return cp[:2]
-
-
-def classify_dormant(rec: OFRecord) -> str:
-    year = rec.declaration_year
+def classify_dormant(rec: OFRecord, year: Optional[int]) -> str:
     if year is not None and year <= 2022:
         return "Cessation activité"
     if rec.specialite_count >= 2:
@@ -357,65 +229,277 @@ def classify_dormant(rec: OFRecord) -> str:
     return "Activité ponctuelle"
 
 
-def main() -> None:
-    ensure_output_dir()
-    records = load_records()
+CONFIES_TRANCHES: List[Tuple[str, int, Optional[int]]] = [
+    ("1-50", 1, 50),
+    ("51-200", 51, 200),
+    ("201+", 201, None),
+]
 
-    certified = [
-        r
-        for r in records
-        if r.effectif is not None
-        and TARGET_MIN <= r.effectif <= TARGET_MAX
-        and r.actions is not None
-    ]
+TOP_SOUS_TRAITANTS = 20
 
-    dormants = [r for r in certified if (r.nb_stagiaires is None or r.nb_stagiaires == 0)]
-    actives = [r for r in certified if r.nb_stagiaires is not None and r.nb_stagiaires > 0]
 
-    total_certified = len(certified)
-    total_dormants = len(dormants)
-    total_actives = len(actives)
+@dataclass(slots=True)
+class GroupProfile:
+    count: int = 0
+    effectifs: List[float] = field(default_factory=list)
+    stagiaires: List[float] = field(default_factory=list)
+    regions: Counter = field(default_factory=Counter)
+    specialites: Counter = field(default_factory=Counter)
 
-    # Table 1 metrics
-    pct_dormants = (total_dormants / total_certified * 100) if total_certified else 0
-    pct_actives = (total_actives / total_certified * 100) if total_certified else 0
+    def add(self, rec: OFRecord, region: str) -> None:
+        self.count += 1
+        self.effectifs.append(float(rec.effectif))
+        if rec.nb_stagiaires is not None:
+            self.stagiaires.append(rec.nb_stagiaires)
+        self.regions[region] += 1
+        self.specialites[rec.main_specialite or "Non renseigné"] += 1
 
-    mean_eff_dormants = safe_mean([float(r.effectif) for r in dormants])
-    mean_eff_actives = safe_mean([float(r.effectif) for r in actives])
-
-    region_counter_dormants: Counter[str] = Counter(region_name(r.region_code) for r in dormants)
-    region_counter_actives: Counter[str] = Counter(region_name(r.region_code) for r in actives)
+    @property
+    def mean_effectif(self) -> Optional[float]:
+        return safe_mean(self.effectifs)
 
-    top_region_dormants, top_region_dormants_share = ("-", 0.0)
-    if region_counter_dormants:
-        region_code_counts: Dict[str, int] = dict(region_counter_dormants)
-        top_region_dormants = max(region_code_counts.items(), key=lambda item: item[1])[0]
-        top_region_dormants_share = region_code_counts[top_region_dormants] / total_dormants * 100
+    @property
+    def mean_stagiaires(self) -> Optional[float]:
+        return safe_mean(self.stagiaires)
+
+    def dominant_region(self) -> Tuple[str, float]:
+        return dominant(self.regions, self.count)
+
+    def dominant_specialite(self) -> Tuple[str, float]:
+        return dominant(self.specialites, self.count)
+
+
+@dataclass(slots=True)
+class ConfiesTranche:
+    label: str
+    lower: int
+    upper: Optional[int]
+    count: int = 0
+    confies: List[float] = field(default_factory=list)
+    stagiaires: List[float] = field(default_factory=list)
+    ratios: List[float] = field(default_factory=list)
+
+    def accepts(self, value: float) -> bool:
+        return value >= self.lower and (self.upper is None or value <= self.upper)
+
+    def add(self, rec: OFRecord) -> None:
+        self.count += 1
+        self.confies.append(rec.nb_confies)
+        if rec.nb_stagiaires is not None:
+            self.stagiaires.append(rec.nb_stagiaires)
+        if rec.nb_stagiaires and rec.nb_stagiaires > 0:
+            self.ratios.append(rec.nb_confies / rec.nb_stagiaires)
 
-    top_region_actives, top_region_actives_share = ("-", 0.0)
-    if region_counter_actives:
-        region_code_counts_actives: Dict[str, int] = dict(region_counter_actives)
-        top_region_actives = max(region_code_counts_actives.items(), key=lambda item: item[1])[0]
-        top_region_actives_share = region_code_counts_actives[top_region_actives] / total_actives * 100
 
-    specialite_counter_dormants: Counter[str] = Counter(
-        r.main_specialite or "Non renseigné" for r in dormants
-    )
-    specialite_counter_actives: Counter[str] = Counter(
-        r.main_specialite or "Non renseigné" for r in actives
+@dataclass
+class CertifiedPartition:
+    certified: int = 0
+    region_certified: Counter = field(default_factory=Counter)
+    dormant: GroupProfile = field(default_factory=GroupProfile)
+    active: GroupProfile = field(default_factory=GroupProfile)
+    sous_traitant: GroupProfile = field(default_factory=GroupProfile)
+    non_sous_traitant: GroupProfile = field(default_factory=GroupProfile)
+    hypotheses: Counter = field(default_factory=Counter)
+    recent: int = 0
+    anciens: int = 0
+    multi_specialites: int = 0
+    reactivables: List[Tuple[OFRecord, int]] = field(default_factory=list)
+    sous_traitants: List[OFRecord] = field(default_factory=list)
+    tranches: List[ConfiesTranche] = field(
+        default_factory=lambda: [ConfiesTranche(label, lower, upper) for label, lower, upper in CONFIES_TRANCHES]
     )
+    all_tranches: ConfiesTranche = field(default_factory=lambda: ConfiesTranche("TOTAL", 0, None))
+
+    def add(self, rec: OFRecord) -> None:
+        region = region_name(rec.region_code)
+        self.certified += 1
+        self.region_certified[region] += 1
+        if rec.nb_stagiaires is None or rec.nb_stagiaires == 0:
+            self.dormant.add(rec, region)
+            self.add_dormant(rec)
+        elif rec.nb_stagiaires > 0:
+            self.active.add(rec, region)
+            if not (rec.nb_confies and rec.nb_confies > 0):
+                self.non_sous_traitant.add(rec, region)
+        if rec.nb_confies is not None and rec.nb_confies > 0:
+            self.sous_traitant.add(rec, region)
+            self.sous_traitants.append(rec)
+            self.all_tranches.add(rec)
+            for tranche in self.tranches:
+                if tranche.accepts(rec.nb_confies):
+                    tranche.add(rec)
+
+    def add_dormant(self, rec: OFRecord) -> None:
+        year = rec.declaration_year
+        self.hypotheses[classify_dormant(rec, year)] += 1
+        if year is not None and year >= 2024:
+            self.recent += 1
+        else:
+            self.anciens += 1
+        if rec.specialite_count >= 2:
+            self.multi_specialites += 1
+        if year is not None and year <= 2023:
+            self.reactivables.append((rec, year))
+
+    def top_sous_traitants(self, k: int = TOP_SOUS_TRAITANTS) -> List[OFRecord]:
+        return heapq.nlargest(k, self.sous_traitants, key=lambda r: r.nb_confies or 0)
+
+
+def dominant(counter: Counter, total: int) -> Tuple[str, float]:
+    if not counter:
+        return "-", 0.0
+    name, count = max(counter.items(), key=lambda item: item[1])
+    return name, count / total * 100
+
+
+def partition_certified(records: Iterable[OFRecord]) -> CertifiedPartition:
+    partition = CertifiedPartition()
+    for rec in records:
+        if rec.effectif is not None and TARGET_MIN <= rec.effectif <= TARGET_MAX and rec.actions is not None:
+            partition.add(rec)
+    return partition
+
+
+FLOW_SEGMENTS: List[Tuple[str, int, Optional[int]]] = [
+    ("0-2", 0, 2),
+    ("3-10", TARGET_MIN, TARGET_MAX),
+    ("11-50", 11, 50),
+    ("51+", 51, None),
+]
+FLOW_AXES = ("region", "theme", "segment")
+FLOW_MEASURES = ("of", "sous_traitants", "stagiaires", "confies")
+FLOW_DOMAINS: Dict[str, List[str]] = {
+    "region": sorted(set(REGION_NAMES.values()) | {"Autres DOM-TOM"}),
+    "theme": list(MACRO_THEMES),
+    "segment": [label for label, _, _ in FLOW_SEGMENTS] + ["Non renseigné"],
+}
+FLOW_CACHE_VERSION = 2
+OUTPUT_FLOWS_CSV = os.path.join(OUTPUT_DIR, "prompt16_flux_sous_traitance.csv")
+
+
+def size_segment(effectif: Optional[int]) -> str:
+    if effectif is not None:
+        for label, lower, upper in FLOW_SEGMENTS:
+            if effectif >= lower and (upper is None or effectif <= upper):
+                return label
+    return "Non renseigné"
+
+
+def build_flow_cube(records: Iterable[OFRecord]) -> SparseCube:
+    cube = SparseCube(FLOW_AXES, FLOW_MEASURES)
+    for axis in FLOW_AXES:
+        cube.declare(axis, FLOW_DOMAINS[axis])
+    for rec in records:
+        confies = rec.nb_confies if rec.nb_confies and rec.nb_confies > 0 else 0.0
+        stagiaires = rec.nb_stagiaires if rec.nb_stagiaires and rec.nb_stagiaires > 0 else 0.0
+        cube.add(
+            (region_name(rec.region_code), classify_specialite(rec.main_specialite), size_segment(rec.effectif)),
+            (1, 1 if confies else 0, stagiaires, confies),
+        )
+    return cube
+
+
+def flow_cache_version() -> str:
+    # The cached cube is only valid for the segments, region labels and theme
+    # classifier it was built with, not just for the workbook.
+    payload = [FLOW_CACHE_VERSION, FLOW_DOMAINS, FLOW_SEGMENTS, sorted(REGION_NAMES.items()), SPECIALITE_CLASSIFIER.signature()]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def flow_cache_path() -> str:
+    return cache_path_for(XLSX_PATH) + ".flows"
+
+
+def save_flow_cube(cube: SparseCube) -> None:
+    cache_path = flow_cache_path()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": flow_cache_version(), "sha256": workbook_digest(XLSX_PATH), "cube": cube.to_dict()}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
 
-    top_spe_dormants, top_spe_dormants_share = ("-", 0.0)
-    if specialite_counter_dormants:
-        spe_counts_dormants = dict(specialite_counter_dormants)
-        top_spe_dormants = max(spe_counts_dormants.items(), key=lambda item: item[1])[0]
-        top_spe_dormants_share = spe_counts_dormants[top_spe_dormants] / total_dormants * 100
 
-    top_spe_actives, top_spe_actives_share = ("-", 0.0)
-    if specialite_counter_actives:
-        spe_counts_actives = dict(specialite_counter_actives)
-        top_spe_actives = max(spe_counts_actives.items(), key=lambda item: item[1])[0]
-        top_spe_actives_share = spe_counts_actives[top_spe_actives] / total_actives * 100
+def load_flow_cube(use_cache: bool = True) -> SparseCube:
+    if use_cache:
+        try:
+            with open(flow_cache_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == flow_cache_version() and data.get("sha256") == workbook_digest(XLSX_PATH):
+                return SparseCube.from_dict(data["cube"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    cube = build_flow_cube(load_records())
+    if use_cache:
+        try:
+            save_flow_cube(cube)
+        except OSError:
+            pass
+    return cube
+
+
+def write_flow_csv(cube: SparseCube) -> None:
+    with open(OUTPUT_FLOWS_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["region", "theme", "segment", "nb_of", "nb_sous_traitants", "stagiaires", "stagiaires_confies", "part_confies"])
+        for (region, theme, segment), (count, sous_count, stagiaires, confies) in sorted(cube.rows()):
+            writer.writerow([
+                region,
+                theme,
+                segment,
+                int(count),
+                int(sous_count),
+                format_int(stagiaires).replace(" ", ""),
+                format_int(confies).replace(" ", ""),
+                format_percent(confies / stagiaires * 100 if stagiaires else None, 1),
+            ])
+
+
+def describe_flows(cube: SparseCube, filters: Dict[str, Optional[str]], by: Optional[str] = None) -> str:
+    scope = ", ".join(f"{axis} = {value}" for axis, value in filters.items() if value) or "toute la base"
+    count, sous_count, stagiaires, confies = (cube.total(measure, **filters) for measure in FLOW_MEASURES)
+    share = cube.share("confies", "stagiaires", **filters)
+    lines = [
+        f"Sous-traitance ({scope}) : {format_int(confies)} stagiaires confiés sur {format_int(stagiaires)}"
+        f" ({format_percent(share * 100 if share is not None else None, 1)}),"
+        f" {format_int(sous_count)} OF sous-traitants sur {format_int(count)}"
+    ]
+    if by:
+        rows = cube.breakdown(by, **filters)
+        for label, (count, sous_count, stagiaires, confies) in sorted(rows.items(), key=lambda item: (-item[1][3], item[0])):
+            ratio = format_percent(confies / stagiaires * 100 if stagiaires else None, 1)
+            lines.append(f"  {label} : {format_int(confies)} confiés / {format_int(stagiaires)} ({ratio}), {format_int(sous_count)} OF sous-traitants")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    ensure_output_dir()
+    records = load_records()
+
+    partition = partition_certified(records)
+    flows = build_flow_cube(records)
+    write_flow_csv(flows)
+    try:
+        save_flow_cube(flows)
+    except OSError:
+        pass
+    dormant, active = partition.dormant, partition.active
+    sous, non_sous = partition.sous_traitant, partition.non_sous_traitant
+
+    total_certified = partition.certified
+    total_dormants = dormant.count
+    total_actives = active.count
+
+    # Table 1 metrics
+    pct_dormants = (total_dormants / total_certified * 100) if total_certified else 0
+    pct_actives = (total_actives / total_certified * 100) if total_certified else 0
+
+    mean_eff_dormants = dormant.mean_effectif
+    mean_eff_actives = active.mean_effectif
+
+    top_region_dormants, top_region_dormants_share = dormant.dominant_region()
+    top_region_actives, top_region_actives_share = active.dominant_region()
+    top_spe_dormants, top_spe_dormants_share = dormant.dominant_specialite()
+    top_spe_actives, top_spe_actives_share = active.dominant_specialite()
 
     table1_rows = [
         [
@@ -471,10 +555,7 @@ def main() -> None:
         ("Activité ponctuelle", "Pas d'exercice déclaré"),
     ]
 
-    hypothesis_counts: Counter[str] = Counter()
-    for rec in dormants:
-        hypothesis = classify_dormant(rec)
-        hypothesis_counts[hypothesis] += 1
+    hypothesis_counts = partition.hypotheses
 
     table2_rows: List[List[str]] = []
     for label, hypothesis_text in hypotheses_order:
@@ -490,11 +571,11 @@ def main() -> None:
         )
 
     # Table 3 - geographic distribution
-    region_certified_counts: Dict[str, int] = Counter(region_name(r.region_code) for r in certified)
+    region_certified_counts = partition.region_certified
     table3_rows: List[List[str]] = []
     for code in REGION_ORDER:
         name = region_name(code)
-        dormants_count = sum(1 for r in dormants if region_name(r.region_code) == name)
+        dormants_count = dormant.regions.get(name, 0)
         certified_count = region_certified_counts.get(name, 0)
         pct_region = (dormants_count / certified_count * 100) if certified_count else 0
         pct_national = (dormants_count / total_dormants * 100) if total_dormants else 0
@@ -512,7 +593,7 @@ def main() -> None:
     for name, certified_count in sorted(region_certified_counts.items()):
         if name in listed_names:
             continue
-        dormants_count = sum(1 for r in dormants if region_name(r.region_code) == name)
+        dormants_count = dormant.regions.get(name, 0)
         pct_region = (dormants_count / certified_count * 100) if certified_count else 0
         pct_national = (dormants_count / total_dormants * 100) if total_dormants else 0
         table3_rows.append(
@@ -533,17 +614,9 @@ def main() -> None:
     table3_rows.append(total_row_table3)
 
     # Table 4 - targeting segments
-    recent_count = 0
-    anciens_count = 0
-    for r in dormants:
-        year = r.declaration_year
-        if year is None:
-            anciens_count += 1
-        elif year >= 2024:
-            recent_count += 1
-        else:
-            anciens_count += 1
-    multi_count = sum(1 for r in dormants if r.specialite_count >= 2)
+    recent_count = partition.recent
+    anciens_count = partition.anciens
+    multi_count = partition.multi_specialites
 
     table4_rows = [
         [
@@ -567,109 +640,50 @@ def main() -> None:
     ]
 
     # Table 5 - sous-traitants
-    sous_traitants = [
-        r
-        for r in certified
-        if r.nb_confies is not None and r.nb_confies > 0
-    ]
-    total_sous_traitants = len(sous_traitants)
+    sous_traitants = partition.sous_traitants
+    total_sous_traitants = sous.count
     total_confies = sum(r.nb_confies or 0 for r in sous_traitants)
 
-    tranches: List[Tuple[str, int, Optional[int]]] = [
-        ("1-50", 1, 50),
-        ("51-200", 51, 200),
-        ("201+", 201, None),
-    ]
-
     table5_rows: List[List[str]] = []
-    for label, lower, upper in tranches:
-        subset = []
-        for r in sous_traitants:
-            value = r.nb_confies or 0
-            if value < lower:
-                continue
-            if upper is not None and value > upper:
-                continue
-            subset.append(r)
-        count = len(subset)
-        pct = (count / total_sous_traitants * 100) if total_sous_traitants else 0
-        avg_confies = safe_mean([r.nb_confies for r in subset])
-        avg_total = safe_mean([r.nb_stagiaires for r in subset])
-        ratios = [
-            (r.nb_confies / r.nb_stagiaires)
-            for r in subset
-            if r.nb_stagiaires and r.nb_stagiaires > 0
-        ]
-        avg_ratio = safe_mean(ratios)
+    for tranche in partition.tranches:
+        pct = (tranche.count / total_sous_traitants * 100) if total_sous_traitants else 0
+        avg_ratio = safe_mean(tranche.ratios)
         table5_rows.append(
             [
-                label,
-                format_int(count),
+                tranche.label,
+                format_int(tranche.count),
                 format_percent(pct, 1),
-                format_float(avg_confies, 1),
-                format_float(avg_total, 1),
+                format_float(safe_mean(tranche.confies), 1),
+                format_float(safe_mean(tranche.stagiaires), 1),
                 format_percent(avg_ratio * 100 if avg_ratio is not None else None, 1),
             ]
         )
 
-    overall_avg_confies = safe_mean([r.nb_confies for r in sous_traitants])
-    overall_avg_total = safe_mean([r.nb_stagiaires for r in sous_traitants])
-    overall_ratio = safe_mean(
-        [
-            r.nb_confies / r.nb_stagiaires
-            for r in sous_traitants
-            if r.nb_stagiaires and r.nb_stagiaires > 0
-        ]
-    )
+    overall = partition.all_tranches
+    overall_ratio = safe_mean(overall.ratios)
     table5_rows.append(
         [
             "TOTAL",
             format_int(total_sous_traitants),
             "100%",
-            format_float(overall_avg_confies, 1),
-            format_float(overall_avg_total, 1),
+            format_float(safe_mean(overall.confies), 1),
+            format_float(safe_mean(overall.stagiaires), 1),
             format_percent(overall_ratio * 100 if overall_ratio is not None else None, 1),
         ]
     )
 
     # Table 6 - profile comparison
-    non_sous_traitants = [r for r in actives if not (r.nb_confies and r.nb_confies > 0)]
     pct_sous_tam = (total_sous_traitants / total_actives * 100) if total_actives else 0
-    pct_non_tam = (len(non_sous_traitants) / total_actives * 100) if total_actives else 0
-    mean_eff_sous = safe_mean([float(r.effectif) for r in sous_traitants])
-    mean_eff_non = safe_mean([float(r.effectif) for r in non_sous_traitants])
-    mean_stag_sous = safe_mean([r.nb_stagiaires for r in sous_traitants])
-    mean_stag_non = safe_mean([r.nb_stagiaires for r in non_sous_traitants])
-
-    region_counter_sous: Counter[str] = Counter(region_name(r.region_code) for r in sous_traitants)
-    region_counter_non: Counter[str] = Counter(region_name(r.region_code) for r in non_sous_traitants)
-
-    top_region_sous, share_region_sous = ("-", 0.0)
-    if region_counter_sous:
-        region_counts = dict(region_counter_sous)
-        top_region_sous = max(region_counts.items(), key=lambda item: item[1])[0]
-        share_region_sous = region_counts[top_region_sous] / total_sous_traitants * 100
-
-    top_region_non, share_region_non = ("-", 0.0)
-    if region_counter_non:
-        region_counts_non = dict(region_counter_non)
-        top_region_non = max(region_counts_non.items(), key=lambda item: item[1])[0]
-        share_region_non = region_counts_non[top_region_non] / len(non_sous_traitants) * 100
-
-    spe_counter_sous: Counter[str] = Counter(r.main_specialite or "Non renseigné" for r in sous_traitants)
-    spe_counter_non: Counter[str] = Counter(r.main_specialite or "Non renseigné" for r in non_sous_traitants)
-
-    top_spe_sous, share_spe_sous = ("-", 0.0)
-    if spe_counter_sous:
-        spe_counts = dict(spe_counter_sous)
-        top_spe_sous = max(spe_counts.items(), key=lambda item: item[1])[0]
-        share_spe_sous = spe_counts[top_spe_sous] / total_sous_traitants * 100
-
-    top_spe_non, share_spe_non = ("-", 0.0)
-    if spe_counter_non:
-        spe_counts_non = dict(spe_counter_non)
-        top_spe_non = max(spe_counts_non.items(), key=lambda item: item[1])[0]
-        share_spe_non = spe_counts_non[top_spe_non] / len(non_sous_traitants) * 100
+    pct_non_tam = (non_sous.count / total_actives * 100) if total_actives else 0
+    mean_eff_sous = sous.mean_effectif
+    mean_eff_non = non_sous.mean_effectif
+    mean_stag_sous = sous.mean_stagiaires
+    mean_stag_non = non_sous.mean_stagiaires
+
+    top_region_sous, share_region_sous = sous.dominant_region()
+    top_region_non, share_region_non = non_sous.dominant_region()
+    top_spe_sous, share_spe_sous = sous.dominant_specialite()
+    top_spe_non, share_spe_non = non_sous.dominant_specialite()
 
     def diff_percent(value1: float, value2: float) -> str:
         return f"{value1 - value2:+.1f} pts"
@@ -678,8 +692,8 @@ def main() -> None:
         [
             "Nombre OF",
             format_int(total_sous_traitants),
-            format_int(len(non_sous_traitants)),
-            format_int(total_sous_traitants - len(non_sous_traitants)),
+            format_int(non_sous.count),
+            format_int(total_sous_traitants - non_sous.count),
         ],
         [
             "% TAM",
@@ -712,11 +726,11 @@ def main() -> None:
         [
             "Région dominante",
             f"{top_region_sous} ({share_region_sous:.1f}%)" if total_sous_traitants else "-",
-            f"{top_region_non} ({share_region_non:.1f}%)" if non_sous_traitants else "-",
+            f"{top_region_non} ({share_region_non:.1f}%)" if non_sous.count else "-",
             (
                 diff_percent(share_region_sous, share_region_non)
                 if total_sous_traitants
-                and non_sous_traitants
+                and non_sous.count
                 and top_region_sous == top_region_non
                 else "Différent"
             ),
@@ -724,17 +738,17 @@ def main() -> None:
         [
             "Spé dominante",
             f"{top_spe_sous} ({share_spe_sous:.1f}%)" if total_sous_traitants else "-",
-            f"{top_spe_non} ({share_spe_non:.1f}%)" if non_sous_traitants else "-",
+            f"{top_spe_non} ({share_spe_non:.1f}%)" if non_sous.count else "-",
             (
                 diff_percent(share_spe_sous, share_spe_non)
-                if total_sous_traitants and non_sous_traitants and top_spe_sous == top_spe_non
+                if total_sous_traitants and non_sous.count and top_spe_sous == top_spe_non
                 else "Différent"
             ),
         ],
     ]
 
     # Table 7 - top 20 sous-traitants
-    top20 = sorted(sous_traitants, key=lambda r: r.nb_confies or 0, reverse=True)[:20]
+    top20 = partition.top_sous_traitants()
     table7_rows: List[List[str]] = []
     for rank, rec in enumerate(top20, start=1):
         ratio = None
@@ -744,7 +758,7 @@ def main() -> None:
             [
                 str(rank),
                 rec.denomination or "-",
-                department_from_cp(rec.code_postal),
+                postal_department(rec.code_postal) or "-",
                 format_int(rec.nb_confies),
                 format_int(rec.nb_stagiaires),
                 format_percent(ratio * 100 if ratio is not None else None, 1),
@@ -777,11 +791,6 @@ def main() -> None:
                 row[6],
             ])
 
-    dormants_reactivables = [
-        r
-        for r in dormants
-        if r.declaration_year is not None and r.declaration_year <= 2023
-    ]
     dormants_csv_path = os.path.join(OUTPUT_DIR, "prompt16_dormants_reactivables.csv")
     with open(dormants_csv_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
@@ -792,11 +801,11 @@ def main() -> None:
             "effectif",
             "specialites",
         ])
-        for rec in dormants_reactivables:
+        for rec, year in partition.reactivables:
             writer.writerow([
                 rec.denomination,
                 region_name(rec.region_code),
-                rec.declaration_year or "-",
+                year or "-",
                 rec.effectif or "",
                 " | ".join(rec.specialites) if rec.specialites else "",
             ])
@@ -857,7 +866,7 @@ def main() -> None:
     )
 
     # Synthesis section
-    top_regions = region_counter_dormants.most_common(2)
+    top_regions = dormant.regions.most_common(2)
     regions_text = ", ".join(
         f"{name} ({count / total_dormants * 100:.1f}%)" for name, count in top_regions
     ) if total_dormants else "-"
@@ -915,5 +924,20 @@ def main() -> None:
         f.write("\n".join(markdown_lines))
 
 
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="OF dormants et sous-traitance (prompt 16).")
+    parser.add_argument("--flux", action="store_true", help="interroge le cube région × thème × taille des stagiaires confiés sans relancer l'analyse")
+    parser.add_argument("--region", choices=FLOW_DOMAINS["region"], metavar="REGION", help="filtre sur une région (ex. Bretagne)")
+    parser.add_argument("--theme", choices=FLOW_DOMAINS["theme"], metavar="THEME", help="filtre sur un thème (ex. Santé)")
+    parser.add_argument("--segment", choices=FLOW_DOMAINS["segment"], metavar="SEGMENT", help="filtre sur une tranche d'effectif (ex. 3-10)")
+    parser.add_argument("--par", choices=FLOW_AXES, help="détaille le résultat par région, thème ou tranche")
+    args = parser.parse_args()
+    if not args.flux:
+        main()
+        return
+    filters = {"region": args.region, "theme": args.theme, "segment": args.segment}
+    print(describe_flows(load_flow_cube(), filters, args.par))
+
+
 if __name__ == "__main__":
-    main()
+    cli()
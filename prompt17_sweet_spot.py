@@ -1,19 +1,19 @@
+import argparse
 import csv
 import math
 import os
-import statistics
-import zipfile
-import xml.etree.ElementTree as ET
+from bisect import bisect_right
 from collections import Counter, defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from itertools import accumulate, combinations
 from typing import Dict, Iterable, List, Optional, Tuple
 
 from analyze_specialites import MACRO_THEMES, classify_specialite
+from of_arrays import Mask, mask_and, numeric_column, take
+from of_dataset import XLSX_PATH, OFTable, intern_text, load_table
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_MARKDOWN = os.path.join("analysis_outputs", "prompt17_sweet_spot.md")
 OUTPUT_CSV_TEMPLATE = os.path.join("analysis_outputs", "prompt17_segment_{segment}.csv")
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
 
 SEGMENTS = {
     "A": {"label": "3 formateurs", "min": 3, "max": 3},
@@ -52,7 +52,7 @@ REGION_NAMES: Dict[int, str] = {
 REGION_ORDER = [11, 84, 76, 93, 75, 44, 52, 32, 53, 28, 27, 24, 94, 1, 2, 3, 4, 6]
 
 
-@dataclass
+@dataclass(slots=True)
 class Record:
     numero: str
     denomination: str
@@ -105,46 +105,6 @@ def ensure_output_dir() -> None:
     os.makedirs(os.path.dirname(OUTPUT_MARKDOWN), exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: List[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_float(value: Optional[str]) -> Optional[float]:
     if value is None:
         return None
@@ -170,141 +130,144 @@ def parse_int(value: Optional[str]) -> Optional[int]:
 
 
 def load_records() -> List[Record]:
+    table = load_table(XLSX_PATH)
     records: List[Record] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {
-                "numero": None,
-                "denomination": None,
-                "effectif": None,
-                "stagiaires": None,
-                "actions": None,
-                "bilan": None,
-                "vae": None,
-                "apprentissage": None,
-                "region": None,
-                "specialite": None,
-            }
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        col_idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[col_idx] = val
-                    header_lookup = {
-                        "numero": "numeroDeclarationActivite",
-                        "denomination": "denomination",
-                        "effectif": "informationsDeclarees.effectifFormateurs",
-                        "stagiaires": "informationsDeclarees.nbStagiaires",
-                        "actions": "certifications.actionsDeFormation",
-                        "bilan": "certifications.bilansDeCompetences",
-                        "vae": "certifications.VAE",
-                        "apprentissage": "certifications.actionsDeFormationParApprentissage",
-                        "region": "adressePhysiqueOrganismeFormation.codeRegion",
-                        "specialite": "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
-                    }
-                    for key, header_name in header_lookup.items():
-                        target_indices[key] = next(
-                            (idx for idx, name in header_map.items() if name == header_name),
-                            None,
-                        )
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    col_idx = column_ref_to_index(ref)
-                    if col_idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[col_idx] = val
-                numero = values.get(target_indices["numero"], "").strip()
-                denomination = values.get(target_indices["denomination"], "").strip()
-                effectif = parse_int(values.get(target_indices["effectif"]))
-                nb_stagiaires = parse_float(values.get(target_indices["stagiaires"])) or 0.0
-                qualiopi_actions = parse_int(values.get(target_indices["actions"]))
-                qualiopi_bilan = parse_int(values.get(target_indices["bilan"]))
-                qualiopi_vae = parse_int(values.get(target_indices["vae"]))
-                qualiopi_apprentissage = parse_int(values.get(target_indices["apprentissage"]))
-                region_code = parse_int(values.get(target_indices["region"]))
-                specialite_raw = values.get(target_indices["specialite"])
-                specialite = specialite_raw.strip() if specialite_raw else None
-                records.append(
-                    Record(
-                        numero=numero,
-                        denomination=denomination,
-                        effectif=effectif,
-                        nb_stagiaires=nb_stagiaires,
-                        qualiopi_actions=qualiopi_actions,
-                        qualiopi_bilan=qualiopi_bilan,
-                        qualiopi_vae=qualiopi_vae,
-                        qualiopi_apprentissage=qualiopi_apprentissage,
-                        region_code=region_code,
-                        specialite=specialite,
-                    )
-                )
-                elem.clear()
+    for numero, denomination, effectif, stagiaires, actions, bilan, vae, apprentissage, region, specialite_raw in table.select(
+        "numeroDeclarationActivite",
+        "denomination",
+        ("informationsDeclarees.effectifFormateurs", parse_int),
+        ("informationsDeclarees.nbStagiaires", parse_float),
+        ("certifications.actionsDeFormation", parse_int),
+        ("certifications.bilansDeCompetences", parse_int),
+        ("certifications.VAE", parse_int),
+        ("certifications.actionsDeFormationParApprentissage", parse_int),
+        ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+        "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+    ):
+        records.append(
+            Record(
+                numero=(numero or "").strip(),
+                denomination=(denomination or "").strip(),
+                effectif=effectif,
+                nb_stagiaires=stagiaires or 0.0,
+                qualiopi_actions=actions,
+                qualiopi_bilan=bilan,
+                qualiopi_vae=vae,
+                qualiopi_apprentissage=apprentissage,
+                region_code=region,
+                specialite=intern_text(specialite_raw.strip()) if specialite_raw else None,
+            )
+        )
     return records
 
 
+def tam_mask(table: OFTable, low: int = 3, high: int = 10) -> Mask:
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_int)
+    return mask_and(effectif.between(low, high), actions.equals(1), stagiaires.positive())
+
+
 def filter_tam(records: List[Record]) -> List[Record]:
-    result: List[Record] = []
-    for rec in records:
-        if rec.effectif is None or rec.effectif < 3 or rec.effectif > 10:
-            continue
-        if rec.qualiopi_actions != 1:
-            continue
-        if rec.nb_stagiaires <= 0:
-            continue
-        result.append(rec)
-    return result
+    # records come from load_records, one per workbook row.
+    return take(records, tam_mask(load_table(XLSX_PATH)))
+
+
+@dataclass(slots=True)
+class SegmentStats:
+    count: int = 0
+    stag_sum: float = 0.0
+    effectif_sum: int = 0
+    prod_sum: float = 0.0
+    prod_count: int = 0
+    soft_count: int = 0
+    multi_cert: int = 0
+    stag_values: Counter = field(default_factory=Counter)
+
+    def add(self, rec: Record) -> None:
+        self.count += 1
+        self.stag_sum += rec.nb_stagiaires
+        self.effectif_sum += rec.effectif or 0
+        production = rec.production_estimee
+        if production is not None:
+            self.prod_sum += production
+            self.prod_count += 1
+        if rec.macro_theme == "Soft Skills":
+            self.soft_count += 1
+        if rec.has_multi_cert:
+            self.multi_cert += 1
+        self.stag_values[rec.nb_stagiaires] += 1
+
+    def merge(self, other: "SegmentStats") -> None:
+        self.count += other.count
+        self.stag_sum += other.stag_sum
+        self.effectif_sum += other.effectif_sum
+        self.prod_sum += other.prod_sum
+        self.prod_count += other.prod_count
+        self.soft_count += other.soft_count
+        self.multi_cert += other.multi_cert
+        self.stag_values.update(other.stag_values)
+
+    def stag_median(self) -> float:
+        if not self.count:
+            return 0.0
+        return counted_median(self.stag_values, self.count)
+
+
+def counted_median(counts: Counter, size: int) -> float:
+    # Ranks are found over the distinct values only, not over every record.
+    low_rank, high_rank = (size - 1) // 2, size // 2
+    low = None
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if low is None and seen > low_rank:
+            low = value
+        if seen > high_rank:
+            return value if low_rank == high_rank else (low + value) / 2
+    raise ValueError("median of an empty sample")
+
+
+class SegmentAccumulator:
+    def __init__(self, records: Iterable[Record]):
+        self.by_effectif: Dict[int, SegmentStats] = {}
+        for rec in records:
+            if rec.effectif is None:
+                continue
+            stats = self.by_effectif.get(rec.effectif)
+            if stats is None:
+                stats = self.by_effectif[rec.effectif] = SegmentStats()
+            stats.add(rec)
+
+    def segment_stats(self, segments: Dict[str, Dict[str, object]] = SEGMENTS) -> Dict[str, SegmentStats]:
+        grouped = {key: SegmentStats() for key in segments}
+        for effectif in sorted(self.by_effectif):
+            key = next((key for key, spec in segments.items() if spec["min"] <= effectif <= spec["max"]), None)
+            if key is not None:
+                grouped[key].merge(self.by_effectif[effectif])
+        return grouped
+
+    def metrics(self, segments: Dict[str, Dict[str, object]] = SEGMENTS) -> Dict[str, Dict[str, float]]:
+        grouped = self.segment_stats(segments)
+        total = sum(stats.count for stats in grouped.values())
+        result: Dict[str, Dict[str, float]] = {}
+        for key, stats in grouped.items():
+            count = stats.count
+            result[key] = {
+                "count": count,
+                "pct_tam": (count / total * 100) if total else 0.0,
+                "stag_mean": stats.stag_sum / count if count else 0.0,
+                "stag_median": stats.stag_median(),
+                "stag_per_form": (stats.stag_sum / stats.effectif_sum) if stats.effectif_sum else 0.0,
+                "production": stats.prod_sum / stats.prod_count if stats.prod_count else 0.0,
+                "soft_share": (stats.soft_count / count * 100) if count else 0.0,
+                "cert_rate": (stats.multi_cert / count * 100) if count else 0.0,
+            }
+        return result
 
 
-def compute_segment_metrics(records: List[Record]) -> Dict[str, Dict[str, float]]:
-    segments: Dict[str, Dict[str, float]] = {}
-    grouped: Dict[str, List[Record]] = {key: [] for key in SEGMENTS}
-    for rec in records:
-        seg = rec.segment
-        if seg:
-            grouped[seg].append(rec)
-    total = sum(len(items) for items in grouped.values())
-    overall_soft = sum(1 for rec in records if rec.macro_theme == "Soft Skills")
-    for key, items in grouped.items():
-        count = len(items)
-        stag_values = [rec.nb_stagiaires for rec in items]
-        stag_mean = sum(stag_values) / count if count else 0.0
-        stag_median = statistics.median(stag_values) if count else 0.0
-        total_effectif = sum(rec.effectif or 0 for rec in items)
-        stag_per_form = (sum(stag_values) / total_effectif) if total_effectif else 0.0
-        prod_values = [rec.production_estimee for rec in items if rec.production_estimee is not None]
-        prod_mean = sum(prod_values) / len(prod_values) if prod_values else 0.0
-        soft_count = sum(1 for rec in items if rec.macro_theme == "Soft Skills")
-        multi_cert = sum(1 for rec in items if rec.has_multi_cert)
-        segments[key] = {
-            "count": count,
-            "pct_tam": (count / total * 100) if total else 0.0,
-            "stag_mean": stag_mean,
-            "stag_median": stag_median,
-            "stag_per_form": stag_per_form,
-            "production": prod_mean,
-            "soft_share": (soft_count / count * 100) if count else 0.0,
-            "cert_rate": (multi_cert / count * 100) if count else 0.0,
-        }
-    return segments
+def compute_segment_metrics(records: List[Record], segments: Dict[str, Dict[str, object]] = SEGMENTS) -> Dict[str, Dict[str, float]]:
+    return SegmentAccumulator(records).metrics(segments)
 
 
 def normalize_scores(values: Dict[str, float]) -> Dict[str, float]:
@@ -317,8 +280,11 @@ def normalize_scores(values: Dict[str, float]) -> Dict[str, float]:
     return {k: 10.0 * (v - min_val) / (max_val - min_val) for k, v in values.items()}
 
 
+SCORE_CRITERIA = ("count", "stag_mean", "stag_median", "stag_per_form", "production", "soft_share", "cert_rate")
+
+
 def compute_score_global(metrics: Dict[str, Dict[str, float]]) -> Dict[str, float]:
-    criteria = ["count", "stag_mean", "stag_median", "stag_per_form", "production", "soft_share", "cert_rate"]
+    criteria = SCORE_CRITERIA
     scores: Dict[str, float] = {key: 0.0 for key in metrics}
     for criterion in criteria:
         values = {key: metrics[key][criterion] for key in metrics}
@@ -329,6 +295,153 @@ def compute_score_global(metrics: Dict[str, Dict[str, float]]) -> Dict[str, floa
     return {key: (value / num_criteria) for key, value in scores.items()}
 
 
+def compute_score_bounded(metrics: Dict[str, Dict[str, float]], bounds: Dict[str, Tuple[float, float]]) -> Dict[str, float]:
+    # Same criteria as compute_score_global, but each one is scaled against fixed
+    # bounds so that scores from different segmentations can be compared.
+    scores: Dict[str, float] = {}
+    for key, values in metrics.items():
+        total = 0.0
+        for criterion in SCORE_CRITERIA:
+            low, high = bounds[criterion]
+            total += 10.0 if math.isclose(low, high) else 10.0 * (values[criterion] - low) / (high - low)
+        scores[key] = total / len(SCORE_CRITERIA)
+    return scores
+
+
+SWEEP_SEGMENT_COUNTS = (2, 3, 4)
+SWEEP_MIN_SHARE = 5.0
+SWEEP_TOP = 10
+
+
+@dataclass(slots=True)
+class SweepResult:
+    segments: Dict[str, Dict[str, object]]
+    metrics: Dict[str, Dict[str, float]]
+    scores: Dict[str, float]
+    winner: str
+    score: float
+
+    @property
+    def winner_score(self) -> float:
+        return self.scores[self.winner]
+
+
+class SegmentSweep:
+    # Sums come from prefix sums over the effectif buckets, and the median of a
+    # range from per-bucket prefix counts over the distinct nbStagiaires values,
+    # so a range is scored in O(log m) for m distinct values.
+    def __init__(self, accumulator: SegmentAccumulator):
+        self.effectifs = sorted(accumulator.by_effectif)
+        self.buckets = [accumulator.by_effectif[effectif] for effectif in self.effectifs]
+        fields = ("count", "stag_sum", "effectif_sum", "prod_sum", "prod_count", "soft_count", "multi_cert")
+        self.prefix = {name: [0, *accumulate(getattr(bucket, name) for bucket in self.buckets)] for name in fields}
+        self.levels = sorted(set().union(*(bucket.stag_values for bucket in self.buckets)))
+        running = [0] * len(self.levels)
+        self.level_prefix = [running]
+        for bucket in self.buckets:
+            below = accumulate(bucket.stag_values.get(level, 0) for level in self.levels)
+            running = [previous + count for previous, count in zip(running, below)]
+            self.level_prefix.append(running)
+        self.bounds = self.score_bounds()
+
+    def _total(self, name: str, first: int, last: int) -> float:
+        prefix = self.prefix[name]
+        return prefix[last + 1] - prefix[first]
+
+    def _value_at(self, first: int, last: int, rank: int) -> float:
+        low, high = self.level_prefix[first], self.level_prefix[last + 1]
+        return self.levels[bisect_right(range(len(self.levels)), rank, key=lambda level: high[level] - low[level])]
+
+    def _median(self, first: int, last: int) -> float:
+        size = self._total("count", first, last)
+        if not size:
+            return 0.0
+        low_rank, high_rank = (size - 1) // 2, size // 2
+        high = self._value_at(first, last, high_rank)
+        return high if low_rank == high_rank else (self._value_at(first, last, low_rank) + high) / 2
+
+    def range_metrics(self, first: int, last: int, total: int) -> Dict[str, float]:
+        count = self._total("count", first, last)
+        stag_sum = self._total("stag_sum", first, last)
+        effectif_sum = self._total("effectif_sum", first, last)
+        prod_count = self._total("prod_count", first, last)
+        return {
+            "count": count,
+            "pct_tam": (count / total * 100) if total else 0.0,
+            "stag_mean": stag_sum / count if count else 0.0,
+            "stag_median": self._median(first, last),
+            "stag_per_form": (stag_sum / effectif_sum) if effectif_sum else 0.0,
+            "production": self._total("prod_sum", first, last) / prod_count if prod_count else 0.0,
+            "soft_share": (self._total("soft_count", first, last) / count * 100) if count else 0.0,
+            "cert_rate": (self._total("multi_cert", first, last) / count * 100) if count else 0.0,
+        }
+
+    def score_bounds(self) -> Dict[str, Tuple[float, float]]:
+        # Ratios and medians of a segment always lie between those of its
+        # effectif buckets; the count of a segment ranges up to the whole TAM.
+        total = self.prefix["count"][-1]
+        singles = [self.range_metrics(index, index, total) for index in range(len(self.effectifs))]
+        if not singles:
+            return {}
+        bounds = {criterion: (min(m[criterion] for m in singles), max(m[criterion] for m in singles)) for criterion in SCORE_CRITERIA}
+        bounds["count"] = (bounds["count"][0], total)
+        return bounds
+
+    def evaluate(self, cuts: Iterable[int]) -> SweepResult:
+        # A segmentation is worth the OF-weighted mean of its segment scores, so
+        # every boundary counts, not only those of the best segment.
+        bounds = [0, *cuts, len(self.effectifs)]
+        total = self.prefix["count"][-1]
+        segments: Dict[str, Dict[str, object]] = {}
+        metrics: Dict[str, Dict[str, float]] = {}
+        for position, (start, stop) in enumerate(zip(bounds, bounds[1:])):
+            key = chr(ord("A") + position)
+            low, high = self.effectifs[start], self.effectifs[stop - 1]
+            unit = "formateur" if high == 1 else "formateurs"
+            label = f"{low} {unit}" if low == high else f"{low}-{high} {unit}"
+            segments[key] = {"label": label, "min": low, "max": high}
+            metrics[key] = self.range_metrics(start, stop - 1, total)
+        scores = compute_score_bounded(metrics, self.bounds)
+        score = sum(metrics[key]["count"] * value for key, value in scores.items()) / total
+        return SweepResult(segments, metrics, scores, max(scores, key=scores.get), score)
+
+    def sweep(
+        self,
+        segment_counts: Iterable[int] = SWEEP_SEGMENT_COUNTS,
+        min_share: float = SWEEP_MIN_SHARE,
+    ) -> List[SweepResult]:
+        results: List[SweepResult] = []
+        if not self.effectifs:
+            return results
+        for size in segment_counts:
+            if size < 1:
+                continue
+            for cuts in combinations(range(1, len(self.effectifs)), size - 1):
+                result = self.evaluate(cuts)
+                if all(values["pct_tam"] >= min_share for values in result.metrics.values()):
+                    results.append(result)
+        results.sort(key=lambda result: (-result.score, len(result.segments)))
+        return results
+
+
+def render_sweep(results: List[SweepResult], top: int = SWEEP_TOP) -> str:
+    rows = []
+    for rank, result in enumerate(results[:top], start=1):
+        winner = result.metrics[result.winner]
+        rows.append(
+            [
+                str(rank),
+                " / ".join(spec["label"] for spec in result.segments.values()),
+                result.segments[result.winner]["label"],
+                format_int(int(winner["count"])),
+                format_float(winner["stag_mean"], 1),
+                format_float(result.winner_score, 2),
+                format_float(result.score, 2),
+            ]
+        )
+    return render_table(["Rang", "Segmentation", "Segment gagnant", "OF", "Stagiaires moy.", "Score gagnant", "Score segmentation"], rows)
+
+
 def render_table(headers: List[str], rows: List[List[str]]) -> str:
     lines = ["| " + " | ".join(headers) + " |", "| " + " | ".join(["---"] * len(headers)) + " |"]
     for row in rows:
@@ -798,5 +911,25 @@ def main() -> None:
         f.write(content)
 
 
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Sweet spot par taille d'équipe (prompt 17).")
+    parser.add_argument("--sweep", action="store_true", help="compare toutes les segmentations contiguës de l'effectif")
+    parser.add_argument("--segments", type=int, nargs="+", default=list(SWEEP_SEGMENT_COUNTS), help="nombres de segments testés")
+    parser.add_argument("--min-share", type=float, default=SWEEP_MIN_SHARE, help="part minimale du TAM par segment (%%)")
+    parser.add_argument("--top", type=int, default=SWEEP_TOP, help="segmentations affichées")
+    parser.add_argument("--effectif-min", type=int, default=3, help="effectif minimal balayé")
+    parser.add_argument("--effectif-max", type=int, default=10, help="effectif maximal balayé")
+    args = parser.parse_args()
+    if not args.sweep:
+        main()
+        return
+    records = take(load_records(), tam_mask(load_table(XLSX_PATH), args.effectif_min, args.effectif_max))
+    results = SegmentSweep(SegmentAccumulator(records)).sweep(args.segments, args.min_share)
+    if not results:
+        print("Aucune segmentation ne respecte les contraintes.")
+        return
+    print(render_sweep(results, args.top))
+
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -1,21 +1,26 @@
+import argparse
 import csv
+import heapq
 import math
 import os
 import statistics
-import zipfile
-import xml.etree.ElementTree as ET
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from itertools import chain
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from analyze_specialites import REGION_NAMES, classify_specialite
+from of_arrays import Mask, mask_and, numeric_column, take
+from of_dataset import XLSX_PATH, OFTable, intern_text, iter_rows, load_table
+from of_groupby import Count, group_by
 
-XLSX_PATH = "OF 3-10.xlsx"
 OUTPUT_DIR = "analysis_outputs"
 OUTPUT_MD = os.path.join(OUTPUT_DIR, "prompt20_top500_prospects.md")
 OUTPUT_CSV_TOP500 = os.path.join(OUTPUT_DIR, "prompt20_top500.csv")
 OUTPUT_CSV_TOP100 = os.path.join(OUTPUT_DIR, "prompt20_top100.csv")
+OUTPUT_CSV_TOP_TEMPLATE = os.path.join(OUTPUT_DIR, "prompt20_top{k}_stream.csv")
 
-NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+TOP_K = 500
 
 PRIMARY_REGIONS = {"Île-de-France", "Auvergne-Rhône-Alpes", "Provence-Alpes-Côte d'Azur"}
 SECONDARY_REGIONS = {"Occitanie", "Nouvelle-Aquitaine", "Grand Est"}
@@ -29,7 +34,7 @@ PRIORITY_LABELS = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class ProspectRecord:
     numero: str
     denomination: str
@@ -68,7 +73,7 @@ class ProspectRecord:
         return sum(1 for label in self.specialites if label)
 
 
-@dataclass
+@dataclass(slots=True)
 class ProspectScore:
     record: ProspectRecord
     score_effectif: int
@@ -104,46 +109,6 @@ def ensure_output_dir() -> None:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
-def load_shared_strings(zf: zipfile.ZipFile) -> List[str]:
-    shared_strings: List[str] = []
-    path = "xl/sharedStrings.xml"
-    if path not in zf.namelist():
-        return shared_strings
-    with zf.open(path) as f:
-        for event, elem in ET.iterparse(f, events=("end",)):
-            if elem.tag == NS + "si":
-                text = "".join(t.text or "" for t in elem.findall('.//' + NS + 't'))
-                shared_strings.append(text)
-                elem.clear()
-    return shared_strings
-
-
-def column_ref_to_index(ref: str) -> int:
-    letters = "".join(ch for ch in ref if ch.isalpha())
-    idx = 0
-    for ch in letters:
-        idx = idx * 26 + (ord(ch) - ord("A") + 1)
-    return idx - 1
-
-
-def get_cell_value(cell: ET.Element, shared_strings: Sequence[str]) -> Optional[str]:
-    cell_type = cell.attrib.get("t")
-    if cell_type == "s":
-        v = cell.find(NS + "v")
-        if v is None or v.text is None:
-            return None
-        return shared_strings[int(v.text)]
-    if cell_type == "inlineStr":
-        is_elem = cell.find(NS + "is")
-        if is_elem is None:
-            return None
-        return "".join(t.text or "" for t in is_elem.findall('.//' + NS + 't'))
-    v = cell.find(NS + "v")
-    if v is None:
-        return None
-    return v.text
-
-
 def parse_int(value: Optional[str]) -> Optional[int]:
     if value is None:
         return None
@@ -205,108 +170,55 @@ def normalize_postal_code(value: Optional[str]) -> Optional[str]:
     return text
 
 
+RECORD_COLUMNS = (
+    "numeroDeclarationActivite",
+    "denomination",
+    "siren",
+    "siretEtablissementDeclarant",
+    "adressePhysiqueOrganismeFormation.ville",
+    "adressePhysiqueOrganismeFormation.codePostal",
+    ("adressePhysiqueOrganismeFormation.codeRegion", parse_int),
+    ("certifications.actionsDeFormation", parse_int),
+    ("informationsDeclarees.nbStagiaires", parse_float),
+    ("informationsDeclarees.effectifFormateurs", parse_int),
+    "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
+    "informationsDeclarees.specialitesDeFormation.libelleSpecialite2",
+    "informationsDeclarees.specialitesDeFormation.libelleSpecialite3",
+)
+
+
+def iter_records(stream: bool = False) -> Iterator[ProspectRecord]:
+    rows = iter_rows(RECORD_COLUMNS, XLSX_PATH) if stream else load_table(XLSX_PATH).select(*RECORD_COLUMNS)
+    for numero, denomination, raw_siren, raw_siret, ville, code_postal_raw, region, actions, stagiaires, effectif, *raw_spes in rows:
+        if ville:
+            ville = intern_text(ville.strip()) or None
+
+        spe_values: List[Optional[str]] = []
+        for raw in raw_spes:
+            if raw is None:
+                spe_values.append(None)
+                continue
+            text = raw.strip()
+            spe_values.append(intern_text(text) if text else None)
+
+        record = ProspectRecord(
+            numero=(numero or "").strip(),
+            denomination=(denomination or "").strip(),
+            siren=parse_identifier(raw_siren, length=9),
+            siret=parse_identifier(raw_siret, length=14),
+            ville=ville,
+            code_postal=normalize_postal_code(code_postal_raw),
+            region_code=region,
+            effectif=effectif,
+            nb_stagiaires=stagiaires or 0.0,
+            actions_cert=actions,
+            specialites=tuple(spe_values),
+        )
+        yield record
+
+
 def load_records() -> List[ProspectRecord]:
-    records: List[ProspectRecord] = []
-    with zipfile.ZipFile(XLSX_PATH) as zf:
-        shared_strings = load_shared_strings(zf)
-        with zf.open("xl/worksheets/sheet1.xml") as f:
-            header_map: Dict[int, str] = {}
-            target_indices: Dict[str, Optional[int]] = {}
-            for event, elem in ET.iterparse(f, events=("end",)):
-                if elem.tag != NS + "row":
-                    continue
-                row_idx = int(elem.attrib.get("r"))
-                if row_idx == 1:
-                    for cell in elem.findall(NS + "c"):
-                        ref = cell.attrib.get("r")
-                        if not ref:
-                            continue
-                        idx = column_ref_to_index(ref)
-                        val = get_cell_value(cell, shared_strings)
-                        if val is not None:
-                            header_map[idx] = val
-                    lookup = {
-                        "numero": "numeroDeclarationActivite",
-                        "denomination": "denomination",
-                        "siren": "siren",
-                        "siret": "siretEtablissementDeclarant",
-                        "voie": "adressePhysiqueOrganismeFormation.voie",
-                        "cp": "adressePhysiqueOrganismeFormation.codePostal",
-                        "ville": "adressePhysiqueOrganismeFormation.ville",
-                        "region": "adressePhysiqueOrganismeFormation.codeRegion",
-                        "actions": "certifications.actionsDeFormation",
-                        "stagiaires": "informationsDeclarees.nbStagiaires",
-                        "effectif": "informationsDeclarees.effectifFormateurs",
-                        "spe1": "informationsDeclarees.specialitesDeFormation.libelleSpecialite1",
-                        "spe2": "informationsDeclarees.specialitesDeFormation.libelleSpecialite2",
-                        "spe3": "informationsDeclarees.specialitesDeFormation.libelleSpecialite3",
-                    }
-                    for key, header_name in lookup.items():
-                        target_indices[key] = next(
-                            (idx for idx, name in header_map.items() if name == header_name),
-                            None,
-                        )
-                    elem.clear()
-                    continue
-
-                indices = {idx for idx in target_indices.values() if idx is not None}
-                if not indices:
-                    continue
-                values: Dict[int, str] = {}
-                for cell in elem.findall(NS + "c"):
-                    ref = cell.attrib.get("r")
-                    if not ref:
-                        continue
-                    idx = column_ref_to_index(ref)
-                    if idx not in indices:
-                        continue
-                    val = get_cell_value(cell, shared_strings)
-                    if val is not None:
-                        values[idx] = val
-
-                numero = values.get(target_indices["numero"], "") if target_indices["numero"] is not None else ""
-                denomination = values.get(target_indices["denomination"], "") if target_indices["denomination"] is not None else ""
-                siren = parse_identifier(values.get(target_indices["siren"]) if target_indices["siren"] is not None else None, length=9)
-                siret = parse_identifier(values.get(target_indices["siret"]) if target_indices["siret"] is not None else None, length=14)
-                ville = values.get(target_indices["ville"]) if target_indices["ville"] is not None else None
-                if ville:
-                    ville = ville.strip() or None
-                code_postal_raw = values.get(target_indices["cp"]) if target_indices["cp"] is not None else None
-                code_postal = normalize_postal_code(code_postal_raw)
-                region_code = parse_int(values.get(target_indices["region"])) if target_indices["region"] is not None else None
-                actions = parse_int(values.get(target_indices["actions"])) if target_indices["actions"] is not None else None
-                nb_stagiaires = parse_float(values.get(target_indices["stagiaires"])) if target_indices["stagiaires"] is not None else None
-                effectif = parse_int(values.get(target_indices["effectif"])) if target_indices["effectif"] is not None else None
-
-                spe_values: List[Optional[str]] = []
-                for key in ("spe1", "spe2", "spe3"):
-                    idx = target_indices.get(key)
-                    if idx is None:
-                        spe_values.append(None)
-                        continue
-                    raw = values.get(idx)
-                    if raw is None:
-                        spe_values.append(None)
-                        continue
-                    text = raw.strip()
-                    spe_values.append(text if text else None)
-
-                record = ProspectRecord(
-                    numero=numero.strip(),
-                    denomination=denomination.strip(),
-                    siren=siren,
-                    siret=siret,
-                    ville=ville,
-                    code_postal=code_postal,
-                    region_code=region_code,
-                    effectif=effectif,
-                    nb_stagiaires=nb_stagiaires or 0.0,
-                    actions_cert=actions,
-                    specialites=tuple(spe_values),
-                )
-                records.append(record)
-                elem.clear()
-    return records
+    return list(iter_records())
 
 
 def is_tam(record: ProspectRecord) -> bool:
@@ -319,6 +231,13 @@ def is_tam(record: ProspectRecord) -> bool:
     return True
 
 
+def tam_mask(table: OFTable) -> Mask:
+    effectif = numeric_column(table, "informationsDeclarees.effectifFormateurs", parse_int)
+    stagiaires = numeric_column(table, "informationsDeclarees.nbStagiaires", parse_float)
+    actions = numeric_column(table, "certifications.actionsDeFormation", parse_int)
+    return mask_and(effectif.between(3, 10), actions.equals(1), stagiaires.positive())
+
+
 def score_effectif(record: ProspectRecord) -> int:
     effectif = record.effectif
     if effectif is None:
@@ -376,20 +295,29 @@ def score_multi_specialites(record: ProspectRecord) -> int:
     return 0
 
 
-def compute_scores(records: Iterable[ProspectRecord]) -> List[ProspectScore]:
-    scores: List[ProspectScore] = []
+def iter_scores(records: Iterable[ProspectRecord]) -> Iterator[ProspectScore]:
     for rec in records:
-        scores.append(
-            ProspectScore(
-                record=rec,
-                score_effectif=score_effectif(rec),
-                score_soft=score_soft_skills(rec),
-                score_activite=score_activite(rec),
-                score_region=score_region(rec),
-                score_multi=score_multi_specialites(rec),
-            )
+        yield ProspectScore(
+            record=rec,
+            score_effectif=score_effectif(rec),
+            score_soft=score_soft_skills(rec),
+            score_activite=score_activite(rec),
+            score_region=score_region(rec),
+            score_multi=score_multi_specialites(rec),
         )
-    return scores
+
+
+def compute_scores(records: Iterable[ProspectRecord]) -> List[ProspectScore]:
+    return list(iter_scores(records))
+
+
+def prospect_rank_key(sc: ProspectScore) -> Tuple[float, float, float]:
+    return (-sc.score_total, -(sc.record.nb_stagiaires or 0), -(sc.record.production_estimee or 0))
+
+
+def top_prospects(scores: Iterable[ProspectScore], k: int = TOP_K) -> List[ProspectScore]:
+    # Bounded heap of k entries; ties keep the loader order, as a stable sort would.
+    return heapq.nsmallest(k, scores, key=prospect_rank_key)
 
 
 def format_int(value: int) -> str:
@@ -521,20 +449,15 @@ def compare_segments(top_metrics: Dict[str, float], tam_metrics: Dict[str, float
 
 
 def region_distribution(scores: Sequence[ProspectScore], tam_scores: Sequence[ProspectScore]) -> List[Tuple[str, str, str, str]]:
-    region_counts: Dict[str, int] = {}
-    tam_counts: Dict[str, int] = {}
-    for sc in scores:
-        region_counts[sc.record.region_name] = region_counts.get(sc.record.region_name, 0) + 1
-    for sc in tam_scores:
-        tam_counts[sc.record.region_name] = tam_counts.get(sc.record.region_name, 0) + 1
-
-    total_top = sum(region_counts.values())
-    total_tam = sum(tam_counts.values())
-    all_regions = sorted({*region_counts.keys(), *tam_counts.keys()})
+    tagged = chain(((sc.record.region_name, True) for sc in scores), ((sc.record.region_name, False) for sc in tam_scores))
+    counts = group_by(tagged, itemgetter(0), {"top": Count(where=itemgetter(1)), "tam": Count(where=lambda row: not row[1])})
+
+    total_top = len(scores)
+    total_tam = len(tam_scores)
     rows: List[Tuple[str, str, str, str]] = []
-    for region in all_regions:
-        top_pct = (region_counts.get(region, 0) / total_top * 100) if total_top else 0.0
-        tam_pct = (tam_counts.get(region, 0) / total_tam * 100) if total_tam else 0.0
+    for region in sorted(counts):
+        top_pct = (counts[region]["top"] / total_top * 100) if total_top else 0.0
+        tam_pct = (counts[region]["tam"] / total_tam * 100) if total_tam else 0.0
         diff = top_pct - tam_pct
         if diff >= 3:
             opportunity = "Élevée"
@@ -695,12 +618,11 @@ def export_csv(scores: Sequence[ProspectScore], path: str, limit: Optional[int]
 
 def main() -> None:
     ensure_output_dir()
-    records = load_records()
-    tam_records = [rec for rec in records if is_tam(rec)]
+    # load_records yields one record per workbook row; the streamed --top export
+    # has no table to mask and keeps the per-record is_tam.
+    tam_records = take(load_records(), tam_mask(load_table(XLSX_PATH)))
     tam_scores = compute_scores(tam_records)
-    tam_scores.sort(key=lambda sc: (-sc.score_total, -(sc.record.nb_stagiaires or 0), -(sc.record.production_estimee or 0)))
-
-    top_scores = tam_scores[:500]
+    top_scores = top_prospects(tam_scores, TOP_K)
 
     distribution_rows = distribution_table(tam_scores)
     tam_metrics = segmentation_metrics(tam_scores)
@@ -724,5 +646,22 @@ def main() -> None:
         f.write(markdown_content)
 
 
+def export_top(k: int) -> str:
+    path = OUTPUT_CSV_TOP_TEMPLATE.format(k=k)
+    tam_records = (rec for rec in iter_records(stream=True) if is_tam(rec))
+    export_csv(top_prospects(iter_scores(tam_records), k), path)
+    return path
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Top prospects OF TAM scorés (prompt 20).")
+    parser.add_argument("--top", type=int, help="exporte uniquement les K meilleurs prospects (ex. 10000)")
+    args = parser.parse_args()
+    if args.top is None:
+        main()
+        return
+    print(export_top(args.top))
+
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,358 @@
+import argparse
+import ast
+import contextlib
+import glob
+import hashlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from of_dataset import CACHE_DIR, DEFAULT_WORKERS, XLSX_PATH, file_digest, load_table, workbook_digest
+
+OUTPUT_DIR = "analysis_outputs"
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "run_all_fingerprints.json"
+
+
+@dataclass(frozen=True)
+class Analysis:
+    name: str
+    entry: str = "main"
+    after: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    root: Optional[str] = None
+    uses_dataset: bool = True
+
+
+# compute_tam and analyze_departements both write synthese.md; compute_tam runs
+# last so the executive TAM synthesis is the one kept, as with `for f in *.py`.
+ANALYSES: List[Analysis] = [
+    Analysis(
+        "analyze_departements",
+        outputs=(
+            "table1_top_departements.md",
+            "table2_dom.md",
+            "table3_grandes_villes.md",
+            "table4_regions_sans_cp.md",
+            "table5_clusters.md",
+            "table6_scoring.md",
+            "top_departements.csv",
+            "clusters.csv",
+        ),
+    ),
+    Analysis(
+        "compute_tam",
+        after=("analyze_departements",),
+        outputs=("tam_summary.md", "distribution_effectif.csv", "synthese.md"),
+    ),
+    Analysis("analyze_specialites", outputs=("specialites_analysis.md", "specialites_export.csv")),
+    Analysis(
+        "analyze_effectifs",
+        outputs=(
+            "table1_distribution.md",
+            "distribution_0_100.csv",
+            "table2_segments.md",
+            "table3_comparison.md",
+            "table4_top20.md",
+            "outliers_summary.md",
+            "table5_stats.md",
+            "summary.md",
+        ),
+    ),
+    Analysis(
+        "analyze_production",
+        outputs=("prompt09_tables.md", "prompt09_power_users.csv", "prompt09_sous_productifs.csv"),
+    ),
+    Analysis(
+        "analyze_regions_detailed",
+        outputs=(
+            "region_fiches.md",
+            "benchmark_regions.md",
+            "performance_regions.md",
+            "macro_zones.md",
+            "synthese_regions.md",
+        ),
+    ),
+    Analysis("analyze_stagiaires", outputs=("stagiaires_analysis.md", "top50_tam_stagiaires.csv")),
+    Analysis("analyze_soft_skills", entry="analyse", outputs=("soft_skills_analysis.md", "soft_skills_tam.csv")),
+    Analysis(
+        "analyze_polyvalence",
+        after=("analyze_specialites",),
+        outputs=("polyvalence_analysis.md", "polyvalence_combinations.csv"),
+    ),
+    Analysis("analyze_reseaux", outputs=("reseaux_nationaux.md", "reseaux_top50.csv", "reseaux_rapprochements.csv")),
+    Analysis(
+        "analyze_clusters_dense",
+        entry="build_tables",
+        outputs=("prompt11_clusters_denses.md", "prompt11_villes_coordonnees.csv"),
+    ),
+    Analysis(
+        "prompt12_haute_activite",
+        entry="generate_markdown",
+        outputs=("prompt12_haute_activite.md", "prompt12_top50_haute_activite.csv"),
+    ),
+    Analysis("prompt13_maturite_qualiopi", outputs=("prompt13_maturite_qualiopi.md", "prompt13_regions_maturite.csv")),
+    Analysis(
+        "prompt14_evolution_temporelle",
+        outputs=("prompt14_evolution_temporelle.md", "prompt14_evolution_regions.csv"),
+    ),
+    Analysis("prompt15_qualite_donnees", outputs=("prompt15_qualite_donnees.md", "prompt15_of_sans_cp.csv")),
+    Analysis(
+        "prompt16_dormants_sous_traitance",
+        outputs=(
+            "prompt16_dormants_sous_traitance.md",
+            "prompt16_top20_sous_traitants.csv",
+            "prompt16_dormants_reactivables.csv",
+            "prompt16_flux_sous_traitance.csv",
+        ),
+    ),
+    Analysis("prompt17_sweet_spot", outputs=("prompt17_sweet_spot.md", "prompt17_segment_*.csv")),
+    Analysis(
+        "prompt18_tam_final",
+        after=("prompt17_sweet_spot", "analyze_specialites"),
+        outputs=("prompt18_tam_final.md", "prompt18_tam_final.csv"),
+    ),
+    Analysis(
+        "prompt19_scenarios_croissance",
+        entry="build_tables",
+        outputs=("prompt19_scenarios_croissance.md", "prompt19_scenarioB_projection.csv"),
+        root=SCRIPT_DIR,
+        uses_dataset=False,
+    ),
+    Analysis(
+        "prompt20_top500_prospects",
+        outputs=("prompt20_top500_prospects.md", "prompt20_top500.csv", "prompt20_top100.csv"),
+    ),
+]
+
+
+@dataclass
+class RunResult:
+    name: str
+    ok: bool
+    seconds: float
+    output: str
+
+
+def resolve(names: Sequence[str]) -> List[Analysis]:
+    by_name = {analysis.name: analysis for analysis in ANALYSES}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise SystemExit(f"Analyses inconnues : {', '.join(unknown)}")
+    if not names:
+        return list(ANALYSES)
+    selected: Set[str] = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name in selected:
+            continue
+        selected.add(name)
+        stack.extend(by_name[name].after)
+    return [analysis for analysis in ANALYSES if analysis.name in selected]
+
+
+def local_modules(name: str, seen: Optional[Set[str]] = None) -> Set[str]:
+    seen = set() if seen is None else seen
+    path = os.path.join(SCRIPT_DIR, name + ".py")
+    if name in seen or not os.path.exists(path):
+        return seen
+    seen.add(name)
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                local_modules(alias.name.split(".")[0], seen)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            local_modules(node.module.split(".")[0], seen)
+    return seen
+
+
+def fingerprint(analysis: Analysis, dataset: Optional[str], upstream: Dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps([analysis.name, analysis.entry, dataset if analysis.uses_dataset else None]).encode("utf-8"))
+    for module in sorted(local_modules(analysis.name)):
+        digest.update(module.encode("utf-8"))
+        digest.update(file_digest(os.path.join(SCRIPT_DIR, module + ".py")).encode("ascii"))
+    for dep in analysis.after:
+        digest.update(upstream.get(dep, "").encode("ascii"))
+    return digest.hexdigest()
+
+
+def output_files(analysis: Analysis) -> List[str]:
+    base = os.path.join(analysis.root or os.getcwd(), OUTPUT_DIR)
+    paths: Set[str] = set()
+    for pattern in analysis.outputs:
+        paths.update(glob.glob(os.path.join(base, pattern)))
+    return sorted(paths)
+
+
+def state_path() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(XLSX_PATH)), CACHE_DIR, STATE_FILE)
+
+
+def load_state() -> Dict[str, Dict[str, object]]:
+    try:
+        with open(state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: Dict[str, Dict[str, object]]) -> None:
+    path = state_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(analysis: Analysis, fp: str, state: Dict[str, Dict[str, object]]) -> bool:
+    entry = state.get(analysis.name)
+    if not entry or entry.get("fingerprint") != fp or not entry.get("outputs"):
+        return False
+    for path, digest in entry["outputs"].items():
+        if not os.path.exists(path) or file_digest(path) != digest:
+            return False
+    return True
+
+
+def run_analysis(analysis: Analysis) -> RunResult:
+    start = time.perf_counter()
+    buffer = io.StringIO()
+    ok = True
+    with contextlib.redirect_stdout(buffer):
+        try:
+            module = importlib.import_module(analysis.name)
+            getattr(module, analysis.entry)()
+        except Exception:
+            ok = False
+            buffer.write(traceback.format_exc())
+    return RunResult(analysis.name, ok, time.perf_counter() - start, buffer.getvalue())
+
+
+def report(result: RunResult, verbose: bool) -> None:
+    status = "ok" if result.ok else "ÉCHEC"
+    print(f"[{status}] {result.name} ({result.seconds:.1f} s)")
+    if result.output and (verbose or not result.ok):
+        print(result.output.rstrip())
+
+
+def run_sequential(analyses: List[Analysis], verbose: bool, failed: Optional[Dict[str, RunResult]] = None) -> Dict[str, RunResult]:
+    results: Dict[str, RunResult] = dict(failed or {})
+    for analysis in analyses:
+        if any(dep in results and not results[dep].ok for dep in analysis.after):
+            results[analysis.name] = RunResult(analysis.name, False, 0.0, "dépendance en échec")
+        else:
+            results[analysis.name] = run_analysis(analysis)
+        report(results[analysis.name], verbose)
+    return results
+
+
+def run_parallel(
+    analyses: List[Analysis], jobs: int, verbose: bool, failed: Optional[Dict[str, RunResult]] = None
+) -> Dict[str, RunResult]:
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pending = {analysis.name: analysis for analysis in analyses}
+    results: Dict[str, RunResult] = dict(failed or {})
+    running: Dict[Future, str] = {}
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        while pending or running:
+            for name, analysis in list(pending.items()):
+                if any(dep in pending or dep in running.values() for dep in analysis.after):
+                    continue
+                del pending[name]
+                if any(dep in results and not results[dep].ok for dep in analysis.after):
+                    results[name] = RunResult(name, False, 0.0, "dépendance en échec")
+                    report(results[name], verbose)
+                    continue
+                running[pool.submit(run_analysis, analysis)] = name
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    results[name] = RunResult(name, False, 0.0, traceback.format_exc())
+                report(results[name], verbose)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Charge le fichier OF une fois et génère toutes les analyses.")
+    parser.add_argument("analyses", nargs="*", help="analyses à lancer (avec leurs dépendances) ; toutes par défaut")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="analyses exécutées en parallèle")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="processus de parsing du fichier OF")
+    parser.add_argument("--verbose", action="store_true", help="affiche la sortie de chaque analyse")
+    parser.add_argument("--force", action="store_true", help="régénère même les rapports à jour")
+    args = parser.parse_args(argv)
+
+    analyses = resolve(args.analyses)
+    start = time.perf_counter()
+    dataset = workbook_digest(XLSX_PATH) if any(a.uses_dataset for a in analyses) else None
+    state = load_state()
+    fingerprints: Dict[str, str] = {}
+    unreadable: Dict[str, RunResult] = {}
+    to_run: List[Analysis] = []
+    scheduled: Set[str] = set()
+    for analysis in analyses:
+        # A module that cannot be read or parsed only fails its own analysis and
+        # those that depend on it.
+        try:
+            fingerprints[analysis.name] = fingerprint(analysis, dataset, fingerprints)
+        except (OSError, SyntaxError, ValueError) as exc:
+            unreadable[analysis.name] = RunResult(analysis.name, False, 0.0, f"module illisible : {exc}")
+            report(unreadable[analysis.name], args.verbose)
+            scheduled.add(analysis.name)
+            continue
+        stale = args.force or any(dep in scheduled for dep in analysis.after)
+        if stale or not is_up_to_date(analysis, fingerprints[analysis.name], state):
+            to_run.append(analysis)
+            scheduled.add(analysis.name)
+        else:
+            print(f"[à jour] {analysis.name}")
+
+    if any(analysis.uses_dataset for analysis in to_run):
+        table = load_table(XLSX_PATH, workers=args.workers)
+        table.load_all()
+        print(f"Fichier OF chargé : {table.row_count} lignes ({time.perf_counter() - start:.1f} s)")
+
+    if args.jobs > 1:
+        results = run_parallel(to_run, args.jobs, args.verbose, unreadable)
+    else:
+        results = run_sequential(to_run, args.verbose, unreadable)
+    by_name = {analysis.name: analysis for analysis in analyses}
+    for name, result in results.items():
+        if result.ok:
+            state[name] = {
+                "fingerprint": fingerprints[name],
+                "outputs": {path: file_digest(path) for path in output_files(by_name[name])},
+            }
+        else:
+            state.pop(name, None)
+    save_state(state)
+    failed = [name for name, result in results.items() if not result.ok]
+    skipped = len(analyses) - len(results)
+    print(
+        f"{len(results) - len(failed)}/{len(results)} analyses générées, {skipped} à jour, "
+        f"en {time.perf_counter() - start:.1f} s"
+    )
+    if failed:
+        print(f"Échecs : {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())